@@ -0,0 +1,38 @@
+"""delivery_track_stats
+
+Revision ID: 0fdb3a680274
+Revises: a19a6f4661dd
+Create Date: 2026-10-18 09:12:40.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0fdb3a680274'
+down_revision: Union[str, None] = 'a19a6f4661dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Las entregas existentes no necesitan backfill: su estado se siembra con un
+    # recálculo completo la primera vez que reciben un punto nuevo.
+    op.create_table('delivery_track_stats',
+    sa.Column('delivery_id', sa.Integer(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('distance_km', sa.Float(), nullable=False),
+    sa.Column('last_latitude', sa.Float(), nullable=True),
+    sa.Column('last_longitude', sa.Float(), nullable=True),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('needs_recompute', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['delivery_id'], ['deliveries.delivery_id'], ),
+    sa.PrimaryKeyConstraint('delivery_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('delivery_track_stats')
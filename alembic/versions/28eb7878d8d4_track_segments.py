@@ -0,0 +1,41 @@
+"""track_segments
+
+Revision ID: 28eb7878d8d4
+Revises: 3eaa0214455d
+Create Date: 2026-10-18 15:47:52.206431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '28eb7878d8d4'
+down_revision: Union[str, None] = '3eaa0214455d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('track_segments',
+    sa.Column('delivery_id', sa.Integer(), nullable=False),
+    sa.Column('driver_id', sa.Integer(), nullable=True),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('ended_at', sa.DateTime(), nullable=False),
+    sa.Column('distance_km', sa.Float(), nullable=False),
+    sa.Column('last_point_id', sa.Integer(), nullable=False),
+    sa.Column('encoding', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['delivery_id'], ['deliveries.delivery_id'], ),
+    sa.ForeignKeyConstraint(['driver_id'], ['drivers.driver_id'], ),
+    sa.PrimaryKeyConstraint('delivery_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('track_segments')
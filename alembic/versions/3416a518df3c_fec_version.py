@@ -0,0 +1,26 @@
+"""fec_version
+
+Revision ID: 3416a518df3c
+Revises: ca929f2892c6
+Create Date: 2026-10-18 11:58:26.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3416a518df3c'
+down_revision: Union[str, None] = 'ca929f2892c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('fecs', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('fecs', 'version')
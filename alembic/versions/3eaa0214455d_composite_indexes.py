@@ -0,0 +1,35 @@
+"""composite_indexes
+
+Revision ID: 3eaa0214455d
+Revises: 7f568e229a19
+Create Date: 2026-10-18 15:04:37.811924
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3eaa0214455d'
+down_revision: Union[str, None] = '7f568e229a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tracking_points_delivery_id_timestamp', 'tracking_points', ['delivery_id', 'timestamp'], unique=False, mssql_include=['latitude', 'longitude'])
+    op.create_index('ix_tracking_points_delivery_id_event_type', 'tracking_points', ['delivery_id', 'event_type'], unique=False)
+    op.create_index('ix_deliveries_fec_id_status', 'deliveries', ['fec_id', 'status'], unique=False)
+    op.create_index('ix_fecs_fec_number_driver_id', 'fecs', ['fec_number', 'driver_id'], unique=False, mssql_include=['version', 'status'])
+    # El índice compuesto empieza por fec_number, así que el de una sola columna sobra
+    op.drop_index('ix_fecs_fec_number', table_name='fecs')
+
+
+def downgrade() -> None:
+    op.create_index('ix_fecs_fec_number', 'fecs', ['fec_number'], unique=False)
+    op.drop_index('ix_fecs_fec_number_driver_id', table_name='fecs')
+    op.drop_index('ix_deliveries_fec_id_status', table_name='deliveries')
+    op.drop_index('ix_tracking_points_delivery_id_event_type', table_name='tracking_points')
+    op.drop_index('ix_tracking_points_delivery_id_timestamp', table_name='tracking_points')
@@ -0,0 +1,36 @@
+"""upload_cursors
+
+Revision ID: 5b956a46e48c
+Revises: 3416a518df3c
+Create Date: 2026-10-18 13:02:44.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b956a46e48c'
+down_revision: Union[str, None] = '3416a518df3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('upload_cursors',
+    sa.Column('cursor_id', sa.Integer(), nullable=False),
+    sa.Column('driver_id', sa.Integer(), nullable=False),
+    sa.Column('upload_id', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('committed_lines', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['driver_id'], ['drivers.driver_id'], ),
+    sa.PrimaryKeyConstraint('cursor_id'),
+    sa.UniqueConstraint('driver_id', 'upload_id', name='uq_upload_cursors_driver_upload')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('upload_cursors')
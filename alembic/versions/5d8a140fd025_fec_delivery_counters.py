@@ -0,0 +1,29 @@
+"""fec_delivery_counters
+
+Revision ID: 5d8a140fd025
+Revises: 28eb7878d8d4
+Create Date: 2026-10-18 17:05:12.418306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8a140fd025'
+down_revision: Union[str, None] = '28eb7878d8d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sin backfill: la app los calcula por FEC la primera vez que cambia una de sus entregas
+    op.add_column('fecs', sa.Column('open_deliveries', sa.Integer(), nullable=True))
+    op.add_column('fecs', sa.Column('finalized_deliveries', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('fecs', 'finalized_deliveries')
+    op.drop_column('fecs', 'open_deliveries')
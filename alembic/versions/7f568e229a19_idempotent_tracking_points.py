@@ -0,0 +1,49 @@
+"""idempotent_tracking_points
+
+Revision ID: 7f568e229a19
+Revises: 5b956a46e48c
+Create Date: 2026-10-18 14:21:09.382716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f568e229a19'
+down_revision: Union[str, None] = '5b956a46e48c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIFECYCLE_INDEX_FILTER = "delivery_id IS NOT NULL AND event_type IN ('start_delivery', 'end_delivery')"
+
+
+def upgrade() -> None:
+    op.add_column('tracking_points', sa.Column('client_event_id', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+    # Antes de crear el índice único se conserva solo el primer evento de inicio/fin de cada entrega
+    op.execute(
+        f"DELETE FROM tracking_points WHERE {LIFECYCLE_INDEX_FILTER} "
+        f"AND point_id NOT IN (SELECT MIN(point_id) FROM tracking_points WHERE {LIFECYCLE_INDEX_FILTER} "
+        "GROUP BY delivery_id, event_type)"
+    )
+
+    op.create_index(
+        'ux_tracking_points_driver_client_event', 'tracking_points', ['driver_id', 'client_event_id'], unique=True,
+        mssql_where=sa.text('client_event_id IS NOT NULL'),
+        sqlite_where=sa.text('client_event_id IS NOT NULL'),
+    )
+    op.create_index(
+        'ux_tracking_points_delivery_lifecycle', 'tracking_points', ['delivery_id', 'event_type'], unique=True,
+        mssql_where=sa.text(LIFECYCLE_INDEX_FILTER),
+        sqlite_where=sa.text(LIFECYCLE_INDEX_FILTER),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_tracking_points_delivery_lifecycle', table_name='tracking_points')
+    op.drop_index('ux_tracking_points_driver_client_event', table_name='tracking_points')
+    op.drop_column('tracking_points', 'client_event_id')
@@ -0,0 +1,101 @@
+"""compact_fec_route
+
+Revision ID: 9c3e51d7a2b8
+Revises: 5d8a140fd025
+Create Date: 2026-10-18 18:02:41.377905
+
+"""
+import json
+import struct
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e51d7a2b8'
+down_revision: Union[str, None] = '5d8a140fd025'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+
+# Copia del formato de app/route_codec.py: la migración no depende del código de la app
+fecs = sa.table(
+    'fecs',
+    sa.column('fec_id', sa.Integer),
+    sa.column('optimized_order_list_json', sa.String),
+    sa.column('suggested_journey_polyline', sa.String),
+    sa.column('route_order', sa.LargeBinary),
+    sa.column('route_polyline', sa.LargeBinary),
+)
+
+
+def _parse_order(text):
+    if not text:
+        return None
+    try:
+        parsed = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(parsed, list) or not all(type(item) is int and _INT32_MIN <= item <= _INT32_MAX for item in parsed):
+        return None
+    return parsed
+
+
+def _batches(bind, where):
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(fecs).where(where, fecs.c.fec_id > last_id).order_by(fecs.c.fec_id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].fec_id
+
+
+def upgrade() -> None:
+    op.add_column('fecs', sa.Column('route_order', sa.LargeBinary(), nullable=True))
+    op.add_column('fecs', sa.Column('route_polyline', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    has_route = sa.or_(fecs.c.optimized_order_list_json.is_not(None), fecs.c.suggested_journey_polyline.is_not(None))
+    for rows in _batches(bind, has_route):
+        for row in rows:
+            values = {}
+            order = _parse_order(row.optimized_order_list_json)
+            if order is not None:
+                values['route_order'] = struct.pack(f'<{len(order)}i', *order)
+                values['optimized_order_list_json'] = None
+            if row.suggested_journey_polyline is not None:
+                values['route_polyline'] = zlib.compress(row.suggested_journey_polyline.encode('utf-8'), 6)
+            if values:
+                bind.execute(sa.update(fecs).where(fecs.c.fec_id == row.fec_id).values(**values))
+
+    with op.batch_alter_table('fecs') as batch_op:
+        batch_op.drop_column('suggested_journey_polyline')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('fecs') as batch_op:
+        batch_op.add_column(sa.Column('suggested_journey_polyline', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+    bind = op.get_bind()
+    has_route = sa.or_(fecs.c.route_order.is_not(None), fecs.c.route_polyline.is_not(None))
+    for rows in _batches(bind, has_route):
+        for row in rows:
+            values = {}
+            if row.route_order is not None:
+                order = struct.unpack(f'<{len(row.route_order) // 4}i', row.route_order)
+                values['optimized_order_list_json'] = json.dumps(list(order), separators=(',', ':'))
+            if row.route_polyline is not None:
+                values['suggested_journey_polyline'] = zlib.decompress(row.route_polyline).decode('utf-8')
+            bind.execute(sa.update(fecs).where(fecs.c.fec_id == row.fec_id).values(**values))
+
+    op.drop_column('fecs', 'route_polyline')
+    op.drop_column('fecs', 'route_order')
@@ -0,0 +1,44 @@
+"""notification_outbox
+
+Revision ID: ca929f2892c6
+Revises: 0fdb3a680274
+Create Date: 2026-10-18 10:41:07.532904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ca929f2892c6'
+down_revision: Union[str, None] = '0fdb3a680274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_outbox',
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('channel', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('delivery_id', sa.Integer(), nullable=True),
+    sa.Column('payload_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(length=1000), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['delivery_id'], ['deliveries.delivery_id'], ),
+    sa.PrimaryKeyConstraint('notification_id')
+    )
+    op.create_index(op.f('ix_notification_outbox_status'), 'notification_outbox', ['status'], unique=False)
+    op.create_index(op.f('ix_notification_outbox_next_attempt_at'), 'notification_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_notification_outbox_next_attempt_at'), table_name='notification_outbox')
+    op.drop_index(op.f('ix_notification_outbox_status'), table_name='notification_outbox')
+    op.drop_table('notification_outbox')
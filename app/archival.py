@@ -0,0 +1,197 @@
+# app/archival.py
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select
+
+from . import geo, logging_setup, models, track_codec
+
+logger = logging.getLogger(__name__)
+
+# Días que deben pasar desde que una entrega se finalizó para archivar su recorrido
+TRACK_ARCHIVE_AFTER_DAYS = int(os.getenv("TRACK_ARCHIVE_AFTER_DAYS", "30"))
+TRACK_ARCHIVE_DELIVERIES_PER_RUN = int(os.getenv("TRACK_ARCHIVE_DELIVERIES_PER_RUN", "500"))
+# Filas de tracking_points borradas por transacción
+TRACK_ARCHIVE_DELETE_BATCH_SIZE = int(os.getenv("TRACK_ARCHIVE_DELETE_BATCH_SIZE", "5000"))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _purgeable(table):
+    """
+    Puntos que se pueden borrar tras archivarlos: todos menos los de inicio/fin de entrega.
+    Esas filas se quedan en tracking_points porque la deduplicación de eventos
+    ((entrega, tipo) y eventId del conductor) se hace contra ellas: sin ellas, un
+    end_delivery reenviado volvería a completar la entrega y a mandar el SMS.
+    """
+    return or_(table.c.event_type.is_(None), table.c.event_type.not_in(models.LIFECYCLE_EVENT_TYPES))
+
+def find_archivable_deliveries(db: Session, cutoff: datetime, limit: int) -> List[int]:
+    """Entregas finalizadas antes de 'cutoff' que todavía tienen puntos sin archivar."""
+    has_points = select(models.TrackingPoint.point_id).where(
+        models.TrackingPoint.delivery_id == models.Delivery.delivery_id
+    ).exists()
+    archived = select(models.TrackSegment.delivery_id).where(
+        models.TrackSegment.delivery_id == models.Delivery.delivery_id
+    ).exists()
+    statement = (
+        select(models.Delivery.delivery_id)
+        .where(
+            models.Delivery.status.in_(models.FINAL_DELIVERY_STATUSES),
+            models.Delivery.delivery_time < cutoff,
+            has_points,
+            ~archived
+        )
+        .order_by(models.Delivery.delivery_time)
+        .limit(limit)
+    )
+    return db.exec(statement).all()
+
+def find_unpurged_segments(db: Session, limit: int) -> List[Tuple[int, int]]:
+    """Segmentos cuya purga quedó a medias (por ejemplo, el job se interrumpió): (delivery_id, last_point_id)."""
+    pending_points = select(models.TrackingPoint.point_id).where(
+        models.TrackingPoint.delivery_id == models.TrackSegment.delivery_id,
+        models.TrackingPoint.point_id <= models.TrackSegment.last_point_id,
+        _purgeable(models.TrackingPoint.__table__)
+    ).exists()
+    statement = (
+        select(models.TrackSegment.delivery_id, models.TrackSegment.last_point_id)
+        .where(pending_points)
+        .limit(limit)
+    )
+    return db.exec(statement).all()
+
+def archive_delivery_track(db: Session, delivery_id: int) -> models.TrackSegment | None:
+    """
+    Empaqueta los puntos de una entrega en un TrackSegment (sin borrarlos ni hacer commit).
+    Las coordenadas se guardan con 1e-6 grados de precisión y el tiempo en milisegundos.
+    """
+    rows = db.exec(
+        select(
+            models.TrackingPoint.point_id,
+            models.TrackingPoint.latitude,
+            models.TrackingPoint.longitude,
+            models.TrackingPoint.timestamp,
+            models.TrackingPoint.event_type,
+            models.TrackingPoint.driver_id,
+            models.TrackingPoint.client_event_id
+        )
+        .where(models.TrackingPoint.delivery_id == delivery_id)
+        .order_by(models.TrackingPoint.timestamp, models.TrackingPoint.point_id)
+    ).all()
+    if not rows:
+        return None
+
+    driver_ids = {row.driver_id for row in rows}
+    if len(driver_ids) > 1:
+        # El formato guarda un solo conductor por segmento
+        logger.warning("La entrega %s tiene puntos de varios conductores (%s); no se archiva.", delivery_id, sorted(driver_ids))
+        return None
+
+    event_types = list(dict.fromkeys(row.event_type or "" for row in rows))
+    codes = {name: code for code, name in enumerate(event_types)}
+    batch = track_codec.TrackBatch(
+        latitude=np.array([row.latitude for row in rows], dtype=np.float64),
+        longitude=np.array([row.longitude for row in rows], dtype=np.float64),
+        timestamp_ms=np.array([track_codec.epoch_ms(row.timestamp) for row in rows], dtype=np.int64),
+        event_type=np.array([codes[row.event_type or ""] for row in rows], dtype=np.uint8),
+        delivery_id=np.full(len(rows), delivery_id, dtype=np.int64),
+        event_types=event_types,
+        extras={index: {"eventId": row.client_event_id} for index, row in enumerate(rows) if row.client_event_id},
+    )
+
+    segment = models.TrackSegment(
+        delivery_id=delivery_id,
+        driver_id=driver_ids.pop(),
+        point_count=len(rows),
+        started_at=rows[0].timestamp,
+        ended_at=rows[-1].timestamp,
+        distance_km=geo.track_length_km(batch.latitude, batch.longitude),
+        last_point_id=max(row.point_id for row in rows),
+        encoding=track_codec.MAGIC.decode(),
+        payload=track_codec.encode_batch(batch),
+    )
+    db.add(segment)
+    return segment
+
+def purge_archived_points(db: Session, delivery_id: int, last_point_id: int, batch_size: int | None = None) -> int:
+    """
+    Borra los puntos ya archivados de una entrega en lotes de 'batch_size' filas,
+    con un commit por lote para no mantener bloqueos ni crecer el log de transacciones.
+    Los pings posteriores al archivado (point_id mayor) y los eventos de inicio/fin se conservan.
+    """
+    batch_size = batch_size or TRACK_ARCHIVE_DELETE_BATCH_SIZE
+    table = models.TrackingPoint.__table__
+    deleted = 0
+    while True:
+        batch_ids = (
+            select(table.c.point_id)
+            .where(table.c.delivery_id == delivery_id, table.c.point_id <= last_point_id, _purgeable(table))
+            .limit(batch_size)
+        )
+        count = db.execute(delete(table).where(table.c.point_id.in_(batch_ids))).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def run_archival(
+    session_factory: Callable[[], Session],
+    older_than_days: int | None = None,
+    max_deliveries: int | None = None,
+    delete_batch_size: int | None = None,
+) -> dict:
+    """
+    Archiva los recorridos de las entregas finalizadas hace más de 'older_than_days' días:
+    un segmento comprimido por entrega y después el borrado por lotes de los puntos crudos
+    (los eventos de inicio/fin se conservan).
+    Antes termina las purgas que hayan quedado a medias. Devuelve un resumen de la corrida.
+    """
+    older_than_days = TRACK_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    max_deliveries = max_deliveries or TRACK_ARCHIVE_DELIVERIES_PER_RUN
+    cutoff = _utcnow() - timedelta(days=older_than_days)
+    summary = {"archived_deliveries": 0, "resumed_purges": 0, "deleted_points": 0, "failed_deliveries": 0}
+
+    with session_factory() as db:
+        for delivery_id, last_point_id in find_unpurged_segments(db, max_deliveries):
+            summary["deleted_points"] += purge_archived_points(db, delivery_id, last_point_id, delete_batch_size)
+            summary["resumed_purges"] += 1
+
+        for delivery_id in find_archivable_deliveries(db, cutoff, max_deliveries):
+            try:
+                segment = archive_delivery_track(db, delivery_id)
+                db.commit()
+            except Exception:
+                db.rollback()
+                summary["failed_deliveries"] += 1
+                logger.error("Error al archivar el recorrido de la entrega %s.", delivery_id, exc_info=True)
+                continue
+            if segment is None:
+                continue
+            summary["archived_deliveries"] += 1
+            summary["deleted_points"] += purge_archived_points(db, delivery_id, segment.last_point_id, delete_batch_size)
+
+    logger.info(
+        "Archivado de recorridos: %s entregas archivadas, %s purgas reanudadas, %s puntos borrados, %s fallos.",
+        summary["archived_deliveries"], summary["resumed_purges"], summary["deleted_points"], summary["failed_deliveries"]
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Archiva los recorridos de entregas finalizadas en track_segments.")
+    parser.add_argument("--days", type=int, default=None, help="Antigüedad mínima en días (TRACK_ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de entregas por corrida (TRACK_ARCHIVE_DELIVERIES_PER_RUN)")
+    args = parser.parse_args()
+
+    logging_setup.configure_logging()
+    run_archival(lambda: Session(database.engine), older_than_days=args.days, max_deliveries=args.limit)
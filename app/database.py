@@ -1,8 +1,14 @@
 # app/database.py
 
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from dotenv import load_dotenv
 import os
+import threading
+import time
 import urllib
 
 load_dotenv()
@@ -17,10 +23,154 @@ params = urllib.parse.quote_plus(
     f"Trusted_Connection=yes;"
 )
 
-SQLALCHEMY_DATABASE_URL = f"mssql+pyodbc:///?odbc_connect={params}"
+# DATABASE_URL permite apuntar a otra BD (por ejemplo sqlite:///./local.db para desarrollo)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"mssql+pyodbc:///?odbc_connect={params}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+# URL del driver asíncrono (p. ej. sqlite+aiosqlite:///./local.db o mssql+aioodbc://...).
+# Si se define, la lectura de FEC se sirve con sesiones async; la ingesta sigue en el camino síncrono.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+# --- Configuración del motor y del pool de conexiones ---
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_FAST_EXECUTEMANY = _env_bool("DB_FAST_EXECUTEMANY", True)
+# SQLite: BEGIN IMMEDIATE toma el bloqueo de escritura al empezar; evita los "database is locked"
+# de transacciones que leen y luego escriben cuando hay peticiones concurrentes
+SQLITE_BEGIN_IMMEDIATE = _env_bool("SQLITE_BEGIN_IMMEDIATE", False)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada petición para obtener una conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def _enable_sqlite_savepoints(engine):
+    """pysqlite abre transacciones por su cuenta y rompe los SAVEPOINT: se delega a SQLAlchemy."""
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE" if SQLITE_BEGIN_IMMEDIATE else "BEGIN")
+
+
+def create_db_engine(url: str | None = None):
+    """
+    Crea el motor de la BD a partir de las variables de entorno DB_*.
+    SQL Server usa un pool con tamaño, overflow, pre-ping y reciclaje configurables
+    (y fast_executemany de pyodbc); SQLite se configura para pruebas locales.
+    """
+    url = url or SQLALCHEMY_DATABASE_URL
+
+    if url.startswith("sqlite"):
+        options = {"echo": DB_ECHO, "connect_args": {"check_same_thread": False}}
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            # Una sola conexión compartida: si no, cada conexión vería una BD vacía distinta
+            options["poolclass"] = StaticPool
+        sqlite_engine = create_engine(url, **options)
+        _enable_sqlite_savepoints(sqlite_engine)
+        return sqlite_engine
+
+    options = {
+        "echo": DB_ECHO,
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.startswith("mssql+pyodbc"):
+        options["fast_executemany"] = DB_FAST_EXECUTEMANY
+    return create_engine(url, **options)
+
+
+def create_async_db_engine(url: str | None = None):
+    """Crea el motor asíncrono con la misma configuración de pool que create_db_engine."""
+    url = url or ASYNC_DATABASE_URL
+
+    if url.startswith("sqlite"):
+        options = {"echo": DB_ECHO}
+        if url.endswith(":memory:") or url.endswith("://"):
+            options["poolclass"] = StaticPool
+        async_sqlite_engine = create_async_engine(url, **options)
+        _enable_sqlite_savepoints(async_sqlite_engine.sync_engine)
+        return async_sqlite_engine
+
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+def get_pool_stats(db_engine=None) -> dict:
+    """
+    Estadísticas del pool de conexiones: conexiones prestadas, overflow y tiempo de
+    espera para obtener una conexión. Sirven para dimensionar el pool contra los workers.
+    """
+    pool = (db_engine or engine).pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "checkout_timeouts": pool.checkout_timeouts,
+                "avg_wait_ms": round(pool.total_wait_seconds / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                "max_wait_ms": round(pool.max_wait_seconds * 1000, 3),
+            })
+    return stats
+
+
+engine = create_db_engine()
+async_engine = create_async_db_engine() if ASYNC_DATABASE_URL else None
 
 def get_db():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_db():
+    # expire_on_commit=False: en async no se puede recargar un atributo de forma implícita
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
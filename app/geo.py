@@ -0,0 +1,63 @@
+# app/geo.py
+
+from math import atan2, cos, radians, sin, sqrt
+from typing import Dict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calcula la distancia en kilómetros entre dos coordenadas usando la fórmula de haversine."""
+    lat1, lon1 = radians(lat1), radians(lon1)
+    lat2, lon2 = radians(lat2), radians(lon2)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+
+    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+def haversine_km_array(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de haversine_km: calcula la distancia entre pares de coordenadas en arreglos."""
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+def track_length_km(latitudes: np.ndarray, longitudes: np.ndarray) -> float:
+    """
+    Longitud en kilómetros de un recorrido con puntos ya ordenados por tiempo.
+    Suma los tramos en orden (cumsum) para reproducir exactamente el bucle escalar original.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.size < 2:
+        return 0.0
+    segments = haversine_km_array(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    return float(np.cumsum(segments)[-1])
+
+def track_lengths_km(group_ids: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray) -> Dict[int, float]:
+    """
+    Longitud de varios recorridos a la vez. Los arreglos deben venir ordenados por
+    grupo (delivery_id) y luego por tiempo; los tramos entre grupos distintos se descartan.
+    """
+    group_ids = np.asarray(group_ids)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if group_ids.size == 0:
+        return {}
+
+    segments = haversine_km_array(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    segments[group_ids[:-1] != group_ids[1:]] = 0.0
+
+    starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+    # El tramo i une el punto i con el i+1, así que cada grupo suma los tramos [inicio, fin - 1)
+    totals = np.add.reduceat(np.r_[segments, 0.0], starts)
+    return {int(group_id): float(total) for group_id, total in zip(group_ids[starts], totals)}
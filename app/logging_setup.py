@@ -0,0 +1,178 @@
+# app/logging_setup.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict
+
+# Con "true", main.py pasa los logs de la app por la cola con escritura en segundo plano
+LOG_PIPELINE_ENABLED = os.getenv("LOG_PIPELINE_ENABLED", "true").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (una línea JSON por registro) o "text" (formato legible para desarrollo)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Registros en espera de escribirse; con la cola llena se descartan en vez de bloquear la petición
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+LOG_MAX_TRACEBACK_CHARS = int(os.getenv("LOG_MAX_TRACEBACK_CHARS", "8000"))
+# Fracción de registros que se escribe por logger, p. ej. "app.services.duplicates=0.01,app.streaming=0.5".
+# Solo aplica por debajo de ERROR; los errores siempre se escriben.
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "app.services.duplicates=0.01")
+
+# Atributos propios de LogRecord: todo lo demás llegó por 'extra' y va como campo del JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sampled"}
+
+_stats = {"queued": 0, "dropped": 0, "sampled_out": 0}
+_stats_lock = threading.Lock()
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} caracteres omitidos]"
+
+def parse_sample_rates(text: str) -> Dict[str, float]:
+    rates = {}
+    for part in filter(None, (item.strip() for item in text.split(","))):
+        name, _, rate = part.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar 1 de cada N registros de los loggers configurados (N = 1 / tasa),
+    usando la configuración del logger más específico. El registro que pasa lleva
+    en 'sampled' cuántos se omitieron desde el anterior.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, logger_name: str) -> tuple:
+        name = logger_name
+        while name:
+            if name in self.rates:
+                return name, self.rates[name]
+            name = name.rpartition(".")[0]
+        return None, 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        key, rate = self._rate_for(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            _count("sampled_out")
+            return False
+        every = round(1 / rate)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % every:
+            _count("sampled_out")
+            return False
+        record.sampled = every - 1 if seen else 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin bloquear. En el hilo de la petición solo se arma el mensaje
+    (ya truncado) y el traceback; el JSON y la escritura ocurren en el hilo del listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS)
+        prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = truncate(logging.Formatter().formatException(record.exc_info), LOG_MAX_TRACEBACK_CHARS)
+        prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            _count("queued")
+        except queue.Full:
+            _count("dropped")
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de 'extra' incluidos."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "sampled", 0):
+            entry["sampled"] = record.sampled
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                # Respuestas de proveedores y similares: se truncan si son muy grandes
+                encoded = json.dumps(value, ensure_ascii=False, default=str)
+                entry[key] = value if len(encoded) <= LOG_MAX_MESSAGE_CHARS else truncate(encoded, LOG_MAX_MESSAGE_CHARS)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(stream=None) -> logging.handlers.QueueListener:
+    """
+    Manda todos los registros del proceso a una cola que vacía un hilo de fondo.
+    Idempotente: si ya está configurado devuelve el listener existente.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """Escribe lo que quede en la cola y detiene el hilo del listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def stats() -> dict:
+    """Registros encolados, descartados por cola llena y omitidos por muestreo en este worker."""
+    with _stats_lock:
+        return {"enabled": _listener is not None, "format": LOG_FORMAT, "queue_size": LOG_QUEUE_SIZE, **_stats}
@@ -2,7 +2,12 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import auth, fec, events
+from sqlmodel import Session
+from . import database, logging_setup, metrics, notifications, security, write_buffer
+from .routers import auth, fec, events, fec_async, internal
+
+if logging_setup.LOG_PIPELINE_ENABLED:
+    logging_setup.configure_logging()
 
 app = FastAPI(
     title="Choferes App Backend",
@@ -19,13 +24,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if metrics.METRICS_ENABLED:
+    # Consultas, tiempo en BD y tiempo total por ruta; se publican en /metrics
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(database.engine)
+    if database.async_engine is not None:
+        metrics.instrument_engine(database.async_engine.sync_engine)
+
+@app.on_event("startup")
+def start_logging():
+    # No hace nada si ya está corriendo; reanuda el listener si un shutdown anterior lo detuvo
+    if logging_setup.LOG_PIPELINE_ENABLED:
+        logging_setup.configure_logging()
+
+notification_dispatcher = notifications.NotificationDispatcher(lambda: Session(database.engine))
+
+@app.on_event("startup")
+def start_notification_dispatcher():
+    if notifications.DISPATCHER_MODE == "inprocess":
+        notification_dispatcher.start()
+
+@app.on_event("shutdown")
+def stop_notification_dispatcher():
+    if notifications.DISPATCHER_MODE == "inprocess":
+        notification_dispatcher.stop()
+
+@app.on_event("startup")
+def start_tracking_buffer():
+    if write_buffer.TRACKING_BUFFER_ENABLED:
+        write_buffer.tracking_buffer.start()
+
+@app.on_event("shutdown")
+def drain_tracking_buffer():
+    if write_buffer.TRACKING_BUFFER_ENABLED:
+        write_buffer.tracking_buffer.stop()
+
+@app.on_event("startup")
+def start_password_pool():
+    security.start_password_pool()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    security.shutdown_password_pool()
+
+@app.on_event("shutdown")
+def flush_logs():
+    # Último hook: los anteriores todavía pueden escribir en el log
+    logging_setup.shutdown_logging()
+
 app.include_router(auth.router)
+if database.async_engine is not None:
+    # Modo async: sus rutas se registran primero y tienen prioridad sobre las síncronas
+    app.include_router(fec_async.router)
 app.include_router(fec.router)
 app.include_router(events.router)
+app.include_router(internal.router)
 
 @app.get("/", tags=["Root"])
 def read_root():
     """
     Endpoint principal que devuelve un mensaje de bienvenida.
     """
-    return {"status": "ok", "message": "Backend de la App de Choferes está funcionando!"}
\ No newline at end of file
+    return {"status": "ok", "message": "Backend de la App de Choferes está funcionando!"}
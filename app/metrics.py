@@ -0,0 +1,183 @@
+# app/metrics.py
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+
+# Métricas por petición: consultas SQL, tiempo en BD y tiempo total por ruta
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Con "true" cada respuesta incluye el header Server-Timing (db y app)
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() == "true"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Rutas sin plantilla (404) comparten etiqueta para no disparar la cardinalidad
+UNMATCHED_ROUTE = "unmatched"
+EXCLUDED_PATHS = ("/metrics",)
+
+
+@dataclass
+class RequestMetrics:
+    """Acumulado de la petición en curso; los hilos del threadpool lo ven por contextvars."""
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+_current_request: contextvars.ContextVar[RequestMetrics | None] = contextvars.ContextVar("request_metrics", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_query_start"].pop()
+    current = _current_request.get()
+    if current is not None:
+        current.queries += 1
+        current.db_seconds += time.perf_counter() - started
+
+def _handle_error(exception_context):
+    # Una consulta fallida no llega a after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_query_start"):
+        connection.info["metrics_query_start"].pop()
+
+def instrument_engine(engine):
+    """Registra los eventos de un motor síncrono (o el sync_engine de uno async)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class Histogram:
+    """Histograma acumulado con buckets fijos, en el formato que espera Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class MetricsRegistry:
+    """Métricas de las peticiones HTTP de este worker, indexadas por (método, ruta)."""
+
+    HISTOGRAMS = {
+        "http_request_duration_seconds": ("Tiempo total de la petición", DURATION_BUCKETS),
+        "http_request_db_seconds": ("Tiempo en la BD durante la petición", DURATION_BUCKETS),
+        "http_request_db_queries": ("Consultas SQL ejecutadas por la petición", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple[str, str], Histogram]] = {name: {} for name in self.HISTOGRAMS}
+        self._responses: Dict[Tuple[str, str, str], int] = defaultdict(int)
+
+    def record(self, method: str, route: str, status_code: int, total_seconds: float, request: RequestMetrics):
+        key = (method, route)
+        values = {
+            "http_request_duration_seconds": total_seconds,
+            "http_request_db_seconds": request.db_seconds,
+            "http_request_db_queries": request.queries,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histograms = self._histograms[name]
+                if key not in histograms:
+                    histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                histograms[key].observe(value)
+            self._responses[(method, route, str(status_code))] += 1
+
+    def render(self) -> str:
+        """Exposición en texto de Prometheus (versión 0.0.4)."""
+        lines: List[str] = [
+            "# HELP http_requests_total Peticiones HTTP atendidas por este worker",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            for (method, route, status_code), count in sorted(self._responses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status_code}"}} {count}')
+            for name, (description, buckets) in self.HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(self._histograms[name].items()):
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                    cumulative += histogram.counts[-1]
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def server_timing(request: RequestMetrics, total_seconds: float) -> str:
+    return (
+        f'db;dur={request.db_seconds * 1000:.1f};desc="{request.queries} queries", '
+        f"app;dur={total_seconds * 1000:.1f}"
+    )
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP: abre un RequestMetrics en el contexto
+    (lo llenan los eventos del motor), agrega Server-Timing a la respuesta y registra
+    los histogramas con la plantilla de la ruta, p. ej. /fec/{fec_number}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        token = _current_request.set(request)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if METRICS_SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(request, time.perf_counter() - started).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            registry.record(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - started,
+                request,
+            )
@@ -1,9 +1,16 @@
 # app/models.py
 
+from sqlalchemy import Column, Index, LargeBinary, UniqueConstraint, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import date, datetime, timezone
 
+# Estados con los que una entrega ya no cuenta como abierta
+FINAL_DELIVERY_STATUSES = ("completed", "cancelled")
+# Eventos de inicio/fin de entrega: se deduplican por (entrega, tipo) y nunca se archivan
+LIFECYCLE_EVENT_TYPES = ("start_delivery", "end_delivery")
+LIFECYCLE_INDEX_FILTER = "delivery_id IS NOT NULL AND event_type IN ('start_delivery', 'end_delivery')"
+
 class Driver(SQLModel, table=True):
     __tablename__ = "drivers"
 
@@ -41,21 +48,37 @@ class Client(SQLModel, table=True):
 
 class FEC(SQLModel, table=True):
     __tablename__ = "fecs"
+    __table_args__ = (
+        # GET /fec/{fec_number}: busca por número y conductor y lee versión/estado sin ir a la tabla
+        Index("ix_fecs_fec_number_driver_id", "fec_number", "driver_id", mssql_include=["version", "status"]),
+    )
 
     fec_id: Optional[int] = Field(default=None, primary_key=True)
-    fec_number: int = Field(index=True)
+    fec_number: int
     fec_date: date = Field(default_factory=date.today)
     status: str = Field(default="active", max_length=50)
 
     driver_id: Optional[int] = Field(default=None, foreign_key="drivers.driver_id")
+    # Ruta optimizada en forma compacta (app/route_codec.py): IDs empaquetados y polilínea comprimida
+    route_order: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    route_polyline: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    # Solo cuando el orden recibido no es una lista de enteros: se conserva el texto original
     optimized_order_list_json: Optional[str] = None
-    suggested_journey_polyline: Optional[str] = None
+    # Se incrementa con cada cambio visible en la respuesta del FEC (entregas, ruta, estado)
+    version: int = Field(default=1)
+    # Entregas abiertas/finalizadas; NULL hasta que se calculan la primera vez que se necesitan
+    open_deliveries: Optional[int] = None
+    finalized_deliveries: Optional[int] = None
 
     deliveries: List["Delivery"] = Relationship(back_populates="fec")
     driver: Optional["Driver"] = Relationship(back_populates="fecs")
 
 class Delivery(SQLModel, table=True):
     __tablename__ = "deliveries"
+    __table_args__ = (
+        # Entregas de un FEC y conteo de las que siguen pendientes
+        Index("ix_deliveries_fec_id_status", "fec_id", "status"),
+    )
 
     # --- IDs y Relaciones ---
     delivery_id: Optional[int] = Field(default=None, primary_key=True)
@@ -92,18 +115,111 @@ class Delivery(SQLModel, table=True):
     driver: Optional["Driver"] = Relationship(back_populates="deliveries")
     client: Optional["Client"] = Relationship(back_populates="deliveries")
     tracking_points: List["TrackingPoint"] = Relationship(back_populates="delivery")
+    track_stats: Optional["DeliveryTrackStats"] = Relationship(back_populates="delivery")
+
+class DeliveryTrackStats(SQLModel, table=True):
+    __tablename__ = "delivery_track_stats"
+
+    # Estado acumulado de la distancia recorrida, actualizado al llegar cada punto
+    delivery_id: Optional[int] = Field(default=None, foreign_key="deliveries.delivery_id", primary_key=True)
+    point_count: int = Field(default=0)
+    distance_km: float = Field(default=0.0)
+    last_latitude: Optional[float] = None
+    last_longitude: Optional[float] = None
+    last_timestamp: Optional[datetime] = None
+    # Se activa cuando llega un punto atrasado; la distancia se recalcula completa al finalizar
+    needs_recompute: bool = Field(default=False)
+
+    delivery: Optional["Delivery"] = Relationship(back_populates="track_stats")
 
 class TrackingPoint(SQLModel, table=True):
     __tablename__ = "tracking_points"
+    __table_args__ = (
+        # Reintentos del teléfono: un mismo eventId del conductor se guarda una sola vez
+        Index(
+            "ux_tracking_points_driver_client_event", "driver_id", "client_event_id", unique=True,
+            mssql_where=text("client_event_id IS NOT NULL"),
+            sqlite_where=text("client_event_id IS NOT NULL"),
+        ),
+        # Un solo 'start_delivery' y un solo 'end_delivery' por entrega
+        Index(
+            "ux_tracking_points_delivery_lifecycle", "delivery_id", "event_type", unique=True,
+            mssql_where=text(LIFECYCLE_INDEX_FILTER),
+            sqlite_where=text(LIFECYCLE_INDEX_FILTER),
+        ),
+        # Recorrido de una o varias entregas ordenado por tiempo (cálculo de distancias)
+        Index(
+            "ix_tracking_points_delivery_id_timestamp", "delivery_id", "timestamp",
+            mssql_include=["latitude", "longitude"],
+        ),
+        Index("ix_tracking_points_delivery_id_event_type", "delivery_id", "event_type"),
+    )
     
     point_id: Optional[int] = Field(default=None, primary_key=True)
     latitude: float
     longitude: float
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     event_type: Optional[str] = Field(default=None, max_length=50)
+    client_event_id: Optional[str] = Field(default=None, max_length=64)
 
     driver_id: Optional[int] = Field(default=None, foreign_key="drivers.driver_id")
     delivery_id: Optional[int] = Field(default=None, foreign_key="deliveries.delivery_id")
 
     driver: Optional["Driver"] = Relationship(back_populates="tracking_points")
-    delivery: Optional["Delivery"] = Relationship(back_populates="tracking_points")
\ No newline at end of file
+    delivery: Optional["Delivery"] = Relationship(back_populates="tracking_points")
+
+class TrackSegment(SQLModel, table=True):
+    __tablename__ = "track_segments"
+
+    # Recorrido archivado de una entrega finalizada (formato de app/track_codec.py)
+    delivery_id: Optional[int] = Field(default=None, foreign_key="deliveries.delivery_id", primary_key=True)
+    driver_id: Optional[int] = Field(default=None, foreign_key="drivers.driver_id")
+    point_count: int
+    started_at: datetime
+    ended_at: datetime
+    distance_km: float
+    # Último point_id archivado: los puntos posteriores (pings atrasados) siguen en tracking_points
+    last_point_id: int
+    encoding: str = Field(default="TRK1", max_length=10)
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class NotificationOutbox(SQLModel, table=True):
+    __tablename__ = "notification_outbox"
+
+    notification_id: Optional[int] = Field(default=None, primary_key=True)
+    channel: str = Field(max_length=20)  # "sms" o "whatsapp"
+    delivery_id: Optional[int] = Field(default=None, foreign_key="deliveries.delivery_id")
+    payload_json: str
+
+    # --- Estado del envío: pending -> sending -> sent | dead ---
+    status: str = Field(default="pending", max_length=20, index=True)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+    last_error: Optional[str] = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: Optional[datetime] = None
+
+
+class UploadCursor(SQLModel, table=True):
+    __tablename__ = "upload_cursors"
+    __table_args__ = (UniqueConstraint("driver_id", "upload_id", name="uq_upload_cursors_driver_upload"),)
+
+    # Progreso de una subida en streaming: cuántas líneas NDJSON ya quedaron guardadas
+    cursor_id: Optional[int] = Field(default=None, primary_key=True)
+    driver_id: int = Field(foreign_key="drivers.driver_id")
+    upload_id: str = Field(max_length=64)
+    committed_lines: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class RefreshToken(SQLModel, table=True):
+    __tablename__ = "refresh_tokens"
+
+    # Cada refresh token emitido: /auth/refresh lo revoca al rotarlo y reusar uno revocado revoca su familia
+    jti: str = Field(primary_key=True, max_length=36)
+    family_id: str = Field(max_length=36, index=True)
+    driver_id: int = Field(foreign_key="drivers.driver_id", index=True)
+    expires_at: datetime
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    revoked_at: Optional[datetime] = None
@@ -0,0 +1,248 @@
+# app/notifications.py
+
+import json
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from . import logging_setup, models, sms_service, whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+# Canales a los que se envía la notificación de entrega completada, separados por coma
+COMPLETION_CHANNELS = [
+    channel.strip()
+    for channel in os.getenv("COMPLETION_NOTIFICATION_CHANNELS", "sms").split(",")
+    if channel.strip()
+]
+# "inprocess": el dispatcher corre en un hilo de la API; "external": lo corre `python -m app.notifications`
+DISPATCHER_MODE = os.getenv("NOTIFICATION_DISPATCHER_MODE", "inprocess")
+DISPATCH_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "50"))
+DISPATCH_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+POLL_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_POLL_INTERVAL_SECONDS", "2"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = float(os.getenv("NOTIFICATION_BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFICATION_BACKOFF_MAX_SECONDS", "900"))
+# Tiempo que una notificación queda reservada por un dispatcher antes de poder reintentarse
+CLAIM_LEASE_SECONDS = float(os.getenv("NOTIFICATION_CLAIM_LEASE_SECONDS", "60"))
+
+
+def _send_sms(payload: dict) -> bool:
+    return sms_service.send_completion_sms(
+        salesperson_phone=payload["salesperson_phone"],
+        client_id=payload["client_id"],
+        invoice_id=payload["invoice_id"],
+    )
+
+def _send_whatsapp(payload: dict) -> bool:
+    return whatsapp_service.send_completion_whatsapp(
+        salesperson_phone=payload["salesperson_phone"],
+        client_id=payload["client_id"],
+        invoice_id=payload["invoice_id"],
+        client_name=payload["client_name"],
+    )
+
+# Proveedor por canal. Cada uno recibe el payload y devuelve True si el envío fue aceptado.
+PROVIDERS: Dict[str, Callable[[dict], bool]] = {
+    "sms": _send_sms,
+    "whatsapp": _send_whatsapp,
+}
+
+def register_provider(channel: str, provider: Callable[[dict], bool]):
+    """Reemplaza el proveedor de un canal (por ejemplo, con un stub local en pruebas)."""
+    PROVIDERS[channel] = provider
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def enqueue_completion_notifications(db: Session, delivery: models.Delivery) -> List[models.NotificationOutbox]:
+    """
+    Registra en el outbox las notificaciones de entrega completada para el vendedor.
+    Se guardan en la misma transacción que la actualización de la entrega; el envío real
+    lo hace el dispatcher fuera de la petición.
+    """
+    payload = {
+        "salesperson_phone": delivery.client.salesperson.phone,
+        "client_id": delivery.client.client_id,
+        "client_name": delivery.client.name,
+        "invoice_id": delivery.invoice_id,
+    }
+    notifications = []
+    for channel in COMPLETION_CHANNELS:
+        notification = models.NotificationOutbox(
+            channel=channel,
+            delivery_id=delivery.delivery_id,
+            payload_json=json.dumps(payload),
+            next_attempt_at=_utcnow(),
+        )
+        db.add(notification)
+        notifications.append(notification)
+    return notifications
+
+def _backoff_delay(attempts: int) -> float:
+    """Backoff exponencial con jitter para el reintento número `attempts`."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+def _claim_due_notifications(db: Session, limit: int) -> List[models.NotificationOutbox]:
+    """
+    Reserva notificaciones vencidas para este dispatcher. Cada reserva es un UPDATE
+    condicional, así que dos dispatchers nunca toman la misma fila. Las filas 'sending'
+    cuya reserva expiró (dispatcher caído) se vuelven a tomar.
+    """
+    now = _utcnow()
+    candidates = db.exec(
+        select(models.NotificationOutbox.notification_id)
+        .where(
+            models.NotificationOutbox.status.in_(["pending", "sending"]),
+            models.NotificationOutbox.next_attempt_at <= now
+        )
+        .order_by(models.NotificationOutbox.next_attempt_at)
+        .limit(limit)
+    ).all()
+
+    claimed_ids = []
+    lease_until = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+    for notification_id in candidates:
+        result = db.execute(
+            update(models.NotificationOutbox.__table__)
+            .where(
+                models.NotificationOutbox.__table__.c.notification_id == notification_id,
+                models.NotificationOutbox.__table__.c.status.in_(["pending", "sending"]),
+                models.NotificationOutbox.__table__.c.next_attempt_at <= now
+            )
+            .values(
+                status="sending",
+                next_attempt_at=lease_until,
+                attempts=models.NotificationOutbox.__table__.c.attempts + 1
+            )
+        )
+        if result.rowcount == 1:
+            claimed_ids.append(notification_id)
+    db.commit()
+
+    if not claimed_ids:
+        return []
+    return db.exec(
+        select(models.NotificationOutbox).where(models.NotificationOutbox.notification_id.in_(claimed_ids))
+    ).all()
+
+def _deliver(channel: str, payload_json: str) -> str | None:
+    """Envía una notificación con su proveedor. Devuelve None si tuvo éxito o el motivo del fallo."""
+    provider = PROVIDERS.get(channel)
+    if provider is None:
+        return f"Canal sin proveedor: {channel}"
+    try:
+        if provider(json.loads(payload_json)):
+            return None
+        return "El proveedor rechazó el mensaje."
+    except Exception as e:
+        return f"Error inesperado del proveedor: {e}"
+
+def dispatch_pending(session_factory: Callable[[], Session], executor: ThreadPoolExecutor, limit: int = DISPATCH_BATCH_SIZE) -> int:
+    """
+    Procesa un lote del outbox: reserva las notificaciones vencidas, las envía en paralelo
+    y registra el resultado. Los fallos se reprograman con backoff y, al agotar
+    MAX_ATTEMPTS, pasan a 'dead'. Devuelve cuántas notificaciones se procesaron.
+    La reserva y el resultado usan sesiones distintas: mientras se espera a los proveedores
+    no queda ninguna conexión del pool ocupada.
+    """
+    with session_factory() as db:
+        claimed = [
+            (notification.notification_id, notification.channel, notification.payload_json)
+            for notification in _claim_due_notifications(db, limit)
+        ]
+    if not claimed:
+        return 0
+
+    jobs = [(notification_id, executor.submit(_deliver, channel, payload_json)) for notification_id, channel, payload_json in claimed]
+    errors = {notification_id: job.result() for notification_id, job in jobs}
+
+    with session_factory() as db:
+        notifications = db.exec(
+            select(models.NotificationOutbox).where(models.NotificationOutbox.notification_id.in_(list(errors)))
+        ).all()
+        for notification in notifications:
+            error = errors[notification.notification_id]
+            if error is None:
+                notification.status = "sent"
+                notification.sent_at = _utcnow()
+                notification.last_error = None
+            elif notification.attempts >= MAX_ATTEMPTS:
+                notification.status = "dead"
+                notification.last_error = error[:1000]
+                logger.error(
+                    "Notificación %s (%s) descartada tras %s intentos: %s",
+                    notification.notification_id, notification.channel, notification.attempts, error
+                )
+            else:
+                notification.status = "pending"
+                notification.next_attempt_at = _utcnow() + timedelta(seconds=_backoff_delay(notification.attempts))
+                notification.last_error = error[:1000]
+                logger.warning(
+                    "Notificación %s (%s) falló en el intento %s; se reintentará: %s",
+                    notification.notification_id, notification.channel, notification.attempts, error
+                )
+            db.add(notification)
+        db.commit()
+    return len(jobs)
+
+class NotificationDispatcher:
+    """Hilo en segundo plano que vacía el outbox periódicamente."""
+
+    def __init__(self, session_factory: Callable[[], Session], workers: int = DISPATCH_WORKERS, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Un executor por arranque: stop() apaga el anterior y no acepta más envíos
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notification-sender")
+        self._thread = threading.Thread(target=self._run, args=(self._executor,), name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _run(self, executor: ThreadPoolExecutor):
+        while not self._stop.is_set():
+            try:
+                processed = dispatch_pending(self.session_factory, executor)
+            except Exception:
+                logger.error("Error al despachar notificaciones pendientes.", exc_info=True)
+                processed = 0
+            # Si el lote vino lleno probablemente hay más pendientes: seguir sin esperar
+            if processed < DISPATCH_BATCH_SIZE:
+                self._stop.wait(self.poll_interval)
+
+
+if __name__ == "__main__":
+    from . import database
+
+    logging_setup.configure_logging()
+    dispatcher = NotificationDispatcher(lambda: Session(database.engine))
+    dispatcher.start()
+    logger.info("Dispatcher de notificaciones iniciado como worker independiente.")
+    try:
+        while True:
+            threading.Event().wait(3600)
+    except KeyboardInterrupt:
+        dispatcher.stop()
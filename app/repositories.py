@@ -1,10 +1,22 @@
 # app/repositories.py
 
-from typing import List
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from sqlalchemy import column, insert, update, values
+from sqlalchemy import select as sa_select
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, func, select
-from . import models, schemas
+from . import geo, models, route_codec, schemas, track_codec
 import datetime
-from math import atan2, cos, radians, sin, sqrt
+
+logger = logging.getLogger(__name__)
+
+# Si está activo, cada distancia acumulada se compara contra un recálculo completo al finalizar
+VERIFY_RUNNING_DISTANCE = os.getenv("VERIFY_RUNNING_DISTANCE", "false").lower() == "true"
+FINAL_DELIVERY_STATUSES = models.FINAL_DELIVERY_STATUSES
 
 def check_if_event_exists(db: Session, delivery_id: int, event_type: str) -> bool:
     """
@@ -26,11 +38,96 @@ def create_tracking_point(db: Session, point: schemas.TrackingPoint, driver_id:
         timestamp=point.timestamp,
         event_type=point.eventType,
         driver_id=driver_id,
-        delivery_id=point.deliveryId
+        delivery_id=point.deliveryId,
+        client_event_id=point.eventId
     )
     db.add(db_point)
     return db_point
 
+def tracking_point_row(point: schemas.TrackingPoint, driver_id: int) -> dict:
+    """Convierte un punto recibido en un diccionario de columnas listo para una inserción masiva."""
+    return {
+        "latitude": point.latitude,
+        "longitude": point.longitude,
+        "timestamp": point.timestamp,
+        "event_type": point.eventType,
+        "driver_id": driver_id,
+        "delivery_id": point.deliveryId,
+        "client_event_id": point.eventId,
+    }
+
+def bulk_insert_tracking_points(db: Session, rows: List[dict]) -> int:
+    """
+    Inserta varios puntos de GPS con una sola sentencia (executemany),
+    sin crear objetos ORM ni hacer un flush por punto. Devuelve el número de filas insertadas.
+    """
+    if not rows:
+        return 0
+    db.execute(insert(models.TrackingPoint.__table__), rows)
+    return len(rows)
+
+def insert_tracking_points(db: Session, rows: List[dict]) -> int:
+    """
+    Inserta puntos de GPS ignorando los repetidos: las filas con el mismo
+    (driver_id, client_event_id) que otra del lote o que una ya guardada no se insertan.
+    La comprobación la hace la propia sentencia INSERT contra el índice único filtrado,
+    sin un SELECT previo. Devuelve el número de filas insertadas.
+    """
+    seen_event_ids = set()
+    plain_rows = []
+    identified_rows = []
+    for row in rows:
+        if not row.get("client_event_id"):
+            plain_rows.append(row)
+            continue
+        key = (row["driver_id"], row["client_event_id"])
+        if key not in seen_event_ids:
+            seen_event_ids.add(key)
+            identified_rows.append(row)
+
+    inserted = bulk_insert_tracking_points(db, plain_rows)
+    if identified_rows:
+        if db.get_bind().dialect.name == "mssql":
+            inserted += _insert_tracking_points_if_absent(db, identified_rows)
+        else:
+            # SQLite (desarrollo local): INSERT OR IGNORE respeta los índices únicos parciales
+            table = models.TrackingPoint.__table__
+            inserted += db.execute(insert(table).prefix_with("OR IGNORE"), identified_rows).rowcount
+    return inserted
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+_MAX_STATEMENT_PARAMETERS = 2000
+
+def _insert_tracking_points_if_absent(db: Session, rows: List[dict]) -> int:
+    """
+    INSERT ... SELECT FROM (VALUES ...) WHERE NOT EXISTS para SQL Server, que no permite
+    IGNORE_DUP_KEY en índices filtrados. UPDLOCK/HOLDLOCK evita que dos workers
+    inserten el mismo eventId a la vez.
+    """
+    table = models.TrackingPoint.__table__
+    columns = list(rows[0].keys())
+    inserted = 0
+    rows_per_statement = _MAX_STATEMENT_PARAMETERS // len(columns)
+    for start in range(0, len(rows), rows_per_statement):
+        chunk = rows[start:start + rows_per_statement]
+        incoming = values(*[column(name, table.c[name].type) for name in columns], name="incoming").data(
+            [tuple(row[name] for name in columns) for row in chunk]
+        )
+        already_saved = (
+            sa_select(table.c.point_id)
+            .with_hint(table, "WITH (UPDLOCK, HOLDLOCK)", "mssql")
+            .where(
+                table.c.driver_id == incoming.c.driver_id,
+                table.c.client_event_id == incoming.c.client_event_id
+            )
+        )
+        statement = insert(table).from_select(
+            columns,
+            sa_select(*[incoming.c[name] for name in columns]).where(~already_saved.exists())
+        )
+        inserted += db.execute(statement).rowcount
+    return inserted
+
 def get_delivery_by_id(db: Session, delivery_id: int, driver_id: int) -> models.Delivery | None:
     """Busca una entrega por su ID, asegurándose de que pertenezca al conductor correcto."""
     statement = select(models.Delivery).where(
@@ -39,33 +136,269 @@ def get_delivery_by_id(db: Session, delivery_id: int, driver_id: int) -> models.
     )
     return db.exec(statement).first()
 
+def get_deliveries_for_driver(db: Session, delivery_ids: Iterable[int], driver_id: int) -> Dict[int, models.Delivery]:
+    """
+    Carga en una sola consulta las entregas indicadas que pertenecen al conductor,
+    junto con su cliente y vendedor. Devuelve un diccionario delivery_id -> Delivery.
+    """
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    statement = (
+        select(models.Delivery)
+        .options(joinedload(models.Delivery.client).joinedload(models.Client.salesperson))
+        .where(
+            models.Delivery.delivery_id.in_(delivery_ids),
+            models.Delivery.driver_id == driver_id
+        )
+    )
+    return {delivery.delivery_id: delivery for delivery in db.exec(statement).all()}
+
+def get_delivery_owners(db: Session, delivery_ids: Iterable[int]) -> Dict[int, int]:
+    """Devuelve {delivery_id: driver_id} de las entregas indicadas con una sola consulta."""
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    statement = select(models.Delivery.delivery_id, models.Delivery.driver_id).where(
+        models.Delivery.delivery_id.in_(delivery_ids)
+    )
+    return {delivery_id: driver_id for delivery_id, driver_id in db.exec(statement).all()}
+
+def get_latest_tracking_position(db: Session, delivery_ids: Iterable[int]) -> Tuple[float, float] | None:
+    """Latitud y longitud del punto más reciente registrado para las entregas indicadas."""
+    delivery_ids = list(delivery_ids)
+    if not delivery_ids:
+        return None
+    statement = (
+        sa_select(models.TrackingPoint.latitude, models.TrackingPoint.longitude)
+        .where(models.TrackingPoint.delivery_id.in_(delivery_ids))
+        .order_by(models.TrackingPoint.timestamp.desc())
+        .limit(1)
+    )
+    row = db.execute(statement).first()
+    return (row.latitude, row.longitude) if row else None
+
 def calculate_total_distance(db: Session, delivery_id: int) -> float:
-    """Calcula la distancia total recorrida para una entrega sumando la distancia entre sus tracking points."""
-    points = db.exec(
-        select(models.TrackingPoint)
-        .where(models.TrackingPoint.delivery_id == delivery_id)
-        .order_by(models.TrackingPoint.timestamp)
-    ).all()
+    """
+    Calcula la distancia total recorrida para una entrega sumando la distancia entre sus tracking points
+    (incluidos los archivados en track_segments). El cálculo es vectorizado con NumPy.
+    """
+    points = _get_track_coordinates(db, [delivery_id]).get(delivery_id, [])
 
     if len(points) < 2:
         return 0.0
 
-    total_distance = 0.0
-    R = 6371.0
+    coordinates = np.array([(latitude, longitude) for latitude, longitude, _ in points], dtype=np.float64)
+    return round(geo.track_length_km(coordinates[:, 0], coordinates[:, 1]), 2)
+
+def _calculate_grouped_distances(db: Session, statement) -> Dict[int, float]:
+    """Ejecuta una consulta (delivery_id, latitud, longitud) ordenada por entrega y tiempo y suma cada recorrido."""
+    rows = db.exec(statement).all()
+    if not rows:
+        return {}
+    columns = np.array(rows, dtype=np.float64)
+    distances = geo.track_lengths_km(columns[:, 0].astype(np.int64), columns[:, 1], columns[:, 2])
+    return {delivery_id: round(distance, 2) for delivery_id, distance in distances.items()}
+
+def calculate_distances_for_deliveries(db: Session, delivery_ids: Iterable[int]) -> Dict[int, float]:
+    """
+    Calcula la distancia recorrida de varias entregas con una sola consulta ordenada.
+    Las entregas sin puntos suficientes devuelven 0.0. Solo considera puntos sin archivar.
+    """
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    statement = (
+        select(models.TrackingPoint.delivery_id, models.TrackingPoint.latitude, models.TrackingPoint.longitude)
+        .where(models.TrackingPoint.delivery_id.in_(delivery_ids))
+        .order_by(models.TrackingPoint.delivery_id, models.TrackingPoint.timestamp)
+    )
+    distances = _calculate_grouped_distances(db, statement)
+    return {delivery_id: distances.get(delivery_id, 0.0) for delivery_id in delivery_ids}
+
+def calculate_distances_for_fec(db: Session, fec_id: int) -> Dict[int, float]:
+    """
+    Calcula la distancia recorrida de todas las entregas de un FEC con una sola consulta.
+    Las entregas que todavía no tienen puntos no aparecen en el resultado. Solo considera puntos sin archivar.
+    """
+    statement = (
+        select(models.TrackingPoint.delivery_id, models.TrackingPoint.latitude, models.TrackingPoint.longitude)
+        .join(models.Delivery, models.Delivery.delivery_id == models.TrackingPoint.delivery_id)
+        .where(models.Delivery.fec_id == fec_id)
+        .order_by(models.TrackingPoint.delivery_id, models.TrackingPoint.timestamp)
+    )
+    return _calculate_grouped_distances(db, statement)
+
+def _naive_timestamp(timestamp: datetime.datetime | None) -> datetime.datetime | None:
+    """Quita la zona horaria para comparar contra los DateTime (sin zona) que guarda la BD."""
+    return timestamp.replace(tzinfo=None) if timestamp else timestamp
 
-    for i in range(len(points) - 1):
-        lat1, lon1 = radians(points[i].latitude), radians(points[i].longitude)
-        lat2, lon2 = radians(points[i+1].latitude), radians(points[i+1].longitude)
+def get_track_segments(db: Session, delivery_ids: Iterable[int]) -> Dict[int, models.TrackSegment]:
+    """Devuelve los recorridos archivados de las entregas indicadas, por delivery_id."""
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    statement = select(models.TrackSegment).where(models.TrackSegment.delivery_id.in_(delivery_ids))
+    return {segment.delivery_id: segment for segment in db.exec(statement).all()}
 
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
+def decode_track_segment(segment: models.TrackSegment) -> List[dict]:
+    """Decodifica un recorrido archivado a filas con las mismas columnas que tracking_point_row."""
+    batch = track_codec.decode(segment.payload, max_points=segment.point_count)
+    rows = batch.rows(np.arange(len(batch)), driver_id=segment.driver_id)
+    for row in rows:
+        row["timestamp"] = _naive_timestamp(row["timestamp"])
+        row["event_type"] = row["event_type"] or None
+    return rows
 
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        distance = R * c
-        total_distance += distance
+def get_delivery_tracks(db: Session, delivery_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """
+    Devuelve todos los puntos de varias entregas, ordenados por tiempo, estén archivados o no:
+    decodifica el segmento de las entregas archivadas y le suma los puntos que sigan en
+    tracking_points (pings atrasados o filas que la purga todavía no borró).
+    """
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    segments = get_track_segments(db, delivery_ids)
+    tracks = defaultdict(list)
+    for delivery_id, segment in segments.items():
+        tracks[delivery_id].extend(decode_track_segment(segment))
+
+    statement = (
+        select(
+            models.TrackingPoint.point_id,
+            models.TrackingPoint.delivery_id,
+            models.TrackingPoint.latitude,
+            models.TrackingPoint.longitude,
+            models.TrackingPoint.timestamp,
+            models.TrackingPoint.event_type,
+            models.TrackingPoint.driver_id,
+            models.TrackingPoint.client_event_id
+        )
+        .where(models.TrackingPoint.delivery_id.in_(delivery_ids))
+        .order_by(models.TrackingPoint.delivery_id, models.TrackingPoint.timestamp)
+    )
+    for point_id, delivery_id, latitude, longitude, timestamp, event_type, driver_id, client_event_id in db.exec(statement).all():
+        segment = segments.get(delivery_id)
+        if segment is not None and point_id <= segment.last_point_id:
+            continue
+        tracks[delivery_id].append({
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": timestamp,
+            "event_type": event_type,
+            "driver_id": driver_id,
+            "delivery_id": delivery_id,
+            "client_event_id": client_event_id,
+        })
 
-    return round(total_distance, 2)
+    for delivery_id in segments:
+        tracks[delivery_id].sort(key=lambda row: row["timestamp"])
+    return tracks
+
+def _get_track_coordinates(db: Session, delivery_ids: Iterable[int]) -> Dict[int, List[Tuple[float, float, datetime.datetime]]]:
+    """Obtiene (latitud, longitud, timestamp) de los puntos de varias entregas, ordenados por tiempo."""
+    return {
+        delivery_id: [(row["latitude"], row["longitude"], row["timestamp"]) for row in rows]
+        for delivery_id, rows in get_delivery_tracks(db, delivery_ids).items()
+    }
+
+def _apply_track_points(stats: models.DeliveryTrackStats, points: List[Tuple[float, float, datetime.datetime]]):
+    """
+    Avanza el estado acumulado con puntos ya ordenados por tiempo.
+    Un punto anterior al último registrado no se puede sumar de forma incremental,
+    así que solo marca el estado para un recálculo completo.
+    """
+    for latitude, longitude, timestamp in points:
+        timestamp = _naive_timestamp(timestamp)
+        if stats.last_timestamp is not None and timestamp < stats.last_timestamp:
+            stats.needs_recompute = True
+        else:
+            if stats.last_latitude is not None and stats.last_longitude is not None:
+                stats.distance_km += geo.haversine_km(stats.last_latitude, stats.last_longitude, latitude, longitude)
+            stats.last_latitude = latitude
+            stats.last_longitude = longitude
+            stats.last_timestamp = timestamp
+        stats.point_count += 1
+
+def load_track_stats(db: Session, delivery_ids: Iterable[int]) -> Dict[int, models.DeliveryTrackStats]:
+    """
+    Carga el estado de distancia acumulada de varias entregas.
+    Las entregas que todavía no tienen estado se siembran con sus puntos actuales,
+    por lo que debe llamarse antes de insertar los puntos nuevos del lote.
+    """
+    delivery_ids = set(delivery_ids)
+    if not delivery_ids:
+        return {}
+    statement = select(models.DeliveryTrackStats).where(models.DeliveryTrackStats.delivery_id.in_(delivery_ids))
+    track_stats = {stats.delivery_id: stats for stats in db.exec(statement).all()}
+
+    missing_ids = delivery_ids - track_stats.keys()
+    if missing_ids:
+        existing_tracks = _get_track_coordinates(db, missing_ids)
+        for delivery_id in missing_ids:
+            stats = models.DeliveryTrackStats(delivery_id=delivery_id)
+            _apply_track_points(stats, existing_tracks.get(delivery_id, []))
+            db.add(stats)
+            track_stats[delivery_id] = stats
+    return track_stats
+
+def accumulate_track_points(track_stats: Dict[int, models.DeliveryTrackStats], rows: List[dict]):
+    """Suma los puntos recién insertados (filas de tracking_point_row) al estado de sus entregas."""
+    points_by_delivery = defaultdict(list)
+    for row in rows:
+        if row["delivery_id"] in track_stats:
+            points_by_delivery[row["delivery_id"]].append(
+                (row["latitude"], row["longitude"], _naive_timestamp(row["timestamp"]))
+            )
+    for delivery_id, points in points_by_delivery.items():
+        points.sort(key=lambda point: point[2])
+        _apply_track_points(track_stats[delivery_id], points)
+
+def flag_track_stats_for_recompute(track_stats: Dict[int, models.DeliveryTrackStats], rows: List[dict]):
+    """
+    Marca para recálculo completo las entregas de un bloque del que se ignoraron filas repetidas:
+    no se sabe cuáles se insertaron, así que no se pueden sumar punto a punto.
+    """
+    for delivery_id in {row["delivery_id"] for row in rows}:
+        if delivery_id in track_stats:
+            track_stats[delivery_id].needs_recompute = True
+
+def reconcile_track_stats(db: Session, delivery_id: int) -> float:
+    """Recalcula desde cero el estado acumulado de una entrega y devuelve la distancia redondeada."""
+    points = _get_track_coordinates(db, [delivery_id]).get(delivery_id, [])
+    stats = db.get(models.DeliveryTrackStats, delivery_id)
+    if stats is None:
+        stats = models.DeliveryTrackStats(delivery_id=delivery_id)
+    stats.point_count = 0
+    stats.distance_km = 0.0
+    stats.last_latitude = None
+    stats.last_longitude = None
+    stats.last_timestamp = None
+    stats.needs_recompute = False
+    _apply_track_points(stats, points)
+    db.add(stats)
+    return round(stats.distance_km, 2)
+
+def get_delivery_distance(db: Session, delivery_id: int) -> float:
+    """
+    Devuelve la distancia recorrida de una entrega a partir del estado acumulado (O(1)).
+    Recurre al recálculo completo si no hay estado o si llegaron puntos fuera de orden.
+    """
+    stats = db.get(models.DeliveryTrackStats, delivery_id)
+    if stats is None or stats.needs_recompute:
+        return reconcile_track_stats(db, delivery_id)
+
+    distance = round(stats.distance_km, 2)
+    if VERIFY_RUNNING_DISTANCE:
+        full_distance = calculate_total_distance(db, delivery_id)
+        if abs(full_distance - distance) > 0.01:
+            logger.warning(
+                "Distancia acumulada desincronizada para la entrega %s: %s km acumulados vs %s km recalculados.",
+                delivery_id, distance, full_distance
+            )
+            return reconcile_track_stats(db, delivery_id)
+    return distance
 
 def _finalize_delivery_details(
     db: Session,
@@ -85,7 +418,7 @@ def _finalize_delivery_details(
         ).total_seconds()
         delivery.actual_duration = str(int(duration_seconds))
 
-    delivery.distance = calculate_total_distance(db, delivery.delivery_id)
+    delivery.distance = get_delivery_distance(db, delivery.delivery_id)
 
 def update_delivery_status(
     db: Session, 
@@ -96,7 +429,7 @@ def update_delivery_status(
     estimated_duration: str | None = None,
     estimated_distance: str | None = None,
 ):
-    delivery.status = new_status
+    set_delivery_status(db, delivery, new_status)
     if new_status == "in_progress":
         delivery.start_time = timestamp
         if location:
@@ -113,10 +446,10 @@ def update_delivery_status(
     db.add(delivery)
     return delivery
 
-def update_fec_route(db: Session, fec: models.FEC, optimized_order_list_json: str, polyline: str):
-    """Guarda la ruta optimizada y la polilínea en el FEC."""
-    fec.optimized_order_list_json = optimized_order_list_json
-    fec.suggested_journey_polyline = polyline
+def update_fec_route(db: Session, fec: models.FEC, optimized_order_list_json: str, polyline: str | None):
+    """Guarda la ruta optimizada y la polilínea en el FEC, en su forma compacta."""
+    route_codec.apply_route(fec, optimized_order_list_json, polyline)
+    fec.version = models.FEC.version + 1
     db.add(fec)
     
 def get_all_deliveries_for_fec(db: Session, fec_id: int) -> List[models.Delivery]:
@@ -127,8 +460,117 @@ def get_all_deliveries_for_fec(db: Session, fec_id: int) -> List[models.Delivery
 def update_fec_status(db: Session, fec: models.FEC, new_status: str):
     """Actualiza el estado de un FEC."""
     fec.status = new_status
+    fec.version = models.FEC.version + 1
     db.add(fec)
 
+def _count_fec_deliveries(fecs, finalized: bool):
+    deliveries = models.Delivery.__table__
+    status_filter = deliveries.c.status.in_(FINAL_DELIVERY_STATUSES)
+    return (
+        sa_select(func.count())
+        .where(deliveries.c.fec_id == fecs.c.fec_id, status_filter if finalized else ~status_filter)
+        .scalar_subquery()
+    )
+
+def initialize_fec_delivery_counters(db: Session, fec_ids: Iterable[int]):
+    """
+    Calcula los contadores de entregas abiertas/finalizadas de los FECs que aún no los tienen.
+    Es un solo UPDATE con subconsultas; para los FECs ya inicializados no hace nada.
+    """
+    fec_ids = set(fec_ids)
+    if not fec_ids:
+        return
+    fecs = models.FEC.__table__
+    db.execute(
+        update(fecs)
+        .where(fecs.c.fec_id.in_(fec_ids), fecs.c.open_deliveries.is_(None))
+        .values(
+            open_deliveries=_count_fec_deliveries(fecs, finalized=False),
+            finalized_deliveries=_count_fec_deliveries(fecs, finalized=True),
+        )
+    )
+
+def set_delivery_status(db: Session, delivery: models.Delivery, new_status: str):
+    """
+    Cambia el estado de una entrega y, si pasa de abierta a finalizada (o al revés),
+    ajusta los contadores de su FEC con un UPDATE atómico en la misma transacción.
+    """
+    was_open = delivery.status not in FINAL_DELIVERY_STATUSES
+    is_open = new_status not in FINAL_DELIVERY_STATUSES
+    if delivery.fec_id and was_open != is_open:
+        # Los contadores se inicializan antes del cambio: así la subconsulta ve el estado anterior
+        initialize_fec_delivery_counters(db, [delivery.fec_id])
+        delta = 1 if is_open else -1
+        fecs = models.FEC.__table__
+        db.execute(
+            update(fecs)
+            .where(fecs.c.fec_id == delivery.fec_id, fecs.c.open_deliveries.is_not(None))
+            .values(
+                open_deliveries=fecs.c.open_deliveries + delta,
+                finalized_deliveries=fecs.c.finalized_deliveries - delta,
+            )
+        )
+    delivery.status = new_status
+
+def complete_finished_fecs(db: Session, fec_ids: Iterable[int]) -> int:
+    """
+    Marca como 'completed' los FECs indicados que ya no tienen entregas abiertas,
+    con un único UPDATE condicional sobre sus contadores. Devuelve cuántos se completaron.
+    """
+    fec_ids = set(fec_ids)
+    if not fec_ids:
+        return 0
+    initialize_fec_delivery_counters(db, fec_ids)
+    fecs = models.FEC.__table__
+    result = db.execute(
+        update(fecs)
+        .where(fecs.c.fec_id.in_(fec_ids), fecs.c.status != "completed", fecs.c.open_deliveries == 0)
+        .values(status="completed", version=fecs.c.version + 1)
+    )
+    return result.rowcount
+
+def sync_fec_delivery_counters(fec: models.FEC) -> Tuple[int, bool]:
+    """
+    Revisa los contadores de un FEC contra sus entregas ya cargadas, por si se agregaron
+    entregas después de inicializarlos. Si no cuadran, los recalcula la propia BD en el
+    UPDATE del flush (subconsultas COUNT), no con los totales de Python: así no pisa los
+    +1/-1 atómicos de set_delivery_status que otra petición haga entre la lectura y el commit.
+    Devuelve las entregas abiertas según lo cargado y si hubo que corregir los contadores.
+    """
+    finalized = sum(1 for delivery in fec.deliveries if delivery.status in FINAL_DELIVERY_STATUSES)
+    open_deliveries = len(fec.deliveries) - finalized
+    if (fec.open_deliveries, fec.finalized_deliveries) == (open_deliveries, finalized):
+        return open_deliveries, False
+    fecs = models.FEC.__table__
+    fec.open_deliveries = _count_fec_deliveries(fecs, finalized=False)
+    fec.finalized_deliveries = _count_fec_deliveries(fecs, finalized=True)
+    return open_deliveries, True
+
+def bump_fec_versions(db: Session, fec_ids: Iterable[int]):
+    """
+    Incrementa la versión de los FECs indicados para invalidar sus respuestas en caché.
+    Es un UPDATE atómico, seguro aunque varios workers modifiquen el mismo FEC.
+    """
+    fec_ids = set(fec_ids)
+    if not fec_ids:
+        return
+    db.execute(
+        update(models.FEC.__table__)
+        .where(models.FEC.__table__.c.fec_id.in_(fec_ids))
+        .values(version=models.FEC.__table__.c.version + 1)
+    )
+
+def get_fec_version(db: Session, fec_number: int, driver_id: int) -> Tuple[int, int, str] | None:
+    """
+    Devuelve (fec_id, version, status) de un FEC del conductor sin cargar sus entregas.
+    Es la consulta ligera con la que se valida la caché de respuestas.
+    """
+    statement = select(models.FEC.fec_id, models.FEC.version, models.FEC.status).where(
+        models.FEC.fec_number == fec_number,
+        models.FEC.driver_id == driver_id
+    )
+    return db.exec(statement).first()
+
 def report_incident_for_delivery(
     db: Session, 
     delivery: models.Delivery, 
@@ -137,7 +579,7 @@ def report_incident_for_delivery(
     location: schemas.Location = None
 ) -> models.Delivery:
     """Actualiza una entrega con datos de incidencia, incluyendo timestamps, ubicación y distancia."""
-    delivery.status = "cancelled"
+    set_delivery_status(db, delivery, "cancelled")
     delivery.cancellation_reason = incident.reason
     delivery.cancellation_notes = incident.notes
     
@@ -154,6 +596,29 @@ def get_fec_by_number_and_driver(db: Session, fec_number: int, driver_id: int) -
     )
     return db.exec(statement).first()
 
+def _fec_details_options():
+    """
+    Opciones de carga para leer un FEC completo sin N+1: las entregas se traen con
+    una segunda consulta (selectin) que ya incluye cliente y vendedor por JOIN.
+    """
+    return selectinload(models.FEC.deliveries).joinedload(models.Delivery.client).joinedload(models.Client.salesperson)
+
+def get_fec_details_by_number_and_driver(db: Session, fec_number: int, driver_id: int) -> models.FEC | None:
+    """
+    Busca un FEC por su número y el ID del conductor, con sus entregas, clientes y vendedores.
+    Siempre hace dos consultas, sin importar cuántas entregas tenga el FEC.
+    """
+    statement = select(models.FEC).options(_fec_details_options()).where(
+        models.FEC.fec_number == fec_number,
+        models.FEC.driver_id == driver_id
+    )
+    return db.exec(statement).first()
+
+def get_fec_details_by_id(db: Session, fec_id: int) -> models.FEC | None:
+    """Busca un FEC por su ID con sus entregas, clientes y vendedores en dos consultas."""
+    statement = select(models.FEC).options(_fec_details_options()).where(models.FEC.fec_id == fec_id)
+    return db.exec(statement).first()
+
 def are_all_deliveries_finalized(db: Session, fec_id: int) -> bool:
     """
     Verifica si todas las entregas de un FEC tienen un estado final (completed o cancelled).
@@ -175,4 +640,60 @@ def update_delivery_acceptance_time(db: Session, delivery: models.Delivery, time
     if delivery.accepted_next_at is None:
         delivery.accepted_next_at = timestamp
         db.add(delivery)
-    return delivery
\ No newline at end of file
+    return delivery
+
+def get_upload_cursor(db: Session, driver_id: int, upload_id: str) -> int:
+    """Devuelve cuántas líneas de una subida en streaming ya están guardadas (0 si es nueva)."""
+    statement = select(models.UploadCursor.committed_lines).where(
+        models.UploadCursor.driver_id == driver_id,
+        models.UploadCursor.upload_id == upload_id
+    )
+    committed_lines = db.exec(statement).first()
+    return committed_lines or 0
+
+def save_upload_cursor(db: Session, driver_id: int, upload_id: str, committed_lines: int):
+    """Guarda el avance de una subida en streaming, creando el cursor si no existe."""
+    cursor = db.exec(
+        select(models.UploadCursor).where(
+            models.UploadCursor.driver_id == driver_id,
+            models.UploadCursor.upload_id == upload_id
+        )
+    ).first()
+    if cursor is None:
+        cursor = models.UploadCursor(driver_id=driver_id, upload_id=upload_id)
+    cursor.committed_lines = committed_lines
+    cursor.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    db.add(cursor)
+
+def add_refresh_token(db: Session, driver_id: int, jti: str, family_id: str, expires_at: datetime.datetime):
+    """Registra un refresh token recién emitido."""
+    db.add(models.RefreshToken(jti=jti, family_id=family_id, driver_id=driver_id, expires_at=expires_at))
+
+def revoke_refresh_token(db: Session, jti: str, driver_id: int) -> bool:
+    """
+    Revoca un refresh token vigente con un UPDATE condicional: de dos rotaciones simultáneas
+    del mismo token solo una lo consigue. Devuelve True si este llamado lo revocó.
+    """
+    tokens = models.RefreshToken.__table__
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    result = db.execute(
+        update(tokens)
+        .where(
+            tokens.c.jti == jti,
+            tokens.c.driver_id == driver_id,
+            tokens.c.revoked_at.is_(None),
+            tokens.c.expires_at > now
+        )
+        .values(revoked_at=now)
+    )
+    return result.rowcount == 1
+
+def revoke_refresh_token_family(db: Session, family_id: str) -> int:
+    """Revoca todos los refresh tokens vigentes de una familia. Devuelve cuántos revocó."""
+    tokens = models.RefreshToken.__table__
+    result = db.execute(
+        update(tokens)
+        .where(tokens.c.family_id == family_id, tokens.c.revoked_at.is_(None))
+        .values(revoked_at=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
+    )
+    return result.rowcount
@@ -0,0 +1,39 @@
+# app/repositories_async.py
+
+from typing import Tuple
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from . import models
+from .repositories import _fec_details_options
+
+# Versiones asíncronas de las consultas de repositories.py que usan los endpoints async.
+# Las escrituras en memoria (update_fec_status, etc.) se comparten tal cual con la versión síncrona.
+
+async def get_fec_version(db: AsyncSession, fec_number: int, driver_id: int) -> Tuple[int, int, str] | None:
+    """Devuelve (fec_id, version, status) de un FEC del conductor sin cargar sus entregas."""
+    statement = select(models.FEC.fec_id, models.FEC.version, models.FEC.status).where(
+        models.FEC.fec_number == fec_number,
+        models.FEC.driver_id == driver_id
+    )
+    return (await db.exec(statement)).first()
+
+async def get_fec_details_by_number_and_driver(db: AsyncSession, fec_number: int, driver_id: int) -> models.FEC | None:
+    """Busca un FEC por número y conductor con sus entregas, clientes y vendedores en dos consultas."""
+    statement = select(models.FEC).options(_fec_details_options()).where(
+        models.FEC.fec_number == fec_number,
+        models.FEC.driver_id == driver_id
+    )
+    return (await db.exec(statement)).first()
+
+async def get_fec_details_by_id(db: AsyncSession, fec_id: int) -> models.FEC | None:
+    """
+    Busca un FEC por su ID con sus entregas, clientes y vendedores.
+    populate_existing refresca el objeto si ya estaba en la sesión (por ejemplo, tras un commit).
+    """
+    statement = (
+        select(models.FEC)
+        .options(_fec_details_options())
+        .where(models.FEC.fec_id == fec_id)
+        .execution_options(populate_existing=True)
+    )
+    return (await db.exec(statement)).first()
@@ -0,0 +1,106 @@
+# app/route_codec.py
+"""
+Almacenamiento compacto de la ruta optimizada de un FEC.
+
+    fecs.route_order     IDs de entrega en el orden sugerido, como arreglo de int32 little-endian
+    fecs.route_polyline  polilínea codificada (formato de Google) comprimida con zlib
+
+La app manda el orden como texto JSON ("[12,15,11]"); se guarda empaquetado y se vuelve a
+escribir en forma canónica al responder. Si el texto no es una lista de enteros se conserva
+tal cual en fecs.optimized_order_list_json, como antes, y la lista decodificada queda vacía.
+
+La ruta decodificada se guarda en una caché indexada por (fec_id, versión): todo cambio de
+ruta sube la versión del FEC (repositories.update_fec_route), así que la clave es pequeña y
+una entrada nunca queda vieja.
+"""
+
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import cache, models
+
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "1024"))
+
+_ORDER_DTYPE = np.dtype("<i4")
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+route_cache = cache.LRUCache(max_entries=ROUTE_CACHE_MAX_ENTRIES)
+
+
+@dataclass(frozen=True)
+class RouteData:
+    """Ruta de un FEC lista para el schema de respuesta."""
+    order_ids: Tuple[int, ...] = ()
+    order_json: Optional[str] = None
+    polyline: Optional[str] = None
+
+
+def parse_order_json(text: Optional[str]) -> Optional[List[int]]:
+    """Devuelve la lista de IDs si el texto es una lista JSON de enteros (int32); si no, None."""
+    if not text:
+        return None
+    try:
+        parsed = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(parsed, list) or not all(type(item) is int and _INT32_MIN <= item <= _INT32_MAX for item in parsed):
+        return None
+    return parsed
+
+def order_to_json(order_ids) -> str:
+    # Mismo formato que JSON.stringify en la app
+    return json.dumps(list(order_ids), separators=(",", ":"))
+
+def encode_order(order_ids: List[int]) -> bytes:
+    return np.asarray(order_ids, dtype=_ORDER_DTYPE).tobytes()
+
+def decode_order(payload: bytes) -> Tuple[int, ...]:
+    return tuple(np.frombuffer(payload, dtype=_ORDER_DTYPE).tolist())
+
+def encode_polyline(polyline: str) -> bytes:
+    return zlib.compress(polyline.encode("utf-8"), 6)
+
+def decode_polyline(payload: bytes) -> str:
+    return zlib.decompress(payload).decode("utf-8")
+
+
+def apply_route(fec: models.FEC, optimized_order_list_json: Optional[str], polyline: Optional[str]):
+    """Guarda en el FEC el orden y la polilínea en su forma compacta."""
+    order_ids = parse_order_json(optimized_order_list_json)
+    if order_ids is None:
+        fec.route_order = None
+        # Texto que no es una lista de enteros: se guarda sin cambios para devolverlo igual
+        fec.optimized_order_list_json = optimized_order_list_json
+    else:
+        fec.route_order = encode_order(order_ids)
+        fec.optimized_order_list_json = None
+    fec.route_polyline = encode_polyline(polyline) if polyline is not None else None
+
+def _decode(fec: models.FEC) -> RouteData:
+    if fec.route_order is not None:
+        order_ids = decode_order(fec.route_order)
+        order_json = order_to_json(order_ids)
+    else:
+        order_ids = ()
+        order_json = fec.optimized_order_list_json
+    polyline = decode_polyline(fec.route_polyline) if fec.route_polyline is not None else None
+    return RouteData(order_ids=order_ids, order_json=order_json, polyline=polyline)
+
+def decode_route(fec: models.FEC) -> RouteData:
+    """Ruta decodificada del FEC, desde la caché si esa ruta ya se decodificó."""
+    if fec.route_order is None and fec.route_polyline is None and fec.optimized_order_list_json is None:
+        return RouteData()
+    if not isinstance(fec.version, int):
+        # Versión pendiente de flush (expresión SQL): todavía no identifica esta ruta
+        return _decode(fec)
+    key = (fec.fec_id, fec.version)
+    route = route_cache.get(key)
+    if route is None:
+        route = _decode(fec)
+        route_cache.set(key, route)
+    return route
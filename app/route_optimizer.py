@@ -0,0 +1,257 @@
+# app/route_optimizer.py
+"""
+Orden de visita de las paradas de un FEC, calculado en el servidor.
+
+El recorrido es un camino abierto que sale de la posición actual del conductor (o de la
+primera parada si no se conoce) y no regresa. Se construye con vecino más cercano y se
+mejora con búsqueda local hasta agotar el presupuesto de tiempo:
+    2-opt    invierte un tramo del recorrido
+    Or-opt   mueve un tramo de 1 a 3 paradas a otra posición (también invertido)
+
+La prioridad de la entrega define niveles que se visitan en orden: todas las paradas de un
+nivel van antes que las del siguiente y solo se reordenan dentro de su nivel. El nivel es
+(priority - 1) // banda; con banda 0 la prioridad se ignora. Las entregas sin prioridad
+van en el último nivel.
+"""
+
+import os
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import geo
+
+ROUTE_OPTIMIZER_TIME_BUDGET_MS = float(os.getenv("ROUTE_OPTIMIZER_TIME_BUDGET_MS", "80"))
+ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS = float(os.getenv("ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS", "2000"))
+# Ancho de los niveles de prioridad: 1 = cada prioridad es un nivel, 0 = sin niveles
+ROUTE_OPTIMIZER_PRIORITY_BAND = int(os.getenv("ROUTE_OPTIMIZER_PRIORITY_BAND", "1"))
+OR_OPT_SEGMENT_LENGTHS = (1, 2, 3)
+# Or-opt solo prueba insertar un tramo junto a las paradas más cercanas de sus extremos
+OR_OPT_NEIGHBORS = int(os.getenv("ROUTE_OPTIMIZER_NEIGHBORS", "10"))
+
+# Mejoras menores a esto (km) se consideran ruido de punto flotante
+_EPSILON = 1e-9
+_ORIGIN_TIER = -1
+
+
+@dataclass
+class Stop:
+    key: int
+    latitude: float
+    longitude: float
+    priority: Optional[int] = None
+
+
+@dataclass
+class OptimizedRoute:
+    order: List[int]
+    distance_km: float
+    # Distancia del recorrido en el orden recibido y tras la construcción, para comparar
+    input_distance_km: float
+    initial_distance_km: float
+    elapsed_ms: float
+    passes: int
+    timed_out: bool
+
+
+def priority_tier(priority: Optional[int], band: int) -> int:
+    if band <= 0:
+        return 0
+    if priority is None:
+        return 2**31
+    return (priority - 1) // band
+
+def distance_matrix_km(latitudes: Sequence[float], longitudes: Sequence[float]) -> np.ndarray:
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return geo.haversine_km_array(latitudes[:, None], longitudes[:, None], latitudes[None, :], longitudes[None, :])
+
+def path_length_km(distances, path: Sequence[int]) -> float:
+    return float(sum(distances[a][b] for a, b in zip(path, path[1:])))
+
+
+def _nearest_neighbor(distances, tiers: List[int], start: int, count: int) -> List[int]:
+    """Desde 'start', la parada más cercana sin visitar del nivel más bajo pendiente."""
+    pending = sorted(range(count), key=lambda node: tiers[node])
+    pending = [node for node in pending if node != start]
+    path = [start]
+    while pending:
+        current_tier = tiers[pending[0]]
+        row = distances[path[-1]]
+        best_index, best_distance = 0, float("inf")
+        for index, node in enumerate(pending):
+            if tiers[node] != current_tier:
+                break
+            if row[node] < best_distance:
+                best_index, best_distance = index, row[node]
+        path.append(pending.pop(best_index))
+    return path
+
+
+def _two_opt_pass(distances, tiers: List[int], path: List[int], deadline: float) -> Tuple[bool, bool]:
+    """Una pasada de 2-opt con primera mejora. Devuelve (hubo mejora, se acabó el tiempo)."""
+    improved = False
+    size = len(path)
+    for i in range(1, size - 1):
+        if time.perf_counter() > deadline:
+            return improved, True
+        a = path[i - 1]
+        row_a = distances[a]
+        j = i + 1
+        while j < size:
+            b, c = path[i], path[j]
+            # Los niveles son contiguos: al cambiar de nivel ya no hay tramos válidos
+            if tiers[c] != tiers[b]:
+                break
+            if j + 1 < size:
+                d = path[j + 1]
+                delta = row_a[c] + distances[b][d] - row_a[b] - distances[c][d]
+            else:
+                delta = row_a[c] - row_a[b]
+            if delta < -_EPSILON:
+                path[i:j + 1] = path[i:j + 1][::-1]
+                improved = True
+            j += 1
+    return improved, False
+
+def _neighbor_lists(matrix: np.ndarray, tiers: List[int], count: int) -> List[List[int]]:
+    """Las 'count' paradas más cercanas de cada nodo dentro de su mismo nivel."""
+    tier_array = np.asarray(tiers)
+    same_tier = tier_array[:, None] == tier_array[None, :]
+    masked = np.where(same_tier, matrix, np.inf)
+    np.fill_diagonal(masked, np.inf)
+    count = min(count, len(tiers) - 1)
+    if count <= 0:
+        return [[] for _ in tiers]
+    nearest = np.argsort(masked, axis=1)[:, :count]
+    return [[int(node) for node in row if np.isfinite(masked[index, node])] for index, row in enumerate(nearest)]
+
+def _or_opt_pass(distances, tiers: List[int], path: List[int], tier_sequence: List[int], neighbors: List[List[int]], deadline: float) -> Tuple[bool, bool]:
+    """Una pasada de Or-opt con primera mejora. Devuelve (hubo mejora, se acabó el tiempo)."""
+    improved = False
+    size = len(path)
+    position = {node: index for index, node in enumerate(path)}
+    for length in OR_OPT_SEGMENT_LENGTHS:
+        i = 1
+        while i + length <= size:
+            if time.perf_counter() > deadline:
+                return improved, True
+            end = i + length - 1
+            first, last = path[i], path[end]
+            tier = tiers[first]
+            if tiers[last] != tier:
+                i += 1
+                continue
+            previous = path[i - 1]
+            following = path[end + 1] if end + 1 < size else None
+            if following is None:
+                removal_gain = distances[previous][first]
+            else:
+                removal_gain = distances[previous][first] + distances[last][following] - distances[previous][following]
+
+            # Posiciones k (insertar entre path[k] y path[k + 1]) que mantienen el nivel contiguo;
+            # los movimientos dentro de un nivel nunca cambian tier_sequence
+            low = max(bisect_left(tier_sequence, tier) - 1, 0)
+            high = bisect_right(tier_sequence, tier) - 1
+            # Junto a los vecinos cercanos de los extremos del tramo, más los bordes del nivel
+            candidates = {low, high}
+            for node in neighbors[first] + neighbors[last]:
+                candidates.add(position[node])
+                candidates.add(position[node] - 1)
+            best = None
+            for k in candidates:
+                if k < low or k > high or i - 1 <= k <= end:
+                    continue
+                x = path[k]
+                y = path[k + 1] if k + 1 < size else None
+                if y is None:
+                    forward, backward = distances[x][first], distances[x][last]
+                else:
+                    base = distances[x][y]
+                    forward = distances[x][first] + distances[last][y] - base
+                    backward = distances[x][last] + distances[first][y] - base
+                delta = (backward if backward < forward else forward) - removal_gain
+                if delta < -_EPSILON and (best is None or delta < best[0]):
+                    best = (delta, k, backward < forward)
+            if best is None:
+                i += 1
+                continue
+            _, k, reverse = best
+            segment = path[i:end + 1]
+            if reverse:
+                segment.reverse()
+            del path[i:end + 1]
+            insert_at = k + 1 if k < i else k + 1 - length
+            path[insert_at:insert_at] = segment
+            for index in range(min(i, insert_at), max(end, insert_at + length - 1) + 1):
+                position[path[index]] = index
+            improved = True
+            i += 1
+    return improved, False
+
+
+def optimize_route(
+    stops: List[Stop],
+    origin: Optional[Tuple[float, float]] = None,
+    time_budget_ms: Optional[float] = None,
+    priority_band: Optional[int] = None,
+) -> OptimizedRoute:
+    """
+    Ordena las paradas minimizando la distancia en línea recta del recorrido abierto.
+    'order' trae las 'key' de las paradas en el orden de visita.
+    """
+    started = time.perf_counter()
+    budget_ms = min(time_budget_ms if time_budget_ms is not None else ROUTE_OPTIMIZER_TIME_BUDGET_MS, ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS)
+    deadline = started + budget_ms / 1000
+    band = ROUTE_OPTIMIZER_PRIORITY_BAND if priority_band is None else priority_band
+
+    if not stops:
+        return OptimizedRoute([], 0.0, 0.0, 0.0, (time.perf_counter() - started) * 1000, 0, False)
+
+    tiers = [priority_tier(stop.priority, band) for stop in stops]
+    latitudes = [stop.latitude for stop in stops]
+    longitudes = [stop.longitude for stop in stops]
+    if origin is not None:
+        # El nodo 0 es la posición del conductor; las paradas van de 1 a n
+        tiers = [_ORIGIN_TIER] + tiers
+        latitudes = [origin[0]] + latitudes
+        longitudes = [origin[1]] + longitudes
+        start = 0
+        input_path = list(range(len(tiers)))
+    else:
+        # Sin posición: arranca en la parada de mayor prioridad (la primera recibida si empatan)
+        start = min(range(len(stops)), key=lambda node: tiers[node])
+        input_path = list(range(len(stops)))
+
+    matrix = distance_matrix_km(latitudes, longitudes)
+    distances = matrix.tolist()
+    neighbors = _neighbor_lists(matrix, tiers, OR_OPT_NEIGHBORS)
+    path = _nearest_neighbor(distances, tiers, start, len(tiers))
+    initial_distance = path_length_km(distances, path)
+    tier_sequence = [tiers[node] for node in path]
+
+    passes = 0
+    timed_out = False
+    improved = True
+    while improved and not timed_out:
+        passes += 1
+        improved_two_opt, timed_out = _two_opt_pass(distances, tiers, path, deadline)
+        improved_or_opt = False
+        if not timed_out:
+            improved_or_opt, timed_out = _or_opt_pass(distances, tiers, path, tier_sequence, neighbors, deadline)
+        improved = improved_two_opt or improved_or_opt
+
+    offset = 1 if origin is not None else 0
+    order = [stops[node - offset].key for node in path[offset:]]
+    return OptimizedRoute(
+        order=order,
+        distance_km=path_length_km(distances, path),
+        input_distance_km=path_length_km(distances, input_path),
+        initial_distance_km=initial_distance,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        passes=passes,
+        timed_out=timed_out,
+    )
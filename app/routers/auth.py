@@ -1,40 +1,108 @@
 # app/routers/auth.py
 
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
-from .. import schemas, models, security, database
+from starlette.concurrency import run_in_threadpool
+from .. import schemas, models, repositories, security, database
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
 )
 
+def _load_login_claims(db: Session, username: str) -> tuple[dict | None, str | None]:
+    """Lee los claims y el hash del conductor y devuelve la conexión al pool antes de verificar."""
+    statement = select(models.Driver).where(models.Driver.username == username)
+    driver = db.exec(statement).first()
+    token_claims = security.driver_token_claims(driver) if driver else None
+    hashed_password = driver.hashed_password if driver else None
+    db.rollback()
+    return token_claims, hashed_password
+
+def _issue_refresh_token(db: Session, driver_id: int, family_id: str | None = None) -> str:
+    """Emite un refresh token, lo registra en la BD y hace commit."""
+    refresh_token, claims = security.create_refresh_token(driver_id, family_id=family_id)
+    repositories.add_refresh_token(
+        db, driver_id=driver_id, jti=claims.jti, family_id=claims.family_id, expires_at=claims.expires_at
+    )
+    db.commit()
+    return refresh_token
+
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(database.get_db)
 ):
     """
     Endpoint de login:
     - Recibe 'username' y 'password'
-    - Valida credenciales
-    - Retorna token JWT si son correctas
+    - Valida credenciales (bcrypt corre en un pool de procesos dedicado; mientras tanto
+      la petición no ocupa ningún hilo del threadpool)
+    - Retorna token JWT y refresh token si son correctas
     """
+    # La sesión es síncrona: sus consultas van al threadpool, no al event loop
+    token_claims, hashed_password = await run_in_threadpool(_load_login_claims, db, form_data.username)
 
-    statement = select(models.Driver).where(models.Driver.username == form_data.username)
-    result = db.exec(statement)
-    driver = result.first()
+    try:
+        is_valid = token_claims is not None and await security.verify_password_offloaded(form_data.password, hashed_password)
+    except security.PasswordVerifierBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio de autenticación está ocupado. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "2"},
+        )
 
-    if not driver or not security.verify_password(form_data.password, driver.hashed_password):
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = security.create_access_token(
-        data={"sub": str(driver.driver_id)}
+    access_token = security.create_access_token(data=token_claims)
+    refresh_token = await run_in_threadpool(_issue_refresh_token, db, int(token_claims["sub"]))
+
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh_access_token(
+    request: schemas.RefreshTokenRequest,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Renueva el access token a partir de un refresh token válido, sin pedir la contraseña
+    ni pasar por bcrypt. El refresh token usado queda revocado y se devuelve uno nuevo de
+    la misma familia (rotación). Presentar un refresh token ya revocado revoca toda su
+    familia: alguien más pudo haberlo copiado.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    claims = security.decode_refresh_token(request.refresh_token)
+    if claims is None:
+        raise credentials_exception
+
+    if not repositories.revoke_refresh_token(db, jti=claims.jti, driver_id=claims.driver_id):
+        revoked = repositories.revoke_refresh_token_family(db, claims.family_id)
+        db.commit()
+        logger.warning(
+            "Refresh token reutilizado o desconocido del conductor %s; se revocaron %s tokens de su familia.",
+            claims.driver_id, revoked
+        )
+        raise credentials_exception
+
+    driver = db.get(models.Driver, claims.driver_id)
+    if driver is None:
+        db.rollback()
+        raise credentials_exception
+
+    access_token = security.create_access_token(data=security.driver_token_claims(driver))
+    refresh_token = _issue_refresh_token(db, driver.driver_id, family_id=claims.family_id)
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
@@ -1,10 +1,13 @@
 # app/routers/events.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlmodel import Session
-from typing import List
+from typing import List, Union
 
-from .. import schemas, models, security, database, services
+from .. import schemas, security, database, serializers, services, streaming, repositories, track_codec, write_buffer
 
 router = APIRouter(
     prefix="/deliveries",
@@ -16,7 +19,7 @@ router = APIRouter(
 def log_tracking_events(
     events: List[schemas.TrackingPoint], 
     db: Session = Depends(database.get_db), 
-    current_driver: models.Driver = Depends(security.get_current_driver)
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
 ):
     """
     Recibe y registra una lista de eventos de tracking (GPS, inicio/fin de entrega).
@@ -24,37 +27,140 @@ def log_tracking_events(
     try:
         services.log_tracking_events_for_driver(db, events=events, driver_id=current_driver.driver_id)
         return {"status": "ok", "message": "Eventos recibidos para procesamiento."}
+    except write_buffer.TrackingBufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servidor está saturado de puntos de seguimiento. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "2"},
+        )
+    except write_buffer.TrackingBufferFlushFailed:
+        # Sin los pings previos en la BD, la distancia y el cierre de la entrega saldrían mal
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No se pudieron guardar los puntos de seguimiento previos al evento. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "2"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocurrió un error al procesar los eventos."
         )
 
-@router.post("/events/log/batch", status_code=status.HTTP_202_ACCEPTED)
+async def read_tracking_batch(request: Request) -> Union[List[schemas.TrackingPoint], track_codec.TrackBatch]:
+    """
+    Lee el cuerpo de /events/log/batch según su Content-Type: JSON (lista de TrackingPoint)
+    o el formato binario de track_codec, que se decodifica directamente a columnas.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == track_codec.MEDIA_TYPE:
+        try:
+            return track_codec.decode(body)
+        except track_codec.TrackCodecError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Lote binario inválido: {e}")
+
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El cuerpo no es JSON válido.")
+    if not isinstance(items, list):
+        raise RequestValidationError([{"loc": ("body",), "msg": "Se esperaba una lista de puntos.", "type": "type_error.list"}])
+    points = []
+    for index, item in enumerate(items):
+        try:
+            points.append(schemas.TrackingPoint(**item))
+        except (ValidationError, TypeError) as e:
+            errors = e.errors() if isinstance(e, ValidationError) else [{"loc": (), "msg": str(e), "type": "type_error"}]
+            raise RequestValidationError([{**error, "loc": ("body", index, *error["loc"])} for error in errors])
+    return points
+
+TRACKING_BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"type": "array", "items": {"$ref": "#/components/schemas/TrackingPoint"}}
+            },
+            track_codec.MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+@router.post("/events/log/batch", status_code=status.HTTP_202_ACCEPTED, openapi_extra=TRACKING_BATCH_OPENAPI)
 def log_tracking_points_batch(
-    points: List[schemas.TrackingPoint],
+    batch: Union[List[schemas.TrackingPoint], track_codec.TrackBatch] = Depends(read_tracking_batch),
     db: Session = Depends(database.get_db),
-    current_driver: models.Driver = Depends(security.get_current_driver)
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
 ):
     """
     Endpoint optimizado para recibir un lote (batch) de puntos de seguimiento (GPS).
-    Reutiliza el mismo servicio que el endpoint individual.
+    Los puntos simples se insertan en bloques; solo los eventos de inicio/fin
+    pasan por la lógica de negocio individual. Devuelve los conteos por bloque.
+    Acepta JSON o, con Content-Type application/vnd.entregas.track+binary, el formato compacto.
     """
     try:
-        services.log_tracking_events_for_driver(db, events=points, driver_id=current_driver.driver_id)
-        return {"status": "ok", "message": "Lote de puntos de seguimiento recibido."}
+        if isinstance(batch, track_codec.TrackBatch):
+            summary = services.ingest_tracking_batch_arrays(db, batch=batch, driver_id=current_driver.driver_id)
+        else:
+            summary = services.ingest_tracking_points_batch(db, points=batch, driver_id=current_driver.driver_id)
+        return {"status": "ok", "message": "Lote de puntos de seguimiento recibido.", **summary}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocurrió un error al procesar el lote de puntos de seguimiento."
         )
 
+@router.post("/events/log/stream", status_code=status.HTTP_202_ACCEPTED)
+async def log_tracking_points_stream(
+    request: Request,
+    x_upload_id: str = Header(..., min_length=1, max_length=64),
+    x_upload_offset: int = Header(0, ge=0),
+    db: Session = Depends(database.get_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
+):
+    """
+    Recibe puntos de seguimiento como NDJSON en streaming (admite Content-Encoding: gzip).
+    Los puntos se guardan por bloques a medida que llegan; si la conexión se corta, el cliente
+    consulta el cursor y reanuda enviando desde esa línea con el header X-Upload-Offset.
+    """
+    gzip_encoded = request.headers.get("content-encoding", "").lower() == "gzip"
+    try:
+        summary = await streaming.ingest_ndjson_stream(
+            db,
+            request.stream(),
+            driver_id=current_driver.driver_id,
+            upload_id=x_upload_id,
+            offset=x_upload_offset,
+            gzip_encoded=gzip_encoded
+        )
+        return {"status": "ok", "message": "Subida de puntos de seguimiento procesada.", "upload_id": x_upload_id, **summary}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ocurrió un error al procesar la subida de puntos de seguimiento."
+        )
+
+@router.get("/events/log/stream/{upload_id}")
+def get_tracking_stream_cursor(
+    upload_id: str,
+    db: Session = Depends(database.get_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
+):
+    """
+    Devuelve cuántas líneas de una subida en streaming ya están guardadas,
+    para que el cliente sepa desde dónde reanudar.
+    """
+    committed_lines = repositories.get_upload_cursor(db, driver_id=current_driver.driver_id, upload_id=upload_id)
+    return {"upload_id": upload_id, "committed_lines": committed_lines}
+
 @router.post("/{delivery_id}/incident", response_model=schemas.Delivery)
 def report_incident(
     delivery_id: int,
     incident_data: schemas.IncidentReport,
     db: Session = Depends(database.get_db),
-    current_driver: models.Driver = Depends(security.get_current_driver)
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
 ):
     """
     Reporta una incidencia para una entrega específica.
@@ -66,7 +172,7 @@ def report_incident(
             incident_data=incident_data,
             driver_id=current_driver.driver_id
         )
-        return updated_delivery
+        return serializers.delivery_response(updated_delivery)
     except HTTPException as e:
         # Re-lanzamos las excepciones HTTP que vienen del service (ej. 404)
         raise e
@@ -75,4 +181,36 @@ def report_incident(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocurrió un error al reportar la incidencia."
-        )
\ No newline at end of file
+        )
+
+@router.get("/{delivery_id}/track")
+def get_delivery_track(
+    delivery_id: int,
+    db: Session = Depends(database.get_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
+):
+    """
+    Devuelve el recorrido completo de una entrega para auditoría,
+    decodificando los puntos archivados en track_segments si ya se compactaron.
+    """
+    delivery = repositories.get_delivery_by_id(db, delivery_id=delivery_id, driver_id=current_driver.driver_id)
+    if not delivery:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Entrega con ID {delivery_id} no encontrada o no asignada a este chofer."
+        )
+    rows = repositories.get_delivery_tracks(db, [delivery_id]).get(delivery_id, [])
+    return {
+        "delivery_id": delivery_id,
+        "archived": bool(repositories.get_track_segments(db, [delivery_id])),
+        "points": [
+            {
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "timestamp": row["timestamp"],
+                "eventType": row["event_type"],
+                "eventId": row["client_event_id"],
+            }
+            for row in rows
+        ],
+    }
@@ -1,10 +1,13 @@
 # app/routers/fec.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Response, status
 from sqlmodel import Session
+from typing import Optional
 
-from app import utils
-from .. import schemas, models, security, database, services
+from .. import schemas, security, database, serializers, services
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/fec",
@@ -13,28 +16,43 @@ router = APIRouter(
 )
 
 @router.get("/{fec_number}", response_model=schemas.FEC)
-def get_fec_details(fec_number: int, db: Session = Depends(database.get_db), current_driver: models.Driver = Depends(security.get_current_driver)):
+def get_fec_details(
+    fec_number: int,
+    if_none_match: Optional[str] = Header(default=None),
+    db: Session = Depends(database.get_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
+):
     """
     Obtiene los detalles completos de un FEC (la ruta del día).
-    Llama a la capa de servicio para ejecutar la lógica de negocio.
+    Devuelve un ETag por versión del FEC y responde 304 si el cliente ya tiene la versión actual.
     """
     try:
-        fec = services.get_fec_details_for_driver(db, fec_number=fec_number, driver_id=current_driver.driver_id)
-        return fec
+        fec_response = services.get_fec_details_response(
+            db,
+            fec_number=fec_number,
+            driver_id=current_driver.driver_id,
+            if_none_match=if_none_match
+        )
     except HTTPException as e:
         raise e
 
+    headers = {"ETag": fec_response.etag, "Cache-Control": "no-cache"}
+    if fec_response.body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=fec_response.body, media_type="application/json", headers=headers)
+
 @router.patch("/{fec_id}/route", response_model=schemas.FEC, status_code=status.HTTP_200_OK)
 def update_fec_route(
     fec_id: int,
     route_data: schemas.OptimizedRouteData,
     db: Session = Depends(database.get_db),
-    current_driver: models.Driver = Depends(security.get_current_driver)
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
 ):
-    # --- AÑADIR ESTAS LÍNEAS PARA DEPURACIÓN ---
-    print(f"--- Recibida petición para actualizar ruta del FEC ID: {fec_id} ---")
-    print(f"--- Datos recibidos: {route_data.model_dump_json(indent=2)} ---")
-    # ---------------------------------------------
+    # Sin la polilínea: puede medir decenas de KB
+    logger.debug(
+        "Actualizando la ruta del FEC ID: %s (%s caracteres de polilínea).",
+        fec_id, len(route_data.suggested_journey_polyline)
+    )
     try:
         updated_fec = services.update_fec_route_details(
             db=db,
@@ -43,7 +61,7 @@ def update_fec_route(
             driver_id=current_driver.driver_id
         )
 
-        return utils.fec_model_to_schema(updated_fec)
+        return serializers.fec_response(updated_fec)
     
     except HTTPException as e:
         raise e
@@ -51,4 +69,29 @@ def update_fec_route(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error inesperado al actualizar la ruta del FEC: {e}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/{fec_id}/route/optimize", response_model=schemas.FEC, status_code=status.HTTP_200_OK)
+def optimize_fec_route(
+    fec_id: int,
+    route_request: schemas.RouteOptimizationRequest = Body(default_factory=schemas.RouteOptimizationRequest),
+    db: Session = Depends(database.get_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver)
+):
+    """
+    Calcula en el servidor el orden de visita de las entregas pendientes y lo guarda como
+    ruta optimizada del FEC. El cuerpo es opcional: posición actual del conductor,
+    presupuesto de tiempo en ms y ancho de los niveles de prioridad.
+    """
+    updated_fec, result = services.optimize_fec_route(
+        db,
+        fec_id=fec_id,
+        driver_id=current_driver.driver_id,
+        route_request=route_request
+    )
+    logger.info(
+        "Ruta del FEC ID: %s optimizada: %s paradas, %.2f km (orden del despachador %.2f km) en %.1f ms%s.",
+        fec_id, len(result.order), result.distance_km, result.input_distance_km, result.elapsed_ms,
+        " (presupuesto agotado)" if result.timed_out else ""
+    )
+    return serializers.fec_response(updated_fec)
@@ -0,0 +1,41 @@
+# app/routers/fec_async.py
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+
+from .. import schemas, security, database, services_async
+
+# Se registra antes que routers/fec.py cuando ASYNC_DATABASE_URL está definido;
+# la actualización de ruta (PATCH) sigue en el router síncrono.
+router = APIRouter(
+    prefix="/fec",
+    tags=["FEC"],
+    dependencies=[Depends(security.get_current_driver_async)]
+)
+
+@router.get("/{fec_number}", response_model=schemas.FEC)
+async def get_fec_details_async(
+    fec_number: int,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_driver: schemas.AuthenticatedDriver = Depends(security.get_current_driver_async)
+):
+    """
+    Obtiene los detalles completos de un FEC (la ruta del día).
+    Devuelve un ETag por versión del FEC y responde 304 si el cliente ya tiene la versión actual.
+    """
+    try:
+        fec_response = await services_async.get_fec_details_response(
+            db,
+            fec_number=fec_number,
+            driver_id=current_driver.driver_id,
+            if_none_match=if_none_match
+        )
+    except HTTPException as e:
+        raise e
+
+    headers = {"ETag": fec_response.etag, "Cache-Control": "no-cache"}
+    if fec_response.body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=fec_response.body, media_type="application/json", headers=headers)
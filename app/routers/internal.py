@@ -0,0 +1,48 @@
+# app/routers/internal.py
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from .. import database, logging_setup, metrics, security, track_filter, write_buffer
+
+# Métricas y estado de este worker para monitoreo; requieren INTERNAL_API_TOKEN
+router = APIRouter(
+    tags=["Internal"],
+    dependencies=[Depends(security.require_internal_token)],
+    include_in_schema=False,
+)
+
+@router.get("/health/db-pool")
+def read_db_pool_stats():
+    """
+    Estadísticas del pool de conexiones de este worker (prestadas, overflow, espera).
+    """
+    return database.get_pool_stats()
+
+@router.get("/health/tracking-buffer")
+def read_tracking_buffer_stats():
+    """
+    Métricas del buffer de escritura de pings GPS de este worker (tamaño de lote, latencia de vaciado).
+    """
+    return write_buffer.tracking_buffer.stats()
+
+@router.get("/health/track-filter")
+def read_track_filter_stats():
+    """
+    Pings GPS descartados por el filtro de tracking en este worker (solo totales).
+    """
+    return track_filter.track_filter.stats()
+
+@router.get("/health/logging")
+def read_logging_stats():
+    """
+    Registros de log encolados, descartados por cola llena y omitidos por muestreo en este worker.
+    """
+    return logging_setup.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Histogramas de latencia, tiempo en BD y consultas por ruta de este worker, en formato Prometheus.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
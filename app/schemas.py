@@ -15,6 +15,17 @@ class Driver(BaseModel):
     class Config:
         from_attributes = True
 
+# Conductor autenticado: copia ligera que se guarda en caché o se arma desde el token
+class AuthenticatedDriver(BaseModel):
+    driver_id: int
+    username: Optional[str] = None
+    num_unity: Optional[str] = None
+    vehicle_plate: Optional[str] = None
+    phone_number: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 # Estructura SalesPerson
 class Salesperson(BaseModel):
     name: str
@@ -62,9 +73,8 @@ class FEC(BaseModel):
     deliveries: List[Delivery] = []
     status: str
     optimized_order_list_json: Optional[str] = None
-    suggested_journey_polyline: Optional[str] = None
-    optimized_order_id_list: Optional[List[int]] = Field(default=None, alias="optimizedOrderId_list")
     suggested_journey_polyline: Optional[str] = Field(default=None, alias="suggestedJourneyPolyline")
+    optimized_order_id_list: Optional[List[int]] = Field(default=None, alias="optimizedOrderId_list")
 
     class Config:
         from_attributes = True
@@ -79,6 +89,8 @@ class TrackingPoint(BaseModel):
     deliveryId: Optional[int] = None
     estimatedDuration: Optional[str] = None
     estimatedDistance: Optional[str] = None
+    # Id generado por el teléfono; si se reenvía el mismo punto, el servidor lo ignora
+    eventId: Optional[str] = Field(default=None, max_length=64)
 
 # Estructura LOCATION
 class Location(BaseModel):
@@ -94,6 +106,11 @@ class LoginRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+# Schema para renovar el access token sin volver a enviar la contraseña
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 # Estructura IncidentReport
 class IncidentReport(BaseModel):
@@ -104,4 +121,12 @@ class IncidentReport(BaseModel):
 
 class OptimizedRouteData(BaseModel):
     optimized_order_list_json: str
-    suggested_journey_polyline: str
\ No newline at end of file
+    suggested_journey_polyline: str
+
+# Parámetros de la optimización de ruta en el servidor; todos son opcionales
+class RouteOptimizationRequest(BaseModel):
+    # Posición actual del conductor; sin ella se usa el último punto registrado del FEC
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    time_budget_ms: Optional[float] = Field(default=None, gt=0)
+    priority_band: Optional[int] = Field(default=None, ge=0)
\ No newline at end of file
@@ -1,18 +1,43 @@
 # app/security.py
 
 from sqlmodel import Session, select
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+import asyncio
+import hmac
+import multiprocessing
 import os
+import threading
+import uuid
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+# Pool de procesos dedicado a bcrypt, para no ocupar el threadpool compartido de FastAPI
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", "2"))
+# Verificaciones que pueden esperar en cola además de las que ya se ejecutan
+PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", "32"))
+PASSWORD_VERIFY_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_VERIFY_TIMEOUT_SECONDS", "5"))
+
+# Caché de conductores autenticados (driver_id -> AuthenticatedDriver)
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "2048"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+# Si está activo, los datos del conductor firmados en el token se usan sin consultar la BD.
+# Un cambio en la fila del conductor no se refleja hasta que el token se renueve.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+# Token compartido de /metrics y /health/* (Authorization: Bearer <token>). Sin definir,
+# esos endpoints responden 404: la API es pública y exponen datos internos del worker.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -20,6 +45,83 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Compara una contraseña en texto plano con un hash guardado en la BD."""
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordVerifierBusy(Exception):
+    """El pool de bcrypt está saturado o la verificación superó su tiempo límite."""
+
+_password_pool: ProcessPoolExecutor | None = None
+_password_pool_lock = threading.Lock()
+_password_slots = threading.BoundedSemaphore(PASSWORD_POOL_SIZE + PASSWORD_QUEUE_SIZE)
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            # spawn: el servidor ya tiene hilos corriendo y hacer fork de un proceso con hilos
+            # puede dejar al hijo con un lock tomado para siempre
+            _password_pool = ProcessPoolExecutor(max_workers=PASSWORD_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+        return _password_pool
+
+def start_password_pool():
+    """Crea el pool de bcrypt al arrancar la aplicación en vez de en el primer login."""
+    _get_password_pool()
+
+def _discard_password_pool(broken: ProcessPoolExecutor):
+    # Un proceso del pool murió: el pool ya no acepta trabajo y el siguiente uso crea otro
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is broken:
+            _password_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _submit_verification(plain_password: str, hashed_password: str) -> tuple[ProcessPoolExecutor, Future]:
+    pool = _get_password_pool()
+    try:
+        return pool, pool.submit(verify_password, plain_password, hashed_password)
+    except BrokenProcessPool:
+        _discard_password_pool(pool)
+        pool = _get_password_pool()
+        return pool, pool.submit(verify_password, plain_password, hashed_password)
+
+async def verify_password_offloaded(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica la contraseña en el pool de procesos de bcrypt sin ocupar un hilo mientras espera.
+    La cola está acotada: si no hay lugar, o si la verificación tarda más de
+    PASSWORD_VERIFY_TIMEOUT_SECONDS, lanza PasswordVerifierBusy en vez de esperar.
+    Si un proceso del pool murió, el pool se reemplaza y la verificación se reintenta una vez.
+    """
+    # acquire sin bloqueo: nunca detiene el event loop
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordVerifierBusy("Demasiadas verificaciones de contraseña en cola.")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + PASSWORD_VERIFY_TIMEOUT_SECONDS
+    release_slot = True
+    try:
+        for attempt in range(2):
+            pool, future = _submit_verification(plain_password, hashed_password)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                future.cancel()
+                # El lugar en la cola se libera cuando el proceso termina, aunque aquí ya no se espere
+                release_slot = False
+                future.add_done_callback(lambda _: _password_slots.release())
+                raise PasswordVerifierBusy("La verificación de la contraseña excedió el tiempo límite.")
+            except BrokenProcessPool:
+                _discard_password_pool(pool)
+                if attempt:
+                    raise
+    finally:
+        if release_slot:
+            _password_slots.release()
+
+def shutdown_password_pool():
+    """Detiene el pool de procesos de bcrypt (al apagar la aplicación)."""
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown(wait=False, cancel_futures=True)
+            _password_pool = None
+
 def get_password_hash(password: str) -> str:
     """Genera un hash a partir de una contraseña en texto plano."""
     return pwd_context.hash(password)
@@ -28,22 +130,86 @@ def create_access_token(data: dict) -> str:
     """Crea un nuevo Token JWT."""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-from fastapi import Depends, HTTPException, status
+@dataclass
+class RefreshTokenClaims:
+    driver_id: int
+    # ID único del token y de la cadena de rotaciones que empezó en un login
+    jti: str
+    family_id: str
+    expires_at: datetime
+
+def create_refresh_token(driver_id: int, family_id: str | None = None) -> tuple[str, RefreshTokenClaims]:
+    """
+    Crea un token de larga duración que solo sirve para pedir un nuevo access token.
+    Devuelve el token y sus claims, que se guardan en la BD para poder revocarlo.
+    Sin 'family_id' empieza una familia nueva (login).
+    """
+    claims = RefreshTokenClaims(
+        driver_id=driver_id,
+        jti=str(uuid.uuid4()),
+        family_id=family_id or str(uuid.uuid4()),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    to_encode = {"sub": str(driver_id), "exp": claims.expires_at, "type": "refresh", "jti": claims.jti, "fam": claims.family_id}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM), claims
+
+def decode_refresh_token(token: str) -> RefreshTokenClaims | None:
+    """Valida la firma y la expiración de un refresh token; None si es inválido, expiró o no trae jti."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or payload.get("sub") is None:
+        return None
+    # Los refresh tokens anteriores a la rotación no tienen registro en la BD
+    if not payload.get("jti") or not payload.get("fam"):
+        return None
+    return RefreshTokenClaims(
+        driver_id=int(payload["sub"]),
+        jti=payload["jti"],
+        family_id=payload["fam"],
+        expires_at=datetime.utcfromtimestamp(payload["exp"]),
+    )
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from . import database, models
+from sqlmodel.ext.asyncio.session import AsyncSession
+from . import cache, database, models, schemas
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def get_current_driver(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> models.Driver:
+principal_cache = cache.LRUCache(max_entries=AUTH_CACHE_MAX_ENTRIES, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+# Datos del conductor que viajan firmados en el token además de 'sub' (solo con AUTH_TRUST_TOKEN_CLAIMS)
+DRIVER_CLAIMS = ("username", "num_unity", "vehicle_plate", "phone_number")
+
+def driver_token_claims(driver: models.Driver) -> dict:
     """
-    Dependencia de seguridad que valida el token JWT y devuelve el conductor actual.
+    Arma los claims del token de un conductor: su ID en 'sub' y, solo si AUTH_TRUST_TOKEN_CLAIMS
+    está activo, sus datos básicos. Sin ese modo no se usan y no tiene caso que el teléfono
+    o el usuario viajen en cada token.
     """
+    claims = {"sub": str(driver.driver_id)}
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        for claim in DRIVER_CLAIMS:
+            claims[claim] = getattr(driver, claim)
+    return claims
+
+@event.listens_for(models.Driver, "after_update")
+@event.listens_for(models.Driver, "after_delete")
+def _invalidate_cached_driver(mapper, connection, target: models.Driver):
+    """Saca de la caché al conductor cuya fila cambió o se eliminó."""
+    principal_cache.invalidate(target.driver_id)
+
+def _decode_access_token(token: str) -> tuple[int, dict]:
+    """Valida un access token y devuelve (driver_id, payload); lanza 401 si no es válido."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -52,13 +218,68 @@ def get_current_driver(token: str = Depends(oauth2_scheme), db: Session = Depend
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         driver_id: str = payload.get("sub")
-        if driver_id is None:
+        # Los refresh tokens no sirven para acceder a la API (los tokens antiguos no traen 'type')
+        if driver_id is None or payload.get("type", "access") != "access":
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    driver = db.get(models.Driver, int(driver_id))
+    return int(driver_id), payload
+
+def _principal_without_db(driver_id: int, payload: dict) -> schemas.AuthenticatedDriver | None:
+    """Resuelve el conductor desde los claims firmados o la caché; None si hace falta la BD."""
+    if AUTH_TRUST_TOKEN_CLAIMS and all(claim in payload for claim in DRIVER_CLAIMS):
+        return schemas.AuthenticatedDriver(driver_id=driver_id, **{claim: payload[claim] for claim in DRIVER_CLAIMS})
+    return principal_cache.get(driver_id)
 
+def _cache_principal(driver: models.Driver | None) -> schemas.AuthenticatedDriver:
+    """Guarda en caché la copia ligera de un conductor leído de la BD; 401 si no existe."""
     if driver is None:
-        raise credentials_exception
-    return driver
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudieron validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    principal = schemas.AuthenticatedDriver(
+        driver_id=driver.driver_id,
+        username=driver.username,
+        num_unity=driver.num_unity,
+        vehicle_plate=driver.vehicle_plate,
+        phone_number=driver.phone_number
+    )
+    principal_cache.set(driver.driver_id, principal)
+    return principal
+
+def get_current_driver(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> schemas.AuthenticatedDriver:
+    """
+    Dependencia de seguridad que valida el token JWT y devuelve el conductor actual.
+    El conductor se busca primero en la caché (o en los claims firmados si
+    AUTH_TRUST_TOKEN_CLAIMS está activo) y solo se consulta la BD en un fallo de caché.
+    """
+    driver_id, payload = _decode_access_token(token)
+    principal = _principal_without_db(driver_id, payload)
+    if principal is not None:
+        return principal
+    return _cache_principal(db.get(models.Driver, driver_id))
+
+async def get_current_driver_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> schemas.AuthenticatedDriver:
+    """Versión asíncrona de get_current_driver para los endpoints del modo async."""
+    driver_id, payload = _decode_access_token(token)
+    principal = _principal_without_db(driver_id, payload)
+    if principal is not None:
+        return principal
+    return _cache_principal(await db.get(models.Driver, driver_id))
+
+def require_internal_token(authorization: str | None = Header(default=None)):
+    """
+    Dependencia de los endpoints internos: exige INTERNAL_API_TOKEN como Bearer.
+    Si no está configurado, los endpoints no existen (404) en vez de quedar abiertos.
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token interno inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
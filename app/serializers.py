@@ -0,0 +1,108 @@
+# app/serializers.py
+"""
+Serialización directa de FECs y entregas a JSON, sin pasar por los schemas de pydantic.
+
+utils.fec_model_to_schema arma un schemas.FEC con un schemas.Delivery por entrega y
+luego jsonable_encoder lo vuelve a recorrer para producir el JSON; en un FEC grande esa
+doble conversión domina el tiempo de la respuesta. Aquí cada modelo se convierte una sola
+vez a tipos básicos y orjson escribe los bytes.
+
+La salida es idéntica byte a byte a la de los schemas (mismo orden de campos, mismos
+alias como optimizedOrderId_list y suggestedJourneyPolyline, mismo formato de fechas y
+números), así que las respuestas y los ETag no cambian al activar o desactivar esta ruta.
+"""
+
+import os
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+from . import models, route_codec, utils
+
+# Con "false" se vuelve a serializar a través de los schemas de pydantic
+FAST_SERIALIZATION_ENABLED = os.getenv("FAST_SERIALIZATION_ENABLED", "true").lower() == "true"
+
+# json.dumps escribe 1e-05 donde orjson escribe 0.00001: esos valores se insertan ya formateados
+_SMALL_FLOAT = 1e-4
+
+
+def _float(value: Optional[float]) -> Any:
+    if value is None:
+        return None
+    value = float(value)
+    if value and abs(value) < _SMALL_FLOAT:
+        return orjson.Fragment(repr(value))
+    return value
+
+def delivery_to_dict(delivery: models.Delivery) -> dict:
+    """Mismo contenido y orden de campos que schemas.Delivery."""
+    client = delivery.client
+    client_dict = None
+    if client:
+        salesperson = client.salesperson
+        client_dict = {
+            "client_id": client.client_id,
+            "name": client.name,
+            "phone": client.phone,
+            "gps_location": client.gps_location or "",
+            "salesperson": {"name": salesperson.name, "phone": salesperson.phone or ""} if salesperson else None,
+        }
+    return {
+        "delivery_id": delivery.delivery_id,
+        "driver_id": delivery.driver_id,
+        "client_id": delivery.client_id,
+        "start_time": delivery.start_time,
+        "delivery_time": delivery.delivery_time.isoformat() if delivery.delivery_time else None,
+        "actual_duration": delivery.actual_duration,
+        "estimated_duration": delivery.estimated_duration,
+        "estimated_distance": delivery.estimated_distance,
+        "start_latitude": _float(delivery.start_latitude),
+        "start_longitude": _float(delivery.start_longitude),
+        "end_latitude": _float(delivery.end_latitude),
+        "end_longitude": _float(delivery.end_longitude),
+        "invoice_id": delivery.invoice_id,
+        "client": client_dict,
+        "status": delivery.status,
+        "distance": _float(delivery.distance),
+        "priority": delivery.priority,
+        "cancellation_reason": delivery.cancellation_reason,
+        "cancellation_notes": delivery.cancellation_notes,
+    }
+
+def fec_to_dict(fec: models.FEC) -> dict:
+    """Mismo contenido y orden de campos (con alias) que schemas.FEC."""
+    route = route_codec.decode_route(fec)
+    return {
+        "fec_id": fec.fec_id,
+        "fec_number": fec.fec_number,
+        "driver_id": fec.driver_id,
+        "fec_date": utils.fec_date_to_datetime(fec.fec_date),
+        "deliveries": [delivery_to_dict(delivery) for delivery in fec.deliveries or ()],
+        "status": fec.status,
+        "optimized_order_list_json": route.order_json,
+        "suggestedJourneyPolyline": route.polyline,
+        "optimizedOrderId_list": list(route.order_ids),
+    }
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def render_fec(fec: models.FEC) -> bytes:
+    """Cuerpo JSON de un FEC ya cargado con sus entregas, clientes y vendedores."""
+    if FAST_SERIALIZATION_ENABLED:
+        return dumps(fec_to_dict(fec))
+    return utils.render_fec_json(utils.fec_model_to_schema(fec))
+
+def render_delivery(delivery: models.Delivery) -> bytes:
+    if FAST_SERIALIZATION_ENABLED:
+        return dumps(delivery_to_dict(delivery))
+    return utils.render_json(utils.delivery_model_to_schema(delivery))
+
+def fec_response(fec: models.FEC, **kwargs) -> Response:
+    """Respuesta ya serializada: FastAPI la envía tal cual, sin volver a validar con response_model."""
+    return Response(content=render_fec(fec), media_type="application/json", **kwargs)
+
+def delivery_response(delivery: models.Delivery, **kwargs) -> Response:
+    return Response(content=render_delivery(delivery), media_type="application/json", **kwargs)
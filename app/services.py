@@ -1,102 +1,440 @@
 # app/services.py
 
 import logging
+import os
+from dataclasses import dataclass, field
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session
 from datetime import datetime, timezone
-from typing import List
+from typing import Dict, Iterable, List, Set, Tuple
 from fastapi import HTTPException, status
+import numpy as np
 
 from app import models
-from . import repositories, schemas, sms_service, whatsapp_service, utils
+from . import cache, notifications, repositories, route_codec, route_optimizer, schemas, serializers, track_codec, track_filter, utils, write_buffer
 
 logger = logging.getLogger(__name__)
+# Avisos de eventos duplicados: los reintentos de la app los producen en masa, LOG_SAMPLE_RATES los muestrea
+duplicate_logger = logging.getLogger(f"{__name__}.duplicates")
 
+TRACKING_BATCH_CHUNK_SIZE = int(os.getenv("TRACKING_BATCH_CHUNK_SIZE", "500"))
+LIFECYCLE_EVENT_TYPES = models.LIFECYCLE_EVENT_TYPES
+FINAL_DELIVERY_STATUSES = models.FINAL_DELIVERY_STATUSES
+# Clave de db.info con los resultados del filtro de tracking pendientes de aplicar
+_TRACK_FILTER_UPDATES = "track_filter_updates"
+
+# Respuestas serializadas de GET /fec/{fec_number}, indexadas por (fec_id, version)
+fec_response_cache = cache.LRUCache(
+    max_entries=int(os.getenv("FEC_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=float(os.getenv("FEC_CACHE_TTL_SECONDS", "300")),
+)
+
+
+@dataclass
+class DeliveryContext:
+    """
+    Entregas (con cliente y vendedor) precargadas una sola vez por petición de ingesta,
+    y los eventos de inicio/fin ya registrados dentro del mismo lote.
+    """
+    deliveries: Dict[int, models.Delivery] = field(default_factory=dict)
+    recorded_events: Set[Tuple[int, str]] = field(default_factory=set)
+    track_stats: Dict[int, models.DeliveryTrackStats] = field(default_factory=dict)
+
+    def get_delivery(self, delivery_id: int | None) -> models.Delivery | None:
+        if not delivery_id:
+            return None
+        return self.deliveries.get(delivery_id)
+
+    def is_duplicate(self, event: schemas.TrackingPoint) -> bool:
+        return (event.deliveryId, event.eventType) in self.recorded_events
+
+    def record(self, event: schemas.TrackingPoint):
+        if event.deliveryId and event.eventType in LIFECYCLE_EVENT_TYPES:
+            self.recorded_events.add((event.deliveryId, event.eventType))
+
+def load_delivery_context(
+    db: Session,
+    events: List[schemas.TrackingPoint],
+    driver_id: int,
+    extra_delivery_ids: Iterable[int] = (),
+) -> DeliveryContext:
+    """
+    Reúne los deliveryId distintos del lote y carga las entregas del conductor (con cliente
+    y vendedor) con una sola consulta, sin importar el tamaño del lote. Los eventos de
+    inicio/fin ya guardados no se consultan: los descarta el índice único al insertar.
+    También carga el estado de distancia acumulada, por lo que debe construirse
+    antes de insertar cualquier punto del lote.
+    'extra_delivery_ids' añade entregas de puntos que no vienen como TrackingPoint (formato binario).
+    """
+    delivery_ids = {event.deliveryId for event in events if event.deliveryId}
+    delivery_ids.update(extra_delivery_ids)
+    deliveries = repositories.get_deliveries_for_driver(db, delivery_ids, driver_id=driver_id)
+    return DeliveryContext(
+        deliveries=deliveries,
+        track_stats=repositories.load_track_stats(db, deliveries.keys()),
+    )
+
+def _insert_tracking_event(db: Session, event: schemas.TrackingPoint, driver_id: int) -> bool:
+    """
+    Guarda el punto de un evento individual. Si trae eventId o es un evento de inicio/fin,
+    se inserta en un savepoint: si los índices únicos lo rechazan por repetido, devuelve False
+    sin afectar al resto del lote.
+    """
+    if not event.eventId and not (event.deliveryId and event.eventType in LIFECYCLE_EVENT_TYPES):
+        repositories.create_tracking_point(db, point=event, driver_id=driver_id)
+        return True
+    try:
+        with db.begin_nested():
+            repositories.create_tracking_point(db, point=event, driver_id=driver_id)
+    except IntegrityError:
+        return False
+    return True
+
+def _process_tracking_event(
+    db: Session,
+    event: schemas.TrackingPoint,
+    driver_id: int,
+    affected_fec_ids: set,
+    context: DeliveryContext,
+) -> bool:
+    """
+    Aplica la lógica de negocio de un evento de tracking individual usando el contexto precargado.
+    Devuelve True si el punto fue registrado y False si se ignoró por duplicado.
+    """
+    # Logica anti-duplicados
+    if event.deliveryId and event.eventType in LIFECYCLE_EVENT_TYPES:
+        
+        if context.is_duplicate(event):
+            
+            duplicate_logger.warning("Evento duplicado ignorado: %s para delivery_id %s", event.eventType, event.deliveryId)
+            return False
+    
+    if not _insert_tracking_event(db, event, driver_id):
+        duplicate_logger.warning("Evento duplicado ignorado: %s (eventId %s) para delivery_id %s", event.eventType, event.eventId, event.deliveryId)
+        return False
+    repositories.accumulate_track_points(context.track_stats, [repositories.tracking_point_row(event, driver_id=driver_id)])
+    context.record(event)
+
+    delivery = context.get_delivery(event.deliveryId)
+    if delivery:
+        # Un ping GPS simple no cambia la respuesta del FEC: solo inicio/fin invalidan su versión (y su ETag)
+        if delivery.fec_id and event.eventType in LIFECYCLE_EVENT_TYPES:
+            affected_fec_ids.add(delivery.fec_id)
+        
+        location_data = schemas.Location(latitude=event.latitude, longitude=event.longitude)
+
+        if event.eventType == "start_delivery":
+            repositories.update_delivery_status(
+                db,
+                delivery=delivery,
+                new_status="in_progress",
+                timestamp=event.timestamp,
+                location=location_data,
+                estimated_duration=event.estimatedDuration,
+                estimated_distance=event.estimatedDistance,
+            )
+        elif event.eventType == "end_delivery":
+            repositories.update_delivery_status(db, delivery=delivery, new_status="completed", timestamp=event.timestamp, location=location_data)
+            
+            if (delivery.client and
+                delivery.client.salesperson and
+                delivery.client.salesperson.phone and
+                delivery.invoice_id):
+                
+                # El SMS/WhatsApp se envía desde el dispatcher del outbox, fuera de esta transacción
+                notifications.enqueue_completion_notifications(db, delivery)
+            else:
+                logger.warning("Faltan datos del vendedor para la entrega %s. No se envió la notificación.", delivery.delivery_id)
+    return True
+
+def _complete_finished_fecs(db: Session, affected_fec_ids: set):
+    """Marca como 'completed' los FECs afectados cuyas entregas ya están todas finalizadas."""
+    try:
+        completed = repositories.complete_finished_fecs(db, affected_fec_ids)
+    except Exception as e:
+        logger.error("Error al verificar el estado final de los FECs %s. Error: %s", sorted(affected_fec_ids), e, exc_info=True)
+        return
+    if completed:
+        logger.info("%s FEC(s) con todas sus entregas finalizadas se marcaron como completados.", completed)
+
+def _commit_tracking_batch(db: Session):
+    """
+    Hace commit del lote de tracking; si falla, hace rollback y relanza el error.
+    El estado del filtro de tracking solo avanza si el commit se completó.
+    """
+    try:
+        db.commit()
+    except Exception as e:
+        logger.critical("FALLO CRÍTICO al intentar hacer commit a la base de datos. Se hará rollback.", exc_info=True)
+        db.rollback()
+        db.info.pop(_TRACK_FILTER_UPDATES, None)
+        raise e
+    _apply_track_filter_updates(db)
+
+def _defer_track_filter_update(db: Session, update: track_filter.TrackFilterUpdate):
+    """Guarda en la sesión el resultado del filtro hasta que el lote quede guardado."""
+    db.info.setdefault(_TRACK_FILTER_UPDATES, []).append(update)
+
+def _apply_track_filter_updates(db: Session):
+    for update in db.info.pop(_TRACK_FILTER_UPDATES, ()):
+        track_filter.track_filter.commit(update)
 
 def log_tracking_events_for_driver(db: Session, events: List[schemas.TrackingPoint], driver_id: int):
     """
     Procesa una lista de eventos de tracking de forma resiliente.
     Guarda cada punto de GPS y maneja los errores de lógica de negocio de forma individual,
     sin revertir todo el lote de datos.
+    Con el buffer de escritura activo, los pings GPS simples se encolan y se insertan en lote
+    desde write_buffer; solo los eventos de inicio/fin se procesan aquí.
     """
+    events = _filter_tracking_events(db, events, driver_id)
+    if write_buffer.TRACKING_BUFFER_ENABLED:
+        events = _buffer_plain_events(events, driver_id)
+    if events:
+        # El filtro avanza en el commit de los eventos de inicio/fin: si falla, el reintento
+        # del lote se evalúa contra el estado anterior
+        _log_tracking_events(db, events, driver_id)
+    else:
+        # Solo pings y ya están en el buffer (si estaba lleno, TrackingBufferFull corta antes)
+        _apply_track_filter_updates(db)
+
+def _filter_tracking_events(db: Session, events: List[schemas.TrackingPoint], driver_id: int) -> List[schemas.TrackingPoint]:
+    """
+    Con TRACK_FILTER_ENABLED, descarta los pings repetidos, quietos o imposibles del conductor.
+    El estado del filtro se actualiza después, cuando el lote queda guardado.
+    """
+    if not track_filter.TRACK_FILTER_ENABLED:
+        return events
+    kept, update = track_filter.track_filter.filter_events(driver_id, events)
+    _defer_track_filter_update(db, update)
+    return kept
+
+def _filter_plain_rows(db: Session, items: List[dict | schemas.TrackingPoint | None], driver_id: int) -> Tuple[List[dict | schemas.TrackingPoint | None], int]:
+    """
+    Versión de _filter_tracking_events para las filas de la ingesta masiva.
+    Solo se filtran las filas de puntos simples: las inválidas (None), que cuentan como
+    rechazadas, y los eventos de inicio/fin se conservan en su lugar.
+    Devuelve los elementos restantes y cuántos se descartaron.
+    """
+    if not track_filter.TRACK_FILTER_ENABLED:
+        return items, 0
+    kept, update = track_filter.track_filter.filter_rows(driver_id, [item for item in items if isinstance(item, dict)])
+    _defer_track_filter_update(db, update)
+    kept_ids = {id(row) for row in kept}
+    remaining = [item for item in items if not isinstance(item, dict) or id(item) in kept_ids]
+    return remaining, len(items) - len(remaining)
+
+def _log_tracking_events(db: Session, events: List[schemas.TrackingPoint], driver_id: int):
+    """Procesa los eventos uno a uno y hace commit al final."""
     affected_fec_ids = set()
+    context = load_delivery_context(db, events, driver_id=driver_id)
 
     for event in events:
         try:
-            # Logica anti-duplicados
-            if event.deliveryId and event.eventType in ["start_delivery", "end_delivery"]:
-                
-                if repositories.check_if_event_exists(db, delivery_id=event.deliveryId, event_type=event.eventType):
-                    
-                    logger.warning(f"Evento duplicado ignorado: {event.eventType} para delivery_id {event.deliveryId}")
-                    continue
-            
-            repositories.create_tracking_point(db, point=event, driver_id=driver_id)
+            _process_tracking_event(db, event, driver_id, affected_fec_ids, context)
+        except Exception as e:
+            logger.error("Error procesando la lógica para el evento %s. Error: %s", event, e, exc_info=True)
+
+    if affected_fec_ids:
+        _complete_finished_fecs(db, affected_fec_ids)
+        repositories.bump_fec_versions(db, affected_fec_ids)
+
+    _commit_tracking_batch(db)
+
+def _buffer_plain_events(events: List[schemas.TrackingPoint], driver_id: int) -> List[schemas.TrackingPoint]:
+    """
+    Encola en el buffer de escritura los pings GPS simples y devuelve los eventos de inicio/fin.
+    Si hay alguno, el buffer se vacía antes, para que la distancia y el estado de la entrega
+    vean todos los puntos anteriores al evento; si ese vaciado falla se lanza
+    TrackingBufferFlushFailed y los eventos de inicio/fin no se procesan.
+    """
+    plain_rows = []
+    lifecycle_events = []
+    for event in events:
+        if event.deliveryId and event.eventType in LIFECYCLE_EVENT_TYPES:
+            lifecycle_events.append(event)
+        else:
+            plain_rows.append(repositories.tracking_point_row(event, driver_id=driver_id))
+
+    write_buffer.tracking_buffer.submit(plain_rows)
+    if lifecycle_events:
+        write_buffer.tracking_buffer.flush(raise_on_failure=True)
+    return lifecycle_events
+
+def ingest_tracking_points_batch(
+    db: Session,
+    points: List[schemas.TrackingPoint],
+    driver_id: int,
+    chunk_size: int | None = None,
+) -> dict:
+    """
+    Motor de ingesta masiva para lotes de puntos de seguimiento.
+    Los puntos GPS simples se insertan en bloques con un solo executemany por bloque;
+    solo los eventos 'start_delivery'/'end_delivery' pasan por la lógica de negocio individual.
+    Devuelve los conteos de filas aceptadas y rechazadas por bloque.
+    """
+    summary = _ingest_tracking_points(db, points, driver_id, chunk_size)
+    _commit_tracking_batch(db)
+    return summary
+
+def ingest_tracking_stream_chunk(
+    db: Session,
+    points: List[schemas.TrackingPoint],
+    driver_id: int,
+    upload_id: str,
+    committed_lines: int,
+) -> dict:
+    """
+    Ingesta un bloque de una subida en streaming y avanza su cursor en la misma transacción,
+    así el cliente puede reanudar exactamente desde la última línea guardada.
+    """
+    summary = _ingest_tracking_points(db, points, driver_id)
+    repositories.save_upload_cursor(db, driver_id=driver_id, upload_id=upload_id, committed_lines=committed_lines)
+    _commit_tracking_batch(db)
+    return summary
+
+def ingest_tracking_batch_arrays(
+    db: Session,
+    batch: track_codec.TrackBatch,
+    driver_id: int,
+    chunk_size: int | None = None,
+) -> dict:
+    """
+    Misma ingesta masiva que ingest_tracking_points_batch para un lote del formato binario:
+    los puntos GPS simples pasan de las columnas decodificadas a filas sin crear objetos Pydantic;
+    solo los eventos de inicio/fin se reconstruyen como TrackingPoint.
+    """
+    lifecycle_mask = batch.event_type_mask(LIFECYCLE_EVENT_TYPES) & (batch.delivery_id > 0)
+    lifecycle_indexes = np.flatnonzero(lifecycle_mask)
+    valid_indexes = np.flatnonzero(~lifecycle_mask & batch.valid_coordinates_mask())
+    lifecycle_events = batch.points(lifecycle_indexes)
+
+    # Mismo orden que el lote; las coordenadas inválidas quedan como None
+    items: List[dict | schemas.TrackingPoint | None] = [None] * len(lifecycle_mask)
+    for index, row in zip(valid_indexes.tolist(), batch.rows(valid_indexes, driver_id=driver_id)):
+        items[index] = row
+    for index, event in zip(lifecycle_indexes.tolist(), lifecycle_events):
+        items[index] = event
+
+    context = load_delivery_context(
+        db, lifecycle_events, driver_id=driver_id,
+        extra_delivery_ids=np.unique(batch.delivery_id[batch.delivery_id > 0]).tolist()
+    )
+    summary = _ingest_tracking_rows(db, items, driver_id, context, chunk_size)
+    _commit_tracking_batch(db)
+    return summary
+
+def _ingest_tracking_points(
+    db: Session,
+    points: List[schemas.TrackingPoint],
+    driver_id: int,
+    chunk_size: int | None = None,
+) -> dict:
+    """Implementación de la ingesta masiva, sin hacer commit."""
+    items: List[dict | schemas.TrackingPoint | None] = []
+    for point in points:
+        if point.deliveryId and point.eventType in LIFECYCLE_EVENT_TYPES:
+            items.append(point)
+        elif utils.is_valid_coordinate(point.latitude, point.longitude):
+            items.append(repositories.tracking_point_row(point, driver_id=driver_id))
+        else:
+            items.append(None)
+
+    context = load_delivery_context(db, points, driver_id=driver_id)
+    return _ingest_tracking_rows(db, items, driver_id, context, chunk_size)
 
-            if event.deliveryId:
-                delivery = repositories.get_delivery_by_id(db, delivery_id=event.deliveryId, driver_id=driver_id)
-                if delivery:
-                    if delivery.fec_id:
-                        affected_fec_ids.add(delivery.fec_id)
-                    
-                    location_data = schemas.Location(latitude=event.latitude, longitude=event.longitude)
-
-                    if event.eventType == "start_delivery":
-                        repositories.update_delivery_status(
-                            db,
-                            delivery=delivery,
-                            new_status="in_progress",
-                            timestamp=event.timestamp,
-                            location=location_data,
-                            estimated_duration=event.estimatedDuration,
-                            estimated_distance=event.estimatedDistance,
-                        )
-                    elif event.eventType == "end_delivery":
-                        repositories.update_delivery_status(db, delivery=delivery, new_status="completed", timestamp=event.timestamp, location=location_data)
-                        
-                        if (delivery.client and
-                            delivery.client.salesperson and
-                            delivery.client.salesperson.phone and
-                            delivery.invoice_id):
-                            
-                            # whatsapp_service.send_completion_whatsapp(
-                            #     salesperson_phone=delivery.client.salesperson.phone,
-                            #     client_id=delivery.client.client_id,
-                            #     invoice_id=delivery.invoice_id,
-                            #     client_name=delivery.client.name
-                            # )
-                            sms_service.send_completion_sms(
-                                salesperson_phone=delivery.client.salesperson.phone,
-                                client_id=delivery.client.client_id,
-                                invoice_id=delivery.invoice_id,
-                            )
-                        else:
-                            logger.warning(f"ADVERTENCIA: Faltan datos del vendedor para la entrega {delivery.delivery_id}. No se envió WhatsApp.")
+def _insert_plain_chunk(db: Session, chunk: List[dict | None], chunk_index: int, context: DeliveryContext) -> dict:
+    """Inserta un bloque de puntos simples en un savepoint y devuelve su resumen."""
+    rows = [row for row in chunk if row is not None]
+    accepted = 0
+    duplicates = 0
+    rejected = len(chunk) - len(rows)
 
+    if rows:
+        try:
+            with db.begin_nested():
+                accepted = repositories.insert_tracking_points(db, rows)
+                if accepted == len(rows):
+                    repositories.accumulate_track_points(context.track_stats, rows)
+                else:
+                    repositories.flag_track_stats_for_recompute(context.track_stats, rows)
+            duplicates = len(rows) - accepted
         except Exception as e:
-            logger.error(f"Error procesando la lógica para el evento {event}. Error: {e}", exc_info=True)
+            logger.error("Error insertando el bloque %s de puntos GPS (%s filas). Error: %s", chunk_index, len(rows), e, exc_info=True)
+            rejected += len(rows)
+
+    return {"chunk": chunk_index, "accepted": accepted, "rejected": rejected, "duplicates": duplicates}
+
+def _ingest_tracking_rows(
+    db: Session,
+    items: List[dict | schemas.TrackingPoint | None],
+    driver_id: int,
+    context: DeliveryContext,
+    chunk_size: int | None = None,
+) -> dict:
+    """
+    Procesa el lote en el orden recibido: los puntos simples consecutivos se insertan por
+    bloques y cada evento de inicio/fin (TrackingPoint) se procesa después de los puntos
+    que lo preceden, así su distancia y estado los ven como en la ingesta uno a uno.
+    Las coordenadas inválidas llegan como None y cuentan como rechazadas; los puntos que
+    descarta el filtro de tracking se reportan aparte en 'filtered'.
+    """
+    chunk_size = chunk_size or TRACKING_BATCH_CHUNK_SIZE
+    items, filtered = _filter_plain_rows(db, items, driver_id)
+
+    chunks = []
+    pending: List[dict | None] = []
+    affected_fec_ids = set()
+    plain_count = 0
+    lifecycle_count = 0
+    lifecycle_accepted = 0
+    lifecycle_duplicates = 0
+    for item in items:
+        if not isinstance(item, schemas.TrackingPoint):
+            plain_count += 1
+            pending.append(item)
+            if len(pending) == chunk_size:
+                chunks.append(_insert_plain_chunk(db, pending, len(chunks), context))
+                pending = []
+            continue
+
+        # Un evento de inicio/fin cierra el bloque en curso: sus puntos van antes
+        if pending:
+            chunks.append(_insert_plain_chunk(db, pending, len(chunks), context))
+            pending = []
+        lifecycle_count += 1
+        try:
+            with db.begin_nested():
+                if _process_tracking_event(db, item, driver_id, affected_fec_ids, context):
+                    lifecycle_accepted += 1
+                else:
+                    lifecycle_duplicates += 1
+        except Exception as e:
+            logger.error("Error procesando la lógica para el evento %s. Error: %s", item, e, exc_info=True)
+    if pending:
+        chunks.append(_insert_plain_chunk(db, pending, len(chunks), context))
 
     if affected_fec_ids:
-        for fec_id in affected_fec_ids:
-            try:
-                fec_to_check = db.get(models.FEC, fec_id)
-                if fec_to_check and fec_to_check.status != "completed":
-                    all_deliveries = repositories.get_all_deliveries_for_fec(db, fec_id=fec_id)
-                    is_fec_completed = all(d.status in ["completed", "cancelled"] for d in all_deliveries)
-                    if is_fec_completed:
-                        logger.info(f"Todas las entregas del FEC {fec_id} están completas. Actualizando estado.")
-                        repositories.update_fec_status(db, fec=fec_to_check, new_status="completed")
-            except Exception as e:
-                logger.error(f"Error al verificar el estado final del FEC {fec_id}. Error: {e}", exc_info=True)
+        _complete_finished_fecs(db, affected_fec_ids)
+        repositories.bump_fec_versions(db, affected_fec_ids)
 
-    try:
-        db.commit()
-    except Exception as e:
-        logger.critical("FALLO CRÍTICO al intentar hacer commit a la base de datos. Se hará rollback.", exc_info=True)
-        db.rollback()
-        raise e
+    accepted_total = sum(c["accepted"] for c in chunks) + lifecycle_accepted
+    duplicates_total = sum(c["duplicates"] for c in chunks) + lifecycle_duplicates
+    return {
+        "accepted": accepted_total,
+        "rejected": plain_count + lifecycle_count - accepted_total - duplicates_total,
+        "duplicates": duplicates_total,
+        "filtered": filtered,
+        "chunks": chunks,
+        "lifecycle_events": {
+            "accepted": lifecycle_accepted,
+            "rejected": lifecycle_count - lifecycle_accepted - lifecycle_duplicates,
+            "duplicates": lifecycle_duplicates,
+        },
+    }
 
 def create_incident_report(db: Session, delivery_id: int, incident_data: schemas.IncidentReport, driver_id: int):
-    """Gestiona la lógica de negocio para reportar una incidencia."""
+    """Gestiona la lógica de negocio para reportar una incidencia. Devuelve el modelo de la entrega."""
     delivery = repositories.get_delivery_by_id(db, delivery_id=delivery_id, driver_id=driver_id)
     if not delivery:
         raise HTTPException(
@@ -105,7 +443,7 @@ def create_incident_report(db: Session, delivery_id: int, incident_data: schemas
         )
     
     if delivery.status in ["completed", "cancelled"]:
-        logger.warning(f"Se intentó reportar una incidencia sobre una entrega ya finalizada (ID: {delivery_id}, Estado: {delivery.status})")
+        logger.warning("Se intentó reportar una incidencia sobre una entrega ya finalizada (ID: %s, Estado: %s)", delivery_id, delivery.status)
         return delivery
     
     end_delivery_event = schemas.TrackingPoint(
@@ -115,8 +453,10 @@ def create_incident_report(db: Session, delivery_id: int, incident_data: schemas
         eventType="end_delivery",
         deliveryId=delivery_id
     )
+    track_stats = repositories.load_track_stats(db, [delivery_id])
     repositories.create_tracking_point(db, point=end_delivery_event, driver_id=driver_id)
-    logger.info(f"Evento 'end_delivery' creado para la incidencia de la entrega ID: {delivery_id}")
+    repositories.accumulate_track_points(track_stats, [repositories.tracking_point_row(end_delivery_event, driver_id=driver_id)])
+    logger.info("Evento 'end_delivery' creado para la incidencia de la entrega ID: %s", delivery_id)
 
     try:
         current_timestamp = datetime.now(timezone.utc)
@@ -131,10 +471,12 @@ def create_incident_report(db: Session, delivery_id: int, incident_data: schemas
             timestamp=current_timestamp,
             location=location_data
         )
+        if updated_delivery_model.fec_id:
+            repositories.bump_fec_versions(db, [updated_delivery_model.fec_id])
 
         db.commit()
         db.refresh(updated_delivery_model)
-        return utils.delivery_model_to_schema(updated_delivery_model)
+        return updated_delivery_model
     except Exception as e:
         db.rollback()
         raise e
@@ -143,19 +485,26 @@ def get_fec_details_for_driver(db: Session, fec_number: int, driver_id: int):
     """
     Orquesta la obtención y enriquecimiento de los detalles de un FEC para un conductor.
     """
-    fec = repositories.get_fec_by_number_and_driver(db, fec_number=fec_number, driver_id=driver_id)
-    
-    if not fec:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"El FEC con número '{fec_number}' no fue encontrado para este conductor."
-        )
+    return utils.fec_model_to_schema(_load_fec_for_driver(db, fec_number=fec_number, driver_id=driver_id))
+
+def _fec_not_found(fec_number: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"El FEC con número '{fec_number}' no fue encontrado para este conductor."
+    )
 
+def _apply_fec_read_transitions(db: Session, fec: models.FEC, fec_number: int) -> bool:
+    """
+    Aplica las transiciones de estado que dispara la lectura de un FEC, sin hacer commit.
+    Devuelve True si hay cambios que guardar. Solo trabaja en memoria, así que sirve igual
+    con una sesión síncrona o asíncrona.
+    """
+    # Las entregas ya están en memoria: la revisión de los contadores no hace consultas extra
+    open_deliveries, status_changed = repositories.sync_fec_delivery_counters(fec)
     if fec.status == "pending":
         repositories.update_fec_status(db, fec, "in_progress")
-        db.commit()
-        db.refresh(fec)
-        logger.info(f"El FEC ID: {fec.fec_id} ha sido actualizado a 'in_progress'.")
+        status_changed = True
+        logger.info("El FEC ID: %s ha sido actualizado a 'in_progress'.", fec.fec_id)
     
     if fec.status == "completed":
         raise HTTPException(
@@ -163,29 +512,79 @@ def get_fec_details_for_driver(db: Session, fec_number: int, driver_id: int):
             detail=f"El FEC {fec_number} ya fue completado y no puede ser iniciado de nuevo."
         )
 
-    if repositories.are_all_deliveries_finalized(db, fec.fec_id):
+    if open_deliveries == 0:
         repositories.update_fec_status(db, fec, "completed")
+        status_changed = True
+        logger.info("El FEC ID: %s ha sido actualizado a 'completed'.", fec.fec_id)
+    return status_changed
+
+def _load_fec_for_driver(db: Session, fec_number: int, driver_id: int) -> models.FEC:
+    """
+    Carga el FEC con sus entregas, clientes y vendedores en un número fijo de consultas
+    y aplica las transiciones de estado que dispara la lectura.
+    """
+    fec = repositories.get_fec_details_by_number_and_driver(db, fec_number=fec_number, driver_id=driver_id)
+    
+    if not fec:
+        raise _fec_not_found(fec_number)
+
+    if _apply_fec_read_transitions(db, fec, fec_number):
         db.commit()
-        db.refresh(fec)
-        logger.info(f"El FEC ID: {fec.fec_id} ha sido actualizado a 'completed'.")
+        # El commit expira las relaciones; se recargan con la misma consulta ansiosa
+        fec = repositories.get_fec_details_by_id(db, fec.fec_id)
         
-    # needs_commit = False
-    # for delivery in fec.deliveries:
-    #     if (delivery.start_latitud is None or delivery.start_latitud == 0) and delivery.client and delivery.client.gps_location:
-            
-    #         coords = utils.parse_gps_location(delivery.client.gps_location)
-            
-    #         if coords:
-    #             delivery.start_latitud, delivery.start_longitud = coords
-    #             db.add(delivery)
-    #             needs_commit = True
-    #             logger.info(f"Coordenadas actualizadas para la entrega ID: {delivery.delivery_id}")
-
-    # if needs_commit:
-    #     db.commit()
-    #     db.refresh(fec)
-        
-    return utils.fec_model_to_schema(fec)
+    return fec
+
+@dataclass
+class FECResponse:
+    """Respuesta serializada de un FEC. `body` es None cuando el cliente ya tiene esta versión (304)."""
+    etag: str
+    body: bytes | None = None
+
+def _fec_etag(fec_id: int, version: int) -> str:
+    return f'"fec-{fec_id}-v{version}"'
+
+def cached_fec_response(header: Tuple[int, int, str] | None, if_none_match: str | None) -> FECResponse | None:
+    """
+    Intenta responder con la versión actual del FEC (fec_id, version, status) sin cargarlo:
+    304 si coincide con el ETag del cliente, o el cuerpo guardado en caché.
+    Devuelve None si hay que construir la respuesta completa.
+    """
+    if header is None:
+        return None
+    fec_id, version, fec_status = header
+    # 'pending' requiere la transición a 'in_progress' y 'completed' el 403: ambos van por el camino completo
+    if fec_status in ("pending", "completed"):
+        return None
+    etag = _fec_etag(fec_id, version)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return FECResponse(etag=etag)
+    cached_body = fec_response_cache.get((fec_id, version))
+    if cached_body is not None:
+        return FECResponse(etag=etag, body=cached_body)
+    return None
+
+def cache_fec_response(fec: models.FEC) -> FECResponse:
+    """Serializa un FEC ya cargado y lo guarda en la caché bajo su versión."""
+    # La versión se lee junto con las entregas: el cuerpo nunca es más viejo que su clave
+    cache_key = (fec.fec_id, fec.version)
+    body = serializers.render_fec(fec)
+    fec_response_cache.set(cache_key, body)
+    return FECResponse(etag=_fec_etag(*cache_key), body=body)
+
+def get_fec_details_response(db: Session, fec_number: int, driver_id: int, if_none_match: str | None = None) -> FECResponse:
+    """
+    Devuelve los detalles de un FEC ya serializados, usando una caché por (FEC, versión).
+    Primero lee solo la versión del FEC: si coincide con el ETag del cliente responde 304,
+    y si la respuesta de esa versión está en caché la devuelve sin cargar las entregas.
+    """
+    header = repositories.get_fec_version(db, fec_number=fec_number, driver_id=driver_id)
+    cached = cached_fec_response(header, if_none_match)
+    if cached is not None:
+        return cached
+
+    fec = _load_fec_for_driver(db, fec_number=fec_number, driver_id=driver_id)
+    return cache_fec_response(fec)
 
 def update_fec_route_details(db: Session, fec_id: int, route_data: schemas.OptimizedRouteData, driver_id: int):
     """Servicio para actualizar la ruta optimizada de un FEC."""
@@ -200,6 +599,70 @@ def update_fec_route_details(db: Session, fec_id: int, route_data: schemas.Optim
         polyline=route_data.suggested_journey_polyline
     )
     db.commit()
-    db.refresh(fec)
     
-    return fec
\ No newline at end of file
+    return repositories.get_fec_details_by_id(db, fec_id)
+
+def _delivery_coordinates(delivery: models.Delivery) -> Tuple[float, float] | None:
+    """Ubicación del cliente; si no es válida, las coordenadas con que se creó la entrega."""
+    location = utils.parse_gps_location(delivery.client.gps_location if delivery.client else None)
+    if location and utils.is_valid_coordinate(*location):
+        return location
+    if utils.is_valid_coordinate(delivery.start_latitude, delivery.start_longitude):
+        return delivery.start_latitude, delivery.start_longitude
+    return None
+
+def _driver_position(db: Session, fec: models.FEC, route_request: schemas.RouteOptimizationRequest) -> Tuple[float, float] | None:
+    """Posición de salida: la que manda la app, el último punto registrado o el fin de la última entrega."""
+    if utils.is_valid_coordinate(route_request.latitude, route_request.longitude):
+        return route_request.latitude, route_request.longitude
+    position = repositories.get_latest_tracking_position(db, [delivery.delivery_id for delivery in fec.deliveries])
+    if position:
+        return position
+    finished = [
+        delivery for delivery in fec.deliveries
+        if delivery.delivery_time and utils.is_valid_coordinate(delivery.end_latitude, delivery.end_longitude)
+    ]
+    if finished:
+        last = max(finished, key=lambda delivery: delivery.delivery_time)
+        return last.end_latitude, last.end_longitude
+    return None
+
+def optimize_fec_route(
+    db: Session, fec_id: int, driver_id: int, route_request: schemas.RouteOptimizationRequest
+) -> Tuple[models.FEC, route_optimizer.OptimizedRoute]:
+    """
+    Calcula en el servidor el orden de visita de las entregas abiertas del FEC y lo guarda
+    como ruta optimizada. Las entregas ya finalizadas encabezan la lista en el orden en que
+    se terminaron; las que no tienen coordenadas van al final por prioridad.
+    La polilínea anterior se descarta porque ya no corresponde al nuevo orden.
+    """
+    fec = repositories.get_fec_details_by_id(db, fec_id)
+    if not fec or fec.driver_id != driver_id:
+        raise HTTPException(status_code=404, detail="FEC no encontrado o no pertenece al conductor.")
+
+    finalized, stops, without_location = [], [], []
+    for delivery in fec.deliveries:
+        if delivery.status in FINAL_DELIVERY_STATUSES:
+            finalized.append(delivery)
+            continue
+        location = _delivery_coordinates(delivery)
+        if location is None:
+            without_location.append(delivery)
+        else:
+            stops.append(route_optimizer.Stop(delivery.delivery_id, location[0], location[1], delivery.priority))
+
+    # Orden de entrada: el del despachador (prioridad), para comparar la distancia
+    stops.sort(key=lambda stop: (stop.priority is None, stop.priority or 0, stop.key))
+    result = route_optimizer.optimize_route(
+        stops,
+        origin=_driver_position(db, fec, route_request),
+        time_budget_ms=route_request.time_budget_ms,
+        priority_band=route_request.priority_band,
+    )
+    finalized.sort(key=lambda delivery: (delivery.delivery_time is None, delivery.delivery_time or datetime.min, delivery.delivery_id))
+    without_location.sort(key=lambda delivery: (delivery.priority is None, delivery.priority or 0, delivery.delivery_id))
+    order = [delivery.delivery_id for delivery in finalized] + result.order + [delivery.delivery_id for delivery in without_location]
+
+    repositories.update_fec_route(db, fec=fec, optimized_order_list_json=route_codec.order_to_json(order), polyline=None)
+    db.commit()
+    return repositories.get_fec_details_by_id(db, fec_id), result
\ No newline at end of file
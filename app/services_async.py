@@ -0,0 +1,33 @@
+# app/services_async.py
+
+import logging
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import repositories_async, services
+
+logger = logging.getLogger(__name__)
+
+# La ingesta de tracking no tiene versión async: su trabajo de CPU (decodificar, filtrar,
+# armar filas) y el flush síncrono correrían en el hilo del event loop. Sigue en
+# routers/events.py, en el threadpool, aunque ASYNC_DATABASE_URL esté definido.
+
+
+async def get_fec_details_response(db: AsyncSession, fec_number: int, driver_id: int, if_none_match: str | None = None) -> services.FECResponse:
+    """
+    Versión asíncrona de services.get_fec_details_response: misma caché por versión y ETag,
+    con las consultas hechas sobre el motor async.
+    """
+    header = await repositories_async.get_fec_version(db, fec_number=fec_number, driver_id=driver_id)
+    cached = services.cached_fec_response(header, if_none_match)
+    if cached is not None:
+        return cached
+
+    fec = await repositories_async.get_fec_details_by_number_and_driver(db, fec_number=fec_number, driver_id=driver_id)
+    if not fec:
+        raise services._fec_not_found(fec_number)
+
+    if services._apply_fec_read_transitions(db, fec, fec_number):
+        await db.commit()
+        fec = await repositories_async.get_fec_details_by_id(db, fec.fec_id)
+
+    return services.cache_fec_response(fec)
@@ -1,5 +1,6 @@
 # app/sms_service.py
 
+import logging
 import os
 import requests
 from dotenv import load_dotenv
@@ -7,7 +8,11 @@ from datetime import datetime
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SMSMASIVOS_API_KEY = os.getenv("SMS_API_KEY")
+# Tiempo máximo (segundos) para conectar y leer la respuesta del proveedor
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("SMS_TIMEOUT_SECONDS", "10"))
 API_URL = "https://api.smsmasivos.com.mx/sms/send"
 
 def send_completion_sms(salesperson_phone: str, client_id: int, invoice_id: str):
@@ -16,7 +21,7 @@ def send_completion_sms(salesperson_phone: str, client_id: int, invoice_id: str)
     usando la API de SMSMASIVOS.
     """
     if not SMSMASIVOS_API_KEY:
-        print("ADVERTENCIA: Falta la variable SMS_API_KEY en el archivo .env. No se enviarán SMS.")
+        logger.warning("Falta la variable SMS_API_KEY en el archivo .env. No se enviarán SMS.")
         return False
 
     try:
@@ -40,24 +45,24 @@ def send_completion_sms(salesperson_phone: str, client_id: int, invoice_id: str)
             'sandbox': '1'
         }
 
-        print(f"Enviando SMS de prueba a {salesperson_phone}...")
+        logger.info("Enviando SMS de prueba a %s...", salesperson_phone)
         
-        response = requests.post(url=API_URL, headers=headers, data=payload)
+        response = requests.post(url=API_URL, headers=headers, data=payload, timeout=REQUEST_TIMEOUT_SECONDS)
         
         response.raise_for_status()
         
         response_data = response.json()
         
         if response_data.get("success") is True:
-            print(f"ÉXITO: La API de SMSMASIVOS aceptó el mensaje. Respuesta: {response_data}")
+            logger.info("La API de SMSMASIVOS aceptó el mensaje.", extra={"provider_response": response_data})
             return True
         else:
-            print(f"ERROR: La API de SMSMASIVOS devolvió un error. Respuesta: {response_data}")
+            logger.error("La API de SMSMASIVOS devolvió un error.", extra={"provider_response": response_data})
             return False
 
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Falló la conexión con la API de SMSMASIVOS. Razón: {e}")
+        logger.error("Falló la conexión con la API de SMSMASIVOS. Razón: %s", e)
         return False
     except Exception as e:
-        print(f"ERROR: Ocurrió un error inesperado al enviar el SMS. Razón: {e}")
+        logger.error("Ocurrió un error inesperado al enviar el SMS.", exc_info=True)
         return False
\ No newline at end of file
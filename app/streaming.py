@@ -0,0 +1,139 @@
+# app/streaming.py
+
+import json
+import logging
+import os
+import zlib
+from typing import AsyncIterator, List, Tuple
+from fastapi import HTTPException, status
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import repositories, schemas, services
+
+logger = logging.getLogger(__name__)
+
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+# Tamaño máximo de cada trozo descomprimido: acota la memoria ante un gzip "bomba"
+STREAM_INFLATE_CHUNK_BYTES = int(os.getenv("STREAM_INFLATE_CHUNK_BYTES", "1048576"))
+STREAM_MAX_REPORTED_ERRORS = int(os.getenv("STREAM_MAX_REPORTED_ERRORS", "20"))
+
+
+def _inflate(decompressor, data: bytes):
+    """Descomprime 'data' por trozos de a lo sumo STREAM_INFLATE_CHUNK_BYTES."""
+    chunk = decompressor.decompress(data, STREAM_INFLATE_CHUNK_BYTES)
+    yield chunk
+    while decompressor.unconsumed_tail:
+        yield decompressor.decompress(decompressor.unconsumed_tail, STREAM_INFLATE_CHUNK_BYTES)
+
+async def iter_ndjson_lines(byte_stream: AsyncIterator[bytes], gzip_encoded: bool = False) -> AsyncIterator[Tuple[bytes, bool]]:
+    """
+    Parte el cuerpo de la petición en líneas NDJSON a medida que llega, sin cargarlo entero.
+    Devuelve tuplas (línea, terminada); 'terminada' es False solo para una última línea
+    sin salto de línea, que puede venir cortada si el cliente perdió la conexión.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzip_encoded else None
+    buffer = b""
+    async for data in byte_stream:
+        pieces = _inflate(decompressor, data) if decompressor else (data,)
+        try:
+            for piece in pieces:
+                buffer += piece
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    yield line, True
+                if len(buffer) > STREAM_MAX_LINE_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Una línea supera el máximo de {STREAM_MAX_LINE_BYTES} bytes."
+                    )
+        except zlib.error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El cuerpo gzip no es válido.")
+
+    if decompressor and not decompressor.eof:
+        # Gzip incompleto: lo que queda en el buffer es una línea a medias
+        logger.warning("Subida gzip incompleta; se descarta la última línea parcial.")
+        return
+    if buffer:
+        yield buffer, False
+
+async def ingest_ndjson_stream(
+    db: Session,
+    byte_stream: AsyncIterator[bytes],
+    driver_id: int,
+    upload_id: str,
+    offset: int = 0,
+    gzip_encoded: bool = False,
+) -> dict:
+    """
+    Ingesta una subida NDJSON (opcionalmente gzip) de puntos de seguimiento.
+    Cada línea es un TrackingPoint; se guardan en bloques de TRACKING_BATCH_CHUNK_SIZE y
+    el cursor de la subida avanza en la misma transacción que cada bloque.
+    'offset' es el número de líneas que el cliente omitió al reanudar: las líneas
+    que ya estaban guardadas se saltan, y un offset por delante del cursor es un conflicto.
+    """
+    committed_lines = await run_in_threadpool(repositories.get_upload_cursor, db, driver_id, upload_id)
+    if offset > committed_lines:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "El offset de la subida va por delante de lo guardado; reanude desde committed_lines.",
+                "committed_lines": committed_lines,
+            }
+        )
+
+    summary = {
+        "accepted": 0,
+        "rejected": 0,
+        "duplicates": 0,
+        "filtered": 0,
+        "invalid_lines": 0,
+        "skipped_lines": 0,
+        "errors": [],
+        "truncated": False,
+    }
+    pending: List[schemas.TrackingPoint] = []
+    line_number = offset
+    processed_lines = committed_lines
+
+    async def flush():
+        nonlocal pending, committed_lines
+        if processed_lines == committed_lines:
+            return
+        chunk_summary = await run_in_threadpool(
+            services.ingest_tracking_stream_chunk, db, pending, driver_id, upload_id, processed_lines
+        )
+        summary["accepted"] += chunk_summary["accepted"]
+        summary["rejected"] += chunk_summary["rejected"]
+        summary["duplicates"] += chunk_summary["duplicates"]
+        summary["filtered"] += chunk_summary["filtered"]
+        committed_lines = processed_lines
+        pending = []
+
+    async for raw_line, terminated in iter_ndjson_lines(byte_stream, gzip_encoded):
+        line_number += 1
+        if line_number <= committed_lines:
+            summary["skipped_lines"] += 1
+            continue
+
+        if raw_line.strip():
+            try:
+                point = schemas.TrackingPoint(**json.loads(raw_line))
+            except (ValueError, TypeError) as e:
+                if not terminated:
+                    # Última línea cortada: no avanza el cursor, el cliente la reenvía al reanudar
+                    summary["truncated"] = True
+                    break
+                summary["invalid_lines"] += 1
+                if len(summary["errors"]) < STREAM_MAX_REPORTED_ERRORS:
+                    summary["errors"].append({"line": line_number, "error": str(e)[:200]})
+            else:
+                pending.append(point)
+        processed_lines = line_number
+
+        if len(pending) >= services.TRACKING_BATCH_CHUNK_SIZE:
+            await flush()
+
+    await flush()
+    summary["committed_lines"] = committed_lines
+    return summary
@@ -0,0 +1,241 @@
+# app/track_codec.py
+"""
+Formato binario compacto para lotes de puntos de seguimiento.
+
+Estructura (little-endian):
+    cabecera   magic b"TRK1", número de puntos (uint32), epoch base en ms (int64),
+               longitud de los metadatos (uint32)
+    metadatos  JSON con la tabla de tipos de evento y los campos opcionales
+               (estimatedDuration/estimatedDistance/eventId) de los puntos que los traen
+    columnas   bloque comprimido con zlib: latitud y longitud escaladas a enteros (1e-6 grados)
+               y codificadas como diferencias, diferencias de tiempo en ms (int32),
+               índice del tipo de evento (uint8) y deliveryId (int32, 0 = sin entrega)
+
+Las diferencias entre puntos consecutivos son números pequeños, así que zlib las comprime
+muy bien; el servidor las decodifica con cumsum directamente a arrays de NumPy.
+"""
+
+import json
+import os
+import struct
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from . import schemas
+
+MEDIA_TYPE = "application/vnd.entregas.track+binary"
+MAGIC = b"TRK1"
+COORDINATE_SCALE = 1_000_000
+TRACK_CODEC_MAX_POINTS = int(os.getenv("TRACK_CODEC_MAX_POINTS", "100000"))
+
+_HEADER = struct.Struct("<4sIqI")
+_COLUMNS = (
+    ("latitude", np.dtype("<i4")),
+    ("longitude", np.dtype("<i4")),
+    ("timestamp", np.dtype("<i4")),
+    ("event_type", np.dtype("u1")),
+    ("delivery_id", np.dtype("<i4")),
+)
+_BYTES_PER_POINT = sum(dtype.itemsize for _, dtype in _COLUMNS)
+_EXTRA_FIELDS = ("estimatedDuration", "estimatedDistance", "eventId")
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+# Mismo límite que schemas.TrackingPoint.eventId y la columna client_event_id
+_MAX_EVENT_ID_LENGTH = 64
+# Timestamps que datetime puede representar: de 1970 al final del año 9999 (UTC)
+_MAX_TIMESTAMP_MS = (datetime(9999, 12, 31, 23, 59, 59, 999000, tzinfo=timezone.utc) - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(milliseconds=1)
+
+
+class TrackCodecError(ValueError):
+    """El payload binario no respeta el formato."""
+
+
+@dataclass
+class TrackBatch:
+    """Lote de puntos decodificado en columnas."""
+    latitude: np.ndarray
+    longitude: np.ndarray
+    timestamp_ms: np.ndarray
+    event_type: np.ndarray
+    delivery_id: np.ndarray
+    event_types: List[str]
+    extras: Dict[int, dict] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def event_type_mask(self, event_types: Iterable[str]) -> np.ndarray:
+        """Máscara de los puntos cuyo tipo de evento está en 'event_types'."""
+        codes = [code for code, name in enumerate(self.event_types) if name in event_types]
+        return np.isin(self.event_type, codes)
+
+    def valid_coordinates_mask(self) -> np.ndarray:
+        """Equivalente vectorizado de utils.is_valid_coordinate."""
+        return (np.abs(self.latitude) <= 90.0) & (np.abs(self.longitude) <= 180.0)
+
+    def timestamps(self, indexes: np.ndarray) -> List[datetime]:
+        """Convierte los timestamps de los puntos indicados a datetimes UTC."""
+        return [
+            datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+            for ms in self.timestamp_ms[indexes].tolist()
+        ]
+
+    def rows(self, indexes: np.ndarray, driver_id: int) -> List[dict]:
+        """Filas listas para repositories.bulk_insert_tracking_points, sin pasar por Pydantic."""
+        event_types = self.event_types
+        extras = self.extras
+        return [
+            {
+                "latitude": latitude,
+                "longitude": longitude,
+                "timestamp": timestamp,
+                "event_type": event_types[event_code],
+                "driver_id": driver_id,
+                "delivery_id": delivery_id or None,
+                "client_event_id": extras[index].get("eventId") if index in extras else None,
+            }
+            for index, latitude, longitude, timestamp, event_code, delivery_id in zip(
+                indexes.tolist(),
+                self.latitude[indexes].tolist(),
+                self.longitude[indexes].tolist(),
+                self.timestamps(indexes),
+                self.event_type[indexes].tolist(),
+                self.delivery_id[indexes].tolist(),
+            )
+        ]
+
+    def points(self, indexes: np.ndarray) -> List[schemas.TrackingPoint]:
+        """Reconstruye los puntos indicados como TrackingPoint (para los eventos con lógica de negocio)."""
+        return [
+            schemas.TrackingPoint(
+                latitude=row["latitude"],
+                longitude=row["longitude"],
+                timestamp=row["timestamp"],
+                eventType=row["event_type"],
+                deliveryId=row["delivery_id"],
+                **self.extras.get(index, {}),
+            )
+            for index, row in zip(indexes.tolist(), self.rows(indexes, driver_id=0))
+        ]
+
+
+def epoch_ms(timestamp: datetime) -> int:
+    """Milisegundos desde epoch; un datetime sin zona se toma como UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return round(timestamp.timestamp() * 1000)
+
+def _deltas(values: np.ndarray, first: int = 0) -> np.ndarray:
+    deltas = np.diff(values, prepend=first)
+    if len(deltas) and (deltas.min() < _INT32_MIN or deltas.max() > _INT32_MAX):
+        raise TrackCodecError("Una diferencia entre puntos consecutivos no cabe en 32 bits.")
+    return deltas
+
+def _delivery_ids(values: np.ndarray) -> np.ndarray:
+    # La columna es int32: un ID mayor se convertiría en silencio en el de otra entrega
+    if len(values) and (values.min() < 0 or values.max() > _INT32_MAX):
+        raise TrackCodecError("Un deliveryId no cabe en 32 bits.")
+    return values
+
+def encode_batch(batch: TrackBatch) -> bytes:
+    """Serializa un TrackBatch al formato binario."""
+    count = len(batch)
+    base_ms = int(batch.timestamp_ms[0]) if count else 0
+    columns = {
+        "latitude": _deltas(np.rint(batch.latitude * COORDINATE_SCALE).astype(np.int64)),
+        "longitude": _deltas(np.rint(batch.longitude * COORDINATE_SCALE).astype(np.int64)),
+        "timestamp": _deltas(batch.timestamp_ms.astype(np.int64), first=base_ms),
+        "event_type": batch.event_type,
+        "delivery_id": _delivery_ids(batch.delivery_id),
+    }
+    body = b"".join(columns[name].astype(dtype).tobytes() for name, dtype in _COLUMNS)
+    meta = json.dumps(
+        {"eventTypes": batch.event_types, "extras": {str(k): v for k, v in batch.extras.items()}},
+        separators=(",", ":"),
+    ).encode()
+    return _HEADER.pack(MAGIC, count, base_ms, len(meta)) + meta + zlib.compress(body)
+
+def encode(points: Sequence[schemas.TrackingPoint]) -> bytes:
+    """Serializa una lista de TrackingPoint (lado cliente, benchmarks y pruebas)."""
+    event_types = list(dict.fromkeys(point.eventType for point in points))
+    if len(event_types) > 255:
+        raise TrackCodecError("El lote tiene más de 255 tipos de evento distintos.")
+    codes = {name: code for code, name in enumerate(event_types)}
+    extras = {}
+    for index, point in enumerate(points):
+        values = {name: getattr(point, name) for name in _EXTRA_FIELDS if getattr(point, name) is not None}
+        if values:
+            extras[index] = values
+    return encode_batch(TrackBatch(
+        latitude=np.array([point.latitude for point in points], dtype=np.float64),
+        longitude=np.array([point.longitude for point in points], dtype=np.float64),
+        timestamp_ms=np.array([epoch_ms(point.timestamp) for point in points], dtype=np.int64),
+        event_type=np.array([codes[point.eventType] for point in points], dtype=np.uint8),
+        delivery_id=np.array([point.deliveryId or 0 for point in points], dtype=np.int64),
+        event_types=event_types,
+        extras=extras,
+    ))
+
+def decode(payload: bytes, max_points: int | None = None) -> TrackBatch:
+    """Decodifica el formato binario a columnas. Lanza TrackCodecError si el payload no es válido."""
+    max_points = max_points or TRACK_CODEC_MAX_POINTS
+    if len(payload) < _HEADER.size:
+        raise TrackCodecError("Payload demasiado corto.")
+    magic, count, base_ms, meta_len = _HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise TrackCodecError("Cabecera desconocida.")
+    if count > max_points:
+        raise TrackCodecError(f"El lote supera el máximo de {max_points} puntos.")
+
+    meta_end = _HEADER.size + meta_len
+    try:
+        meta = json.loads(payload[_HEADER.size:meta_end])
+        event_types = [str(name) for name in meta["eventTypes"]]
+        extras = {
+            int(index): {name: str(values[name]) for name in _EXTRA_FIELDS if values.get(name) is not None}
+            for index, values in meta.get("extras", {}).items()
+        }
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise TrackCodecError("Metadatos inválidos.")
+    if any(len(values.get("eventId", "")) > _MAX_EVENT_ID_LENGTH for values in extras.values()):
+        raise TrackCodecError(f"eventId supera los {_MAX_EVENT_ID_LENGTH} caracteres.")
+    if not 0 <= base_ms <= _MAX_TIMESTAMP_MS:
+        raise TrackCodecError("Timestamp base fuera de rango.")
+
+    # max_length acota la memoria: nunca se descomprime más de lo que anuncia la cabecera
+    expected = count * _BYTES_PER_POINT
+    decompressor = zlib.decompressobj()
+    try:
+        body = decompressor.decompress(payload[meta_end:], expected + 1)
+    except zlib.error:
+        raise TrackCodecError("Bloque de columnas corrupto.")
+    if len(body) != expected or decompressor.unconsumed_tail or not decompressor.eof:
+        raise TrackCodecError("El tamaño de las columnas no coincide con el número de puntos.")
+
+    columns = {}
+    offset = 0
+    for name, dtype in _COLUMNS:
+        columns[name] = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+
+    if count and columns["event_type"].max() >= len(event_types):
+        raise TrackCodecError("Tipo de evento fuera de la tabla.")
+    if count and columns["delivery_id"].min() < 0:
+        raise TrackCodecError("deliveryId negativo.")
+    # Con la base acotada y diferencias de 32 bits la suma no desborda int64
+    timestamp_ms = base_ms + np.cumsum(columns["timestamp"], dtype=np.int64)
+    if count and (timestamp_ms.min() < 0 or timestamp_ms.max() > _MAX_TIMESTAMP_MS):
+        raise TrackCodecError("Timestamp fuera de rango.")
+
+    return TrackBatch(
+        latitude=np.cumsum(columns["latitude"], dtype=np.int64) / COORDINATE_SCALE,
+        longitude=np.cumsum(columns["longitude"], dtype=np.int64) / COORDINATE_SCALE,
+        timestamp_ms=timestamp_ms,
+        event_type=columns["event_type"],
+        delivery_id=columns["delivery_id"].astype(np.int64),
+        event_types=event_types,
+        extras={index: values for index, values in extras.items() if 0 <= index < count and values},
+    )
@@ -0,0 +1,189 @@
+# app/track_filter.py
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from . import geo, models, schemas
+
+# Filtro opcional de pings GPS en la ingesta: descarta puntos repetidos, quietos y saltos imposibles
+TRACK_FILTER_ENABLED = os.getenv("TRACK_FILTER_ENABLED", "false").lower() == "true"
+# Un punto a menos de esta distancia del último guardado se considera "quieto"
+TRACK_FILTER_MIN_DISTANCE_M = float(os.getenv("TRACK_FILTER_MIN_DISTANCE_M", "15"))
+# Aunque el teléfono esté quieto se guarda un punto cada este número de segundos
+TRACK_FILTER_STATIONARY_KEEPALIVE_SECONDS = float(os.getenv("TRACK_FILTER_STATIONARY_KEEPALIVE_SECONDS", "300"))
+TRACK_FILTER_MAX_SPEED_KMH = float(os.getenv("TRACK_FILTER_MAX_SPEED_KMH", "180"))
+# Tras estos saltos seguidos se asume que el punto guardado era el erróneo y se toma el nuevo como referencia
+TRACK_FILTER_MAX_CONSECUTIVE_SPIKES = int(os.getenv("TRACK_FILTER_MAX_CONSECUTIVE_SPIKES", "3"))
+# El estado vive en memoria de cada proceso worker: con varios workers cada uno filtra solo
+# los pings que recibe y su estado no se comparte. Conductores con estado por worker; los
+# menos recientes se descartan
+TRACK_FILTER_MAX_DRIVERS = int(os.getenv("TRACK_FILTER_MAX_DRIVERS", "10000"))
+
+COUNTERS = ("received", "kept", "duplicate", "stationary", "speed_spike")
+LIFECYCLE_EVENT_TYPES = models.LIFECYCLE_EVENT_TYPES
+
+
+def _utc_naive(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+@dataclass
+class DriverTrackState:
+    """Último punto guardado del conductor y contadores de su flujo."""
+    latitude: float | None = None
+    longitude: float | None = None
+    timestamp: datetime | None = None
+    delivery_id: int | None = None
+    consecutive_spikes: int = 0
+    counters: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(COUNTERS, 0))
+
+    def advance(self, latitude: float, longitude: float, timestamp: datetime, delivery_id: int | None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp = timestamp
+        self.delivery_id = delivery_id
+        self.consecutive_spikes = 0
+
+
+@dataclass
+class TrackFilterUpdate:
+    """Resultado de filtrar un lote, pendiente de aplicar: el estado nuevo del conductor y sus conteos."""
+    driver_id: int
+    state: DriverTrackState
+    outcomes: Counter
+
+
+class TrackFilter:
+    """
+    Filtro en streaming por conductor. Cada punto se compara solo contra el último punto
+    guardado de ese conductor, así que el estado por conductor es de tamaño fijo.
+    Los eventos de inicio/fin nunca se descartan; los puntos fuera de orden tampoco.
+
+    Filtrar no modifica el estado: devuelve un TrackFilterUpdate que se aplica con commit()
+    cuando los puntos quedaron guardados. Si la transacción falla, el reintento del teléfono
+    se compara contra el mismo estado y no se descarta como duplicado.
+    El estado es por proceso worker (ver TRACK_FILTER_MAX_DRIVERS).
+    """
+
+    def __init__(
+        self,
+        min_distance_m: float = TRACK_FILTER_MIN_DISTANCE_M,
+        stationary_keepalive_seconds: float = TRACK_FILTER_STATIONARY_KEEPALIVE_SECONDS,
+        max_speed_kmh: float = TRACK_FILTER_MAX_SPEED_KMH,
+        max_consecutive_spikes: int = TRACK_FILTER_MAX_CONSECUTIVE_SPIKES,
+        max_drivers: int = TRACK_FILTER_MAX_DRIVERS,
+    ):
+        self.min_distance_m = min_distance_m
+        self.stationary_keepalive_seconds = stationary_keepalive_seconds
+        self.max_speed_kmh = max_speed_kmh
+        self.max_consecutive_spikes = max_consecutive_spikes
+        self.max_drivers = max_drivers
+        self._states: "OrderedDict[int, DriverTrackState]" = OrderedDict()
+        self._totals = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def _state(self, driver_id: int) -> DriverTrackState:
+        state = self._states.get(driver_id)
+        if state is None:
+            state = self._states[driver_id] = DriverTrackState()
+            if len(self._states) > self.max_drivers:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(driver_id)
+        return state
+
+    def _classify(self, state: DriverTrackState, latitude: float, longitude: float, timestamp: datetime, delivery_id: int | None, lifecycle: bool) -> str:
+        """Decide qué hacer con un punto y avanza el estado si se guarda."""
+        timestamp = _utc_naive(timestamp)
+        if state.timestamp is not None and timestamp < state.timestamp:
+            # Punto atrasado: no se puede comparar contra el último, se guarda tal cual
+            return "kept"
+        if lifecycle or state.timestamp is None or delivery_id != state.delivery_id:
+            state.advance(latitude, longitude, timestamp, delivery_id)
+            return "kept"
+
+        distance_m = geo.haversine_km(state.latitude, state.longitude, latitude, longitude) * 1000
+        elapsed = (timestamp - state.timestamp).total_seconds()
+        if distance_m <= self.min_distance_m:
+            if elapsed == 0:
+                return "duplicate"
+            if elapsed < self.stationary_keepalive_seconds:
+                return "stationary"
+        elif elapsed == 0 or distance_m / elapsed * 3.6 > self.max_speed_kmh:
+            if state.consecutive_spikes < self.max_consecutive_spikes:
+                state.consecutive_spikes += 1
+                return "speed_spike"
+
+        state.advance(latitude, longitude, timestamp, delivery_id)
+        return "kept"
+
+    def _filter(self, driver_id: int, items: list, coordinates) -> Tuple[list, TrackFilterUpdate]:
+        # Se evalúan en orden de tiempo, pero se devuelven en el orden recibido
+        order = sorted(range(len(items)), key=lambda i: _utc_naive(coordinates(items[i])[2]))
+        keep = [False] * len(items)
+        with self._lock:
+            current = self._states.get(driver_id)
+            # Se trabaja sobre una copia: el estado del worker solo cambia en commit()
+            state = replace(current, counters={}) if current else DriverTrackState(counters={})
+        outcomes = Counter()
+        for index in order:
+            outcome = self._classify(state, *coordinates(items[index]))
+            keep[index] = outcome == "kept"
+            outcomes[outcome] += 1
+        outcomes["received"] = len(items)
+        return [item for item, kept in zip(items, keep) if kept], TrackFilterUpdate(driver_id, state, outcomes)
+
+    def commit(self, update: TrackFilterUpdate):
+        """Aplica el resultado de un lote ya guardado: avanza el último punto y suma los conteos."""
+        with self._lock:
+            state = self._state(update.driver_id)
+            # Dos lotes del mismo conductor en paralelo: queda el último punto más reciente
+            if update.state.timestamp is not None and (state.timestamp is None or update.state.timestamp >= state.timestamp):
+                state.latitude = update.state.latitude
+                state.longitude = update.state.longitude
+                state.timestamp = update.state.timestamp
+                state.delivery_id = update.state.delivery_id
+                state.consecutive_spikes = update.state.consecutive_spikes
+            for outcome, count in update.outcomes.items():
+                state.counters[outcome] += count
+                self._totals[outcome] += count
+
+    def filter_rows(self, driver_id: int, rows: List[dict]) -> Tuple[List[dict], TrackFilterUpdate]:
+        """Filtra filas de tracking_point_row (puntos GPS simples) de un conductor."""
+        return self._filter(driver_id, rows, lambda row: (
+            row["latitude"], row["longitude"], row["timestamp"], row["delivery_id"],
+            bool(row["delivery_id"]) and row["event_type"] in LIFECYCLE_EVENT_TYPES,
+        ))
+
+    def filter_events(self, driver_id: int, events: List[schemas.TrackingPoint]) -> Tuple[List[schemas.TrackingPoint], TrackFilterUpdate]:
+        """Filtra eventos recibidos; los de inicio/fin siempre pasan."""
+        return self._filter(driver_id, events, lambda event: (
+            event.latitude, event.longitude, event.timestamp, event.deliveryId,
+            bool(event.deliveryId) and event.eventType in LIFECYCLE_EVENT_TYPES,
+        ))
+
+    def stats(self) -> dict:
+        """Totales del worker, sin IDs ni datos de conductores: se exponen en /health/track-filter."""
+        with self._lock:
+            tracked_drivers = len(self._states)
+            totals = dict(self._totals)
+        return {
+            "enabled": TRACK_FILTER_ENABLED,
+            "tracked_drivers": tracked_drivers,
+            **totals,
+            "saved": totals["received"] - totals["kept"],
+        }
+
+    def driver_stats(self, driver_id: int) -> dict | None:
+        with self._lock:
+            state = self._states.get(driver_id)
+            return dict(state.counters) if state else None
+
+
+track_filter = TrackFilter()
@@ -1,10 +1,14 @@
 # app/utils.py
 
-from . import models, schemas
-from datetime import datetime
-import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from . import models, route_codec, schemas
+from datetime import date, datetime, time
+import logging
 from typing import List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
+
 def parse_gps_location(gps_string: Optional[str]) -> Optional[Tuple[float, float]]:
     """
     Convierte un string de coordenadas 'lat,lng' en una tupla de floats.
@@ -22,10 +26,25 @@ def parse_gps_location(gps_string: Optional[str]) -> Optional[Tuple[float, float
     except (ValueError, IndexError):
         return None
 
+def is_valid_coordinate(latitude: Optional[float], longitude: Optional[float]) -> bool:
+    """Indica si un par latitud/longitud está dentro de los rangos geográficos válidos."""
+    if latitude is None or longitude is None:
+        return False
+    return -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+
+def fec_date_to_datetime(value: Optional[date]) -> Optional[datetime]:
+    """
+    models.FEC.fec_date es una fecha y schemas.FEC.fec_date un datetime: pydantic v1 no
+    convierte una en otro, así que la fecha se pasa como medianoche.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time())
+
 def fec_model_to_schema(fec_model: models.FEC) -> schemas.FEC:
     """
     Convierte un modelo FEC de la base de datos a un schema compatible con React Native.
-    Maneja las diferencias de nomenclatura y parsea el JSON de la ruta optimizada.
+    Maneja las diferencias de nomenclatura y decodifica la ruta optimizada guardada.
     """
     date_str = fec_model.fec_date.isoformat() if fec_model.fec_date else ""
     
@@ -34,29 +53,32 @@ def fec_model_to_schema(fec_model: models.FEC) -> schemas.FEC:
         for delivery in fec_model.deliveries:
             deliveries.append(delivery_model_to_schema(delivery))
             
-    optimized_order_id_list = []
-    if fec_model.optimized_order_list_json:
-        try:
-            parsed_list = json.loads(fec_model.optimized_order_list_json)
-            if isinstance(parsed_list, list) and all(isinstance(i, int) for i in parsed_list):
-                optimized_order_id_list = parsed_list
-        except (json.JSONDecodeError, TypeError):
-            print(f"ADVERTENCIA: No se pudo parsear optimized_order_list_json: {fec_model.optimized_order_list_json}")
-            optimized_order_id_list = []
-
+    # Orden y polilínea se decodifican una vez por versión del FEC (caché de route_codec)
+    route = route_codec.decode_route(fec_model)
 
+    # Los campos con alias se pasan por alias: pydantic v1 ignora populate_by_name
     return schemas.FEC(
         fec_id=fec_model.fec_id,
         fec_number=fec_model.fec_number,
         driver_id=fec_model.driver_id,
-        fec_date=fec_model.fec_date,
+        fec_date=fec_date_to_datetime(fec_model.fec_date),
         deliveries=deliveries,
         status=fec_model.status,
-        optimized_order_list_json=fec_model.optimized_order_list_json,
-        suggested_journey_polyline=fec_model.suggested_journey_polyline,
-        optimizedOrderId_list=optimized_order_id_list 
+        optimized_order_list_json=route.order_json,
+        suggestedJourneyPolyline=route.polyline,
+        optimizedOrderId_list=list(route.order_ids)
     )
 
+def render_json(schema) -> bytes:
+    """
+    Serializa un schema exactamente como lo haría FastAPI con response_model
+    (alias incluidos), para poder guardarlo en caché y devolverlo tal cual.
+    """
+    return JSONResponse(content=jsonable_encoder(schema)).body
+
+def render_fec_json(fec_schema: schemas.FEC) -> bytes:
+    return render_json(fec_schema)
+
 def delivery_model_to_schema(delivery_model: models.Delivery) -> schemas.Delivery:
     """
     Convierte un modelo Delivery de la base de datos a un schema compatible con React Native.
@@ -1,5 +1,6 @@
 # app/whatsapp_service.py
 
+import logging
 import os
 import requests
 from dotenv import load_dotenv
@@ -7,8 +8,12 @@ from datetime import datetime
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SMSMASIVOS_API_KEY = os.getenv("SMSMASIVOS_API_KEY")
 WHATSAPP_INSTANCE_ID = os.getenv("WHATSAPP_INSTANCE_ID")
+# Tiempo máximo (segundos) para conectar y leer la respuesta del proveedor
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_TIMEOUT_SECONDS", "10"))
 API_URL = "https://api.smsmasivos.com.mx/whatsapp/send"
 
 def send_completion_whatsapp(salesperson_phone: str, client_id: int, invoice_id: str, client_name: str):
@@ -16,8 +21,7 @@ def send_completion_whatsapp(salesperson_phone: str, client_id: int, invoice_id:
     Envía una notificación por WhatsApp al vendedor cuando se completa una entrega.
     """
     if not SMSMASIVOS_API_KEY or not WHATSAPP_INSTANCE_ID:
-        print("ADVERTENCIA: Faltan las variables SMSMASIVOS_API_KEY o WHATSAPP_INSTANCE_ID en el .env.")
-        print("No se enviarán notificaciones de WhatsApp.")
+        logger.warning("Faltan las variables SMSMASIVOS_API_KEY o WHATSAPP_INSTANCE_ID en el .env. No se enviarán notificaciones de WhatsApp.")
         return False
 
     try:
@@ -44,23 +48,23 @@ def send_completion_whatsapp(salesperson_phone: str, client_id: int, invoice_id:
             'message': message,
         }
 
-        print(f"Enviando notificación de WhatsApp a {salesperson_phone}...")
+        logger.info("Enviando notificación de WhatsApp a %s...", salesperson_phone)
         
-        response = requests.post(url=API_URL, headers=headers, data=payload)
+        response = requests.post(url=API_URL, headers=headers, data=payload, timeout=REQUEST_TIMEOUT_SECONDS)
         response.raise_for_status()
         
         response_data = response.json()
         
         if response_data.get("success") is True:
-            print(f"ÉXITO: WhatsApp enviado a {salesperson_phone}. Respuesta: {response_data}")
+            logger.info("WhatsApp enviado a %s.", salesperson_phone, extra={"provider_response": response_data})
             return True
         else:
-            print(f"ERROR: La API de WhatsApp devolvió un error. Respuesta: {response_data}")
+            logger.error("La API de WhatsApp devolvió un error.", extra={"provider_response": response_data})
             return False
 
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Falló la conexión con la API de SMSMASIVOS. Razón: {e}")
+        logger.error("Falló la conexión con la API de SMSMASIVOS. Razón: %s", e)
         return False
     except Exception as e:
-        print(f"ERROR: Ocurrió un error inesperado al enviar el WhatsApp. Razón: {e}")
+        logger.error("Ocurrió un error inesperado al enviar el WhatsApp.", exc_info=True)
         return False
\ No newline at end of file
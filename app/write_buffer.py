@@ -0,0 +1,201 @@
+# app/write_buffer.py
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+from sqlmodel import Session
+
+from . import database, repositories
+
+logger = logging.getLogger(__name__)
+
+# Con "true", los pings GPS simples de /deliveries/events/log se acumulan en memoria y se
+# insertan en lote; un fallo del proceso pierde como máximo lo que no se alcanzó a vaciar.
+TRACKING_BUFFER_ENABLED = os.getenv("TRACKING_BUFFER_ENABLED", "false").lower() == "true"
+TRACKING_BUFFER_FLUSH_ROWS = int(os.getenv("TRACKING_BUFFER_FLUSH_ROWS", "1000"))
+TRACKING_BUFFER_FLUSH_INTERVAL_MS = int(os.getenv("TRACKING_BUFFER_FLUSH_INTERVAL_MS", "500"))
+TRACKING_BUFFER_CAPACITY = int(os.getenv("TRACKING_BUFFER_CAPACITY", "20000"))
+# Tiempo que una petición espera a que haya espacio antes de recibir 503
+TRACKING_BUFFER_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("TRACKING_BUFFER_SUBMIT_TIMEOUT_SECONDS", "2"))
+TRACKING_BUFFER_MAX_RETRIES = int(os.getenv("TRACKING_BUFFER_MAX_RETRIES", "3"))
+_LATENCY_SAMPLES = 256
+
+
+class TrackingBufferFull(Exception):
+    """El buffer sigue lleno tras esperar TRACKING_BUFFER_SUBMIT_TIMEOUT_SECONDS."""
+
+
+class TrackingBufferFlushFailed(Exception):
+    """Un vaciado pedido con raise_on_failure no pudo escribir todas las filas pendientes."""
+
+
+def write_tracking_rows(db: Session, rows: List[dict]) -> int:
+    """
+    Inserta filas de tracking_point_row de varios conductores en lote (ignorando eventId repetidos)
+    y las suma a la distancia acumulada de las entregas que pertenecen a su conductor.
+    """
+    owners = repositories.get_delivery_owners(db, {row["delivery_id"] for row in rows if row["delivery_id"]})
+    owned_rows = [row for row in rows if row["delivery_id"] and owners.get(row["delivery_id"]) == row["driver_id"]]
+    track_stats = repositories.load_track_stats(db, {row["delivery_id"] for row in owned_rows})
+    inserted = repositories.insert_tracking_points(db, rows)
+    if inserted == len(rows):
+        repositories.accumulate_track_points(track_stats, owned_rows)
+    else:
+        repositories.flag_track_stats_for_recompute(track_stats, owned_rows)
+    db.commit()
+    return inserted
+
+
+class TrackingWriteBuffer:
+    """
+    Buffer de escritura diferida compartido por todas las peticiones del worker.
+    Un hilo lo vacía cada TRACKING_BUFFER_FLUSH_INTERVAL_MS o al juntar TRACKING_BUFFER_FLUSH_ROWS
+    filas; al detenerse vacía lo pendiente. Si se llena, submit() bloquea y luego falla.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_rows: int = TRACKING_BUFFER_FLUSH_ROWS,
+        flush_interval_ms: int = TRACKING_BUFFER_FLUSH_INTERVAL_MS,
+        capacity: int = TRACKING_BUFFER_CAPACITY,
+    ):
+        self.session_factory = session_factory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.capacity = capacity
+        self._rows: List[dict] = []
+        self._retry: Tuple[List[dict], int] | None = None
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._metrics = {
+            "submitted_rows": 0,
+            "flushes": 0,
+            "flushed_rows": 0,
+            "failed_flushes": 0,
+            "dropped_rows": 0,
+            "rejected_submits": 0,
+            "max_batch_size": 0,
+            "max_flush_ms": 0.0,
+        }
+        self._flush_latencies_ms = deque(maxlen=_LATENCY_SAMPLES)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tracking-write-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Detiene el hilo y vacía lo que quede en el buffer."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def submit(self, rows: List[dict]):
+        """
+        Encola filas para la próxima inserción. Si el buffer está lleno espera hasta
+        TRACKING_BUFFER_SUBMIT_TIMEOUT_SECONDS y después lanza TrackingBufferFull.
+        """
+        if not rows:
+            return
+        deadline = time.monotonic() + TRACKING_BUFFER_SUBMIT_TIMEOUT_SECONDS
+        with self._space:
+            # Un lote más grande que la capacidad entra solo con el buffer vacío
+            while self._rows and len(self._rows) + len(rows) > self.capacity:
+                self._wake.set()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._space.wait(remaining):
+                    self._metrics["rejected_submits"] += 1
+                    raise TrackingBufferFull()
+            self._rows.extend(rows)
+            self._metrics["submitted_rows"] += len(rows)
+            if len(self._rows) >= self.flush_rows:
+                self._wake.set()
+
+    def flush(self, raise_on_failure: bool = False) -> int:
+        """
+        Inserta de inmediato lo pendiente (primero el lote que esté en reintento).
+        Devuelve el número de filas escritas. Con raise_on_failure, si alguna escritura
+        falla lanza TrackingBufferFlushFailed en vez de devolver un conteo parcial.
+        """
+        with self._flush_lock:
+            written = 0
+            if self._retry is not None:
+                rows, attempts = self._retry
+                self._retry = None
+                if not self._write(rows, attempts):
+                    if raise_on_failure:
+                        raise TrackingBufferFlushFailed()
+                    return 0
+                written += len(rows)
+
+            with self._space:
+                rows, self._rows = self._rows, []
+                self._space.notify_all()
+            if rows:
+                if self._write(rows, attempts=0):
+                    written += len(rows)
+                elif raise_on_failure:
+                    raise TrackingBufferFlushFailed()
+            return written
+
+    def _write(self, rows: List[dict], attempts: int) -> bool:
+        start = time.perf_counter()
+        try:
+            with self.session_factory() as db:
+                write_tracking_rows(db, rows)
+        except Exception:
+            self._metrics["failed_flushes"] += 1
+            if attempts + 1 < TRACKING_BUFFER_MAX_RETRIES:
+                self._retry = (rows, attempts + 1)
+                logger.error("Error al vaciar el buffer de tracking (%s filas); se reintentará.", len(rows), exc_info=True)
+            else:
+                self._metrics["dropped_rows"] += len(rows)
+                logger.critical("Se descartaron %s puntos GPS tras %s intentos fallidos.", len(rows), attempts + 1, exc_info=True)
+            return False
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._flush_latencies_ms.append(elapsed_ms)
+        self._metrics["flushes"] += 1
+        self._metrics["flushed_rows"] += len(rows)
+        self._metrics["max_batch_size"] = max(self._metrics["max_batch_size"], len(rows))
+        self._metrics["max_flush_ms"] = max(self._metrics["max_flush_ms"], elapsed_ms)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Métricas del buffer: filas pendientes, tamaño de lote y latencia de vaciado."""
+        latencies = sorted(self._flush_latencies_ms)
+        flushes = self._metrics["flushes"]
+        return {
+            "enabled": TRACKING_BUFFER_ENABLED,
+            "pending_rows": len(self._rows) + (len(self._retry[0]) if self._retry else 0),
+            "capacity": self.capacity,
+            **self._metrics,
+            "avg_batch_size": round(self._metrics["flushed_rows"] / flushes, 1) if flushes else 0.0,
+            "flush_ms_p50": round(latencies[len(latencies) // 2], 2) if latencies else 0.0,
+            "flush_ms_p95": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else 0.0,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.error("Error inesperado en el hilo del buffer de tracking.", exc_info=True)
+
+
+tracking_buffer = TrackingWriteBuffer(lambda: Session(database.engine))
@@ -0,0 +1,100 @@
+# benchmarks/bench_async.py
+"""
+Capacidad con conexiones concurrentes en GET /fec/{fec_number}: router síncrono
+(threadpool) vs. router async (ASYNC_DATABASE_URL).
+
+Solo se mide la lectura del FEC, que es lo único que ASYNC_DATABASE_URL cambia: la
+ingesta de /deliveries/events/log* sigue en el camino síncrono en los dos modos (ver
+app/services_async.py), así que compararla no mediría nada. Ambas pilas comparten la
+misma BD SQLite en un archivo temporal.
+
+Uso:
+    python -m benchmarks.bench_async [--concurrency 10 50 200] [--requests 400]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+_db_path = os.path.join(tempfile.mkdtemp(prefix="bench_async_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from benchmarks.common import seed_driver_with_fec  # noqa: E402
+
+from app import database, models, security  # noqa: E402
+from app.routers import fec, fec_async  # noqa: E402
+
+
+def build_app(async_mode: bool) -> FastAPI:
+    app = FastAPI()
+    if async_mode:
+        app.include_router(fec_async.router)
+    app.include_router(fec.router)
+    return app
+
+
+async def _drive(app: FastAPI, token: str, concurrency: int, total: int, fec_number: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with limiter:
+                start = time.perf_counter()
+                response = await client.get(f"/fec/{fec_number}", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                return response.status_code
+
+        start = time.perf_counter()
+        codes = await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "req_s": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": sum(1 for code in codes if code >= 400),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    SQLModel.metadata.create_all(database.engine)
+    driver_id = seed_driver_with_fec(database.engine, deliveries=20)
+    with Session(database.engine) as db:
+        token = security.create_access_token(security.driver_token_claims(db.get(models.Driver, driver_id)))
+
+    asyncio.run(_compare(token, args.concurrency, args.requests))
+
+
+async def _compare(token: str, concurrency_levels: list, total: int):
+    # Un solo event loop: el pool del motor async queda ligado al loop que lo usa primero
+    apps = {"sync": build_app(async_mode=False), "async": build_app(async_mode=True)}
+    print(f"{'modo':>6} {'concurrencia':>12} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'errores':>8}")
+    for concurrency in concurrency_levels:
+        for name, app in apps.items():
+            result = await _drive(app, token, concurrency, total, fec_number=1000)
+            print(
+                f"{name:>6} {concurrency:>12} {result['req_s']:>9.1f} {result['p50_ms']:>9.1f} "
+                f"{result['p95_ms']:>9.1f} {result['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
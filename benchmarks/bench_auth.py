@@ -0,0 +1,79 @@
+# benchmarks/bench_auth.py
+"""
+Efecto de la caché de conductores autenticados sobre /deliveries/events/log/batch.
+
+Compara tres modos de get_current_driver:
+    db      -> consulta 'drivers' en cada petición (comportamiento anterior)
+    cache   -> caché LRU/TTL por driver_id
+    claims  -> datos firmados en el token, sin tocar la BD
+
+Uso:
+    python -m benchmarks.bench_auth [--requests 300] [--batch-size 20]
+"""
+
+import argparse
+import time
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from benchmarks.common import gps_batch, make_sqlite_engine, seed_driver_with_fec
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database, models, security  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _run(client: TestClient, token: str, requests: int, batch_size: int, query_counter: list) -> tuple:
+    payload = gps_batch(batch_size, delivery_id=1)
+    headers = {"Authorization": f"Bearer {token}"}
+    query_counter[0] = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.post("/deliveries/events/log/batch", json=payload, headers=headers)
+        response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, query_counter[0] / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_sqlite_engine()
+    driver_id = seed_driver_with_fec(engine, deliveries=5)
+    query_counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        query_counter[0] += 1
+
+    def get_db():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[database.get_db] = get_db
+
+    modes = {
+        "db": dict(max_entries=0, trust=False),
+        "cache": dict(max_entries=security.AUTH_CACHE_MAX_ENTRIES, trust=False),
+        "claims": dict(max_entries=security.AUTH_CACHE_MAX_ENTRIES, trust=True),
+    }
+    print(f"{'modo':>8} {'req/s':>10} {'consultas/req':>14}")
+    with TestClient(app) as client:
+        for name, mode in modes.items():
+            security.principal_cache.clear()
+            security.principal_cache.max_entries = mode["max_entries"]
+            security.AUTH_TRUST_TOKEN_CLAIMS = mode["trust"]
+            # Los datos del conductor solo viajan en el token en modo "claims"
+            with Session(engine) as db:
+                token = security.create_access_token(security.driver_token_claims(db.get(models.Driver, driver_id)))
+            throughput, queries = _run(client, token, args.requests, args.batch_size, query_counter)
+            print(f"{name:>8} {throughput:>10.1f} {queries:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
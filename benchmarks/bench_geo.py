@@ -0,0 +1,57 @@
+# benchmarks/bench_geo.py
+"""
+Micro-benchmark del cálculo de distancia: bucle escalar (math) vs. NumPy.
+
+Uso:
+    python -m benchmarks.bench_geo
+"""
+
+import time
+
+import numpy as np
+
+from app import geo
+
+SIZES = (10_000, 100_000, 1_000_000)
+DELIVERIES_PER_BATCH = 50
+
+
+def _synthetic_track(size: int, seed: int = 7):
+    """Recorrido aleatorio alrededor de Tijuana con pasos de unos pocos metros."""
+    rng = np.random.default_rng(seed)
+    latitudes = 32.5 + np.cumsum(rng.normal(0, 1e-4, size))
+    longitudes = -117.0 + np.cumsum(rng.normal(0, 1e-4, size))
+    return latitudes, longitudes
+
+
+def _scalar_length(latitudes, longitudes) -> float:
+    total = 0.0
+    for i in range(len(latitudes) - 1):
+        total += geo.haversine_km(latitudes[i], longitudes[i], latitudes[i + 1], longitudes[i + 1])
+    return total
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'puntos':>10} {'escalar (ms)':>14} {'numpy (ms)':>12} {'batch (ms)':>12} {'speedup':>8}  iguales")
+    for size in SIZES:
+        latitudes, longitudes = _synthetic_track(size)
+        scalar, scalar_time = _timed(_scalar_length, latitudes.tolist(), longitudes.tolist())
+        vector, vector_time = _timed(geo.track_length_km, latitudes, longitudes)
+
+        group_ids = np.repeat(np.arange(DELIVERIES_PER_BATCH), -(-size // DELIVERIES_PER_BATCH))[:size]
+        _, batch_time = _timed(geo.track_lengths_km, group_ids, latitudes, longitudes)
+
+        print(
+            f"{size:>10} {scalar_time * 1000:>14.1f} {vector_time * 1000:>12.1f} "
+            f"{batch_time * 1000:>12.1f} {scalar_time / vector_time:>7.1f}x  {round(scalar, 2) == round(vector, 2)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_logging.py
+"""
+Efecto del pipeline de logs sobre la latencia de /deliveries/events/log/batch.
+
+Cada petición reenvía eventos 'start_delivery' ya guardados, así que cada uno produce
+un aviso de evento duplicado (el caso de los reintentos de la app). Modos comparados:
+    sync      StreamHandler de texto escribiendo en el hilo de la petición
+    queue     cola + hilo de fondo con JSON, sin muestreo
+    sampled   cola + JSON con LOG_SAMPLE_RATES por defecto (1% de los duplicados)
+
+Los logs van a un archivo temporal para no medir la terminal. --write-delay-ms agrega
+una espera a cada escritura para simular un stdout lento (un colector de logs saturado).
+
+Uso:
+    python -m benchmarks.bench_logging [--requests 300] [--duplicates 20] [--write-delay-ms 0]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from sqlmodel import Session
+
+from benchmarks.common import make_sqlite_engine, seed_driver_with_fec
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database, logging_setup, models, security  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+class SlowStream:
+    """Envuelve un archivo y espera 'delay' segundos en cada escritura."""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text: str):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _duplicate_batch(size: int) -> list:
+    return [
+        {"latitude": 32.5149, "longitude": -117.0382, "timestamp": "2026-01-01T08:00:00Z", "eventType": "start_delivery", "deliveryId": 1}
+        for _ in range(size)
+    ]
+
+
+def _reset_logging():
+    logging_setup.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+
+def _configure(mode: str, log_file):
+    _reset_logging()
+    root = logging.getLogger()
+    if mode == "sync":
+        handler = logging.StreamHandler(log_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        return
+    logging_setup.LOG_SAMPLE_RATES = "" if mode == "queue" else os.getenv("LOG_SAMPLE_RATES", "app.services.duplicates=0.01")
+    logging_setup.configure_logging(stream=log_file)
+
+
+def _run(client: TestClient, headers: dict, payload: list, requests: int) -> dict:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post("/deliveries/events/log/batch", json=payload, headers=headers).raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "mean_ms": statistics.fmean(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--duplicates", type=int, default=20, help="Eventos duplicados por petición")
+    parser.add_argument("--write-delay-ms", type=float, default=0.0, help="Espera por escritura del log")
+    args = parser.parse_args()
+
+    engine = make_sqlite_engine()
+    driver_id = seed_driver_with_fec(engine, deliveries=5)
+
+    def get_db():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[database.get_db] = get_db
+    with Session(engine) as db:
+        token = security.create_access_token(security.driver_token_claims(db.get(models.Driver, driver_id)))
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = _duplicate_batch(args.duplicates)
+
+    log_path = os.path.join(tempfile.mkdtemp(prefix="bench_logging_"), "app.log")
+    print(f"{'modo':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'media (ms)':>11} {'líneas':>8}")
+    # Solo los logs de la app: el cliente de pruebas registra cada petición
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with TestClient(app) as client, open(log_path, "a", encoding="utf-8") as raw_log_file:
+        log_file = SlowStream(raw_log_file, args.write_delay_ms / 1000)
+        # La primera petición guarda el evento; las siguientes solo producen duplicados
+        client.post("/deliveries/events/log/batch", json=payload[:1], headers=headers).raise_for_status()
+        for mode in ("sync", "queue", "sampled"):
+            _configure(mode, log_file)
+            lines_before = sum(1 for _ in open(log_path, encoding="utf-8"))
+            result = _run(client, headers, payload, args.requests)
+            _reset_logging()
+            raw_log_file.flush()
+            lines = sum(1 for _ in open(log_path, encoding="utf-8")) - lines_before
+            print(f"{mode:>8} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['mean_ms']:>11.2f} {lines:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_route_optimizer.py
+"""
+Optimizador de rutas sobre FECs sintéticos: paradas repartidas en una o dos zonas de
+Tijuana (como benchmarks/fleet.py) y el conductor saliendo del centro de su zona.
+
+Para cada tamaño reporta el tiempo (p50, p95 y máximo) y la distancia en línea recta del
+orden del despachador (prioridad), del vecino más cercano y del resultado final.
+Con --levels N las entregas se reparten en N niveles de prioridad que se respetan.
+
+Uso:
+    python -m benchmarks.bench_route_optimizer [--fecs 20] [--levels 0] [--budget-ms 80]
+"""
+
+import argparse
+import random
+import statistics
+
+from benchmarks import common  # noqa: F401  (variables de entorno de los benchmarks)
+from benchmarks.fleet import TIJUANA_ZONES, point_near
+
+from app import route_optimizer  # noqa: E402
+
+SIZES = (25, 50, 100, 200)
+
+
+def _synthetic_fec(rng: random.Random, size: int, levels: int):
+    zones = rng.sample(list(TIJUANA_ZONES), 2 if rng.random() < 0.3 else 1)
+    stops = []
+    for index in range(size):
+        latitude, longitude = point_near(rng, TIJUANA_ZONES[rng.choice(zones)], 4.0)
+        priority = rng.randint(1, levels) if levels else index + 1
+        stops.append(route_optimizer.Stop(index + 1, latitude, longitude, priority))
+    stops.sort(key=lambda stop: (stop.priority, stop.key))
+    return stops, TIJUANA_ZONES[zones[0]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fecs", type=int, default=20, help="FECs sintéticos por tamaño")
+    parser.add_argument("--levels", type=int, default=0, help="Niveles de prioridad (0 = la prioridad se ignora)")
+    parser.add_argument("--budget-ms", type=float, default=route_optimizer.ROUTE_OPTIMIZER_TIME_BUDGET_MS)
+    args = parser.parse_args()
+
+    band = 1 if args.levels else 0
+    print(
+        f"{'paradas':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9} {'agotados':>9} "
+        f"{'despachador (km)':>17} {'vecino (km)':>12} {'final (km)':>11} {'vs vecino':>10}"
+    )
+    for size in SIZES:
+        rng = random.Random(size)
+        timings, input_km, initial_km, final_km, timed_out = [], [], [], [], 0
+        for _ in range(args.fecs):
+            stops, origin = _synthetic_fec(rng, size, args.levels)
+            result = route_optimizer.optimize_route(stops, origin=origin, time_budget_ms=args.budget_ms, priority_band=band)
+            timings.append(result.elapsed_ms)
+            input_km.append(result.input_distance_km)
+            initial_km.append(result.initial_distance_km)
+            final_km.append(result.distance_km)
+            timed_out += result.timed_out
+        timings.sort()
+        improvement = 1 - statistics.fmean(final_km) / statistics.fmean(initial_km)
+        print(
+            f"{size:>8} {statistics.median(timings):>9.1f} {timings[max(int(len(timings) * 0.95) - 1, 0)]:>9.1f} "
+            f"{timings[-1]:>9.1f} {timed_out:>9} {statistics.fmean(input_km):>17.1f} "
+            f"{statistics.fmean(initial_km):>12.1f} {statistics.fmean(final_km):>11.1f} {improvement:>9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_serialization.py
+"""
+Costo de serializar un FEC ya cargado, con 50, 200 y 1000 entregas.
+
+    response_model  schemas pydantic + la validación y serialización de response_model
+                    (lo que hacía PATCH /fec/{fec_id}/route)
+    schemas         schemas pydantic + jsonable_encoder (GET /fec/{fec_number} sin caché)
+    orjson          app/serializers.py: del modelo a tipos básicos y orjson
+
+La última columna confirma que los bytes del camino rápido son idénticos a los de los schemas.
+
+Uso:
+    python -m benchmarks.bench_serialization [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from benchmarks.common import make_sqlite_engine
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app import models, repositories, route_codec, schemas, serializers, utils  # noqa: E402
+
+SIZES = (50, 200, 1000)
+STATUSES = ("pending", "in_progress", "completed", "cancelled")
+
+
+def _seed_fec(engine, deliveries: int, rng: random.Random) -> int:
+    """FEC con entregas variadas: clientes distintos, entregas terminadas, canceladas y ruta guardada."""
+    with Session(engine) as db:
+        driver = models.Driver(username=f"bench.serial.{deliveries}", hashed_password="x")
+        salesperson = models.Salesperson(name="Vendedor Peña", phone="6640000001")
+        db.add_all([driver, salesperson])
+        db.flush()
+        fec = models.FEC(fec_number=deliveries, driver_id=driver.driver_id, status="in_progress")
+        db.add(fec)
+        db.flush()
+        start = datetime(2026, 1, 15, 8, 0)
+        delivery_models = []
+        for index in range(deliveries):
+            client = models.Client(
+                name=f"Abarrotes Núñez {index}",
+                phone=f"+52664{rng.randrange(10**7):07d}",
+                gps_location=f"{32.5 + rng.random() / 10:.4f},{-117.0 - rng.random() / 10:.4f}",
+                salesperson_id=salesperson.salesperson_id,
+            )
+            db.add(client)
+            db.flush()
+            status = rng.choice(STATUSES)
+            finished = status in ("completed", "cancelled")
+            delivery_models.append(models.Delivery(
+                fec_id=fec.fec_id, driver_id=driver.driver_id, client_id=client.client_id,
+                invoice_id=f"FAC-{deliveries}-{index:04d}", status=status, priority=index + 1,
+                start_time=start + timedelta(minutes=index * 7, microseconds=rng.randrange(10**6)),
+                delivery_time=start + timedelta(minutes=index * 7 + 5) if finished else None,
+                actual_duration="5 min" if finished else None,
+                estimated_duration="6 min", estimated_distance="2.1 km",
+                start_latitude=32.5 + rng.random() / 10, start_longitude=-117.0 - rng.random() / 10,
+                end_latitude=32.5 + rng.random() / 10 if finished else None,
+                end_longitude=-117.0 - rng.random() / 10 if finished else None,
+                distance=rng.random() * 5 if finished else None,
+                cancellation_reason="Cliente ausente" if status == "cancelled" else None,
+            ))
+        db.add_all(delivery_models)
+        db.flush()
+        order = [delivery.delivery_id for delivery in delivery_models]
+        rng.shuffle(order)
+        polyline = "".join(rng.choice("_~@?ABCDEFGHIJabcdefghij|}{") for _ in range(deliveries * 40))
+        route_codec.apply_route(fec, route_codec.order_to_json(order), polyline)
+        db.commit()
+        return fec.fec_id
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_sqlite_engine()
+    rng = random.Random(7)
+    response_field = create_response_field(name="Response_bench", type_=schemas.FEC)
+    loop = asyncio.new_event_loop()
+
+    def with_response_model(fec):
+        content = loop.run_until_complete(serialize_response(field=response_field, response_content=utils.fec_model_to_schema(fec)))
+        return utils.render_json(content)
+
+    print(f"{'entregas':>9} {'response_model (ms)':>20} {'schemas (ms)':>13} {'orjson (ms)':>12} {'speedup':>8}  iguales")
+    for size in SIZES:
+        fec_id = _seed_fec(engine, size, rng)
+        with Session(engine) as db:
+            fec = repositories.get_fec_details_by_id(db, fec_id)
+            legacy = utils.render_fec_json(utils.fec_model_to_schema(fec))
+            fast = serializers.dumps(serializers.fec_to_dict(fec))
+            validated = _median_ms(lambda: with_response_model(fec), args.repeat)
+            schema = _median_ms(lambda: utils.render_fec_json(utils.fec_model_to_schema(fec)), args.repeat)
+            direct = _median_ms(lambda: serializers.dumps(serializers.fec_to_dict(fec)), args.repeat)
+        print(
+            f"{size:>9} {validated:>20.2f} {schema:>13.2f} {direct:>12.2f} "
+            f"{validated / direct:>7.1f}x  {legacy == fast and with_response_model(fec) == fast}"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
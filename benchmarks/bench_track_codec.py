@@ -0,0 +1,89 @@
+# benchmarks/bench_track_codec.py
+"""
+Formato de /deliveries/events/log/batch: JSON vs. binario delta (app/track_codec.py).
+
+Compara el tamaño del payload (JSON plano, JSON con gzip y binario) y el tiempo de
+decodificación en el servidor hasta tener las filas listas para la inserción masiva:
+JSON + Pydantic + tracking_point_row frente a track_codec.decode + TrackBatch.rows.
+
+Uso:
+    python -m benchmarks.bench_track_codec [--sizes 100 1000 10000]
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from benchmarks import common  # noqa: F401  (variables de entorno de los benchmarks)
+from app import repositories, schemas, track_codec
+
+REPEATS = 5
+
+
+def _realistic_batch(size: int, seed: int = 11) -> list:
+    """Puntos cada ~5 s con ruido de GPS, como los que manda la app en ruta."""
+    rng = np.random.default_rng(seed)
+    latitudes = 32.5149 + np.cumsum(rng.normal(0, 8e-5, size))
+    longitudes = -117.0382 + np.cumsum(rng.normal(0, 8e-5, size))
+    seconds = np.cumsum(rng.integers(4, 7, size))
+    start = datetime(2026, 1, 1, 15, tzinfo=timezone.utc)
+    return [
+        {
+            "latitude": float(latitudes[i]),
+            "longitude": float(longitudes[i]),
+            "timestamp": (start + timedelta(seconds=int(seconds[i]))).isoformat(),
+            "eventType": "gps",
+            "deliveryId": 1 + i // 500,
+        }
+        for i in range(size)
+    ]
+
+
+def _decode_json(payload: bytes) -> list:
+    points = [schemas.TrackingPoint(**item) for item in json.loads(payload)]
+    return [repositories.tracking_point_row(point, driver_id=1) for point in points]
+
+
+def _decode_binary(payload: bytes) -> list:
+    batch = track_codec.decode(payload)
+    return batch.rows(np.arange(len(batch)), driver_id=1)
+
+
+def _best_time(fn, payload: bytes) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(payload)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(
+        f"{'puntos':>8} {'json (B)':>10} {'json gz (B)':>12} {'binario (B)':>12} {'B/punto':>8}"
+        f" {'json (ms)':>10} {'binario (ms)':>13} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        items = _realistic_batch(size)
+        json_payload = json.dumps(items).encode()
+        binary_payload = track_codec.encode([schemas.TrackingPoint(**item) for item in items])
+
+        json_time = _best_time(_decode_json, json_payload)
+        binary_time = _best_time(_decode_binary, binary_payload)
+        print(
+            f"{size:>8} {len(json_payload):>10} {len(gzip.compress(json_payload)):>12} {len(binary_payload):>12}"
+            f" {len(binary_payload) / size:>8.1f} {json_time * 1000:>10.1f} {binary_time * 1000:>13.1f}"
+            f" {json_time / binary_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
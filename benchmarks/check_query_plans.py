@@ -0,0 +1,184 @@
+# benchmarks/check_query_plans.py
+"""
+Regresión de planes de consulta sobre una BD SQLite con el volumen de una flota real.
+
+Siembra conductores, FECs diarios, entregas y meses de puntos GPS; ejecuta las consultas
+calientes de repositories.py (y la reserva del outbox) tal como las emite la app,
+captura cada SELECT y revisa su EXPLAIN QUERY PLAN. Termina con código 1 si alguna
+recorre una tabla completa (SCAN) en lugar de buscar por índice (SEARCH).
+
+Uso:
+    python -m benchmarks.check_query_plans [--drivers 50] [--days 90]
+        [--deliveries-per-day 12] [--points-per-delivery 30] [--db ruta.db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from benchmarks.common import make_sqlite_engine
+from app import models, notifications, repositories
+
+# Tablas de la app: un SCAN sobre cualquiera de ellas es una regresión
+APP_TABLES = {table.name for table in models.SQLModel.metadata.sorted_tables}
+
+
+def seed_fleet(engine, drivers: int, days: int, deliveries_per_day: int, points_per_delivery: int):
+    """Inserta la flota con executemany sobre la conexión DBAPI (mucho más rápido que el ORM)."""
+    rng = random.Random(3)
+    start_day = date(2026, 1, 1)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT INTO drivers (driver_id, username, hashed_password, num_unity, vehicle_plate, phone_number) VALUES (?, ?, 'x', ?, ?, ?)",
+            [(d, f"driver.{d}", f"UN{d:03d}", f"TIJ-{d:03d}", f"664{d:07d}") for d in range(1, drivers + 1)],
+        )
+        cursor.execute("INSERT INTO salespersons (salesperson_id, name, phone) VALUES (1, 'Vendedor', '6640000001')")
+        cursor.execute("INSERT INTO clients (client_id, name, phone, gps_location, salesperson_id) VALUES (1, 'Cliente', '6640000002', '32.5149,-117.0382', 1)")
+
+        fec_id = 0
+        delivery_id = 0
+        point_id = 0
+        for day in range(days):
+            fecs, deliveries, points = [], [], []
+            fec_date = start_day + timedelta(days=day)
+            for driver_id in range(1, drivers + 1):
+                fec_id += 1
+                fecs.append((fec_id, 10_000 + fec_id, fec_date.isoformat(), "completed", driver_id, 1))
+                for _ in range(deliveries_per_day):
+                    delivery_id += 1
+                    started = datetime.combine(fec_date, datetime.min.time()) + timedelta(hours=8 + rng.random() * 8)
+                    deliveries.append((delivery_id, fec_id, driver_id, 1, f"FAC-{delivery_id}", "completed", started.isoformat(sep=" "), 32.5, -117.0))
+                    latitude, longitude = 32.5 + rng.random() * 0.1, -117.0 + rng.random() * 0.1
+                    for i in range(points_per_delivery):
+                        point_id += 1
+                        event_type = "start_delivery" if i == 0 else "end_delivery" if i == points_per_delivery - 1 else "gps"
+                        latitude += rng.gauss(0, 1e-4)
+                        longitude += rng.gauss(0, 1e-4)
+                        timestamp = started + timedelta(seconds=10 * i)
+                        points.append((point_id, latitude, longitude, timestamp.isoformat(sep=" "), event_type, driver_id, delivery_id))
+            cursor.executemany(
+                "INSERT INTO fecs (fec_id, fec_number, fec_date, status, driver_id, version) VALUES (?, ?, ?, ?, ?, ?)", fecs
+            )
+            cursor.executemany(
+                "INSERT INTO deliveries (delivery_id, fec_id, driver_id, client_id, invoice_id, status, start_time, start_latitude, start_longitude)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", deliveries
+            )
+            cursor.executemany(
+                "INSERT INTO tracking_points (point_id, latitude, longitude, timestamp, event_type, driver_id, delivery_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", points
+            )
+        cursor.execute("COMMIT")
+        # Sin estadísticas el planificador de SQLite puede elegir mal entre índices parecidos
+        cursor.execute("ANALYZE")
+    finally:
+        connection.close()
+    return fec_id, delivery_id, point_id
+
+
+def hot_queries(fec_id: int, fec_number: int, driver_id: int, delivery_ids: list):
+    """Consultas calientes de la app con identificadores representativos."""
+    delivery_id = delivery_ids[0]
+    return {
+        "check_if_event_exists": lambda db: repositories.check_if_event_exists(db, delivery_id, "end_delivery"),
+        "get_delivery_by_id": lambda db: repositories.get_delivery_by_id(db, delivery_id, driver_id),
+        "get_deliveries_for_driver": lambda db: repositories.get_deliveries_for_driver(db, delivery_ids, driver_id),
+        "get_delivery_owners": lambda db: repositories.get_delivery_owners(db, delivery_ids),
+        "calculate_total_distance": lambda db: repositories.calculate_total_distance(db, delivery_id),
+        "calculate_distances_for_deliveries": lambda db: repositories.calculate_distances_for_deliveries(db, delivery_ids),
+        "calculate_distances_for_fec": lambda db: repositories.calculate_distances_for_fec(db, fec_id),
+        "load_track_stats": lambda db: repositories.load_track_stats(db, delivery_ids),
+        "get_all_deliveries_for_fec": lambda db: repositories.get_all_deliveries_for_fec(db, fec_id),
+        "are_all_deliveries_finalized": lambda db: repositories.are_all_deliveries_finalized(db, fec_id),
+        "get_fec_version": lambda db: repositories.get_fec_version(db, fec_number, driver_id),
+        "get_fec_by_number_and_driver": lambda db: repositories.get_fec_by_number_and_driver(db, fec_number, driver_id),
+        "get_fec_details_by_number_and_driver": lambda db: repositories.get_fec_details_by_number_and_driver(db, fec_number, driver_id),
+        "get_fec_details_by_id": lambda db: repositories.get_fec_details_by_id(db, fec_id),
+        "get_upload_cursor": lambda db: repositories.get_upload_cursor(db, driver_id, "upload-1"),
+        "notifications._claim_due_notifications": lambda db: notifications._claim_due_notifications(db, 10),
+    }
+
+
+def capture_selects(engine, fn):
+    """Ejecuta fn en una sesión (con rollback) y devuelve los SELECT emitidos con sus parámetros."""
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        with Session(engine) as db:
+            fn(db)
+            db.rollback()
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    return captured
+
+
+def table_scans(plan_rows) -> list:
+    """Pasos del plan que recorren una tabla de la app completa."""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in APP_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=50)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--deliveries-per-day", type=int, default=12)
+    parser.add_argument("--points-per-delivery", type=int, default=30)
+    parser.add_argument("--db", help="Archivo SQLite a usar (por defecto uno temporal)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="query_plans_"), "fleet.db")
+    engine = make_sqlite_engine(f"sqlite:///{db_path}")
+
+    started = time.perf_counter()
+    fecs, deliveries, points = seed_fleet(engine, args.drivers, args.days, args.deliveries_per_day, args.points_per_delivery)
+    print(f"Flota sembrada en {time.perf_counter() - started:.1f} s: {fecs} FECs, {deliveries} entregas, {points} puntos GPS")
+
+    # Un FEC de la mitad del periodo
+    fec_id = fecs // 2
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        delivery_ids = [d.delivery_id for d in repositories.get_all_deliveries_for_fec(db, fec_id)]
+        fec_number, driver_id = fec.fec_number, fec.driver_id
+
+    failures = 0
+    for name, fn in hot_queries(fec_id, fec_number, driver_id, delivery_ids).items():
+        statements = capture_selects(engine, fn)
+        problems = []
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                problems.extend(table_scans(plan))
+        status = "OK  " if not problems else "SCAN"
+        print(f"{status} {name} ({len(statements)} consultas)")
+        for detail in problems:
+            print(f"       {detail}")
+        failures += bool(problems)
+
+    if failures:
+        print(f"\n{failures} consultas recorren tablas completas.")
+        sys.exit(1)
+    print("\nTodas las consultas calientes usan índices.")
+
+
+if __name__ == "__main__":
+    main()
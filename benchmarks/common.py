@@ -0,0 +1,63 @@
+# benchmarks/common.py
+"""Utilidades compartidas por los benchmarks: BD SQLite local y datos mínimos."""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, SQLModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# Las notificaciones quedan en el outbox; ningún dispatcher intenta enviarlas durante el benchmark
+os.environ.setdefault("NOTIFICATION_DISPATCHER_MODE", "external")
+
+# Sin DATABASE_URL la app apuntaría al SQL Server configurado en .env
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import database, models  # noqa: E402
+
+
+def make_sqlite_engine(url: str = "sqlite://"):
+    """Motor SQLite local (con la misma configuración que usa la app) y el esquema creado."""
+    engine = database.create_db_engine(url)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def seed_driver_with_fec(engine, deliveries: int = 10, fec_number: int = 1000) -> int:
+    """Crea un conductor con un FEC y sus entregas. Devuelve el driver_id."""
+    with Session(engine) as db:
+        driver = models.Driver(username=f"bench.{fec_number}", hashed_password="x", num_unity="UN001", vehicle_plate="TIJ-001", phone_number="6640000000")
+        salesperson = models.Salesperson(name="Vendedor Bench", phone="6640000001")
+        db.add(driver)
+        db.add(salesperson)
+        db.flush()
+        client = models.Client(name="Cliente Bench", phone="6640000002", gps_location="32.5149,-117.0382", salesperson_id=salesperson.salesperson_id)
+        # Contadores ya inicializados: la lectura concurrente no tiene que corregirlos
+        fec = models.FEC(fec_number=fec_number, driver_id=driver.driver_id, status="in_progress", open_deliveries=deliveries, finalized_deliveries=0)
+        db.add(client)
+        db.add(fec)
+        db.flush()
+        for i in range(deliveries):
+            db.add(models.Delivery(
+                fec_id=fec.fec_id, driver_id=driver.driver_id, client_id=client.client_id,
+                invoice_id=f"FAC-{fec_number}-{i}", start_latitude=32.5149, start_longitude=-117.0382
+            ))
+        db.commit()
+        return driver.driver_id
+
+
+def gps_batch(size: int, delivery_id: int | None = None, start: datetime | None = None) -> list:
+    """Lote JSON de puntos GPS simples, como los que manda la app."""
+    start = start or datetime.now(timezone.utc)
+    return [
+        {
+            "latitude": 32.5149 + i * 1e-5,
+            "longitude": -117.0382 + i * 1e-5,
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+            "eventType": "gps",
+            "deliveryId": delivery_id,
+        }
+        for i in range(size)
+    ]
@@ -0,0 +1,239 @@
+# benchmarks/fleet.py
+"""
+Generador de una flota sintética con la forma de insert_sample_data_corrected.sql:
+conductores con unidad/placa/teléfono, vendedores, clientes repartidos por zonas de
+Tijuana, un FEC diario por conductor (fec_number = AAAAMMDD) y entregas con prioridad.
+
+Los FECs de días anteriores quedan completados con su recorrido GPS histórico
+(inicio, pings cada pocos segundos y fin); el FEC del último día queda pendiente
+para que la prueba de carga lo lea, le mande pings y reporte incidencias.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app import geo, models, security
+
+# Centros aproximados de las zonas del script de datos de ejemplo
+TIJUANA_ZONES = {
+    "Centro": (32.5149, -117.0382),
+    "Zona Río": (32.5305, -117.0175),
+    "Mesa de Otay": (32.5589, -116.9821),
+    "Playas": (32.5674, -117.1234),
+    "La Mesa": (32.5250, -116.9860),
+    "Otay Centenario": (32.5460, -116.9250),
+    "Aeropuerto": (32.5412, -116.9660),
+}
+BENCH_PASSWORD = "benchmark"
+PING_INTERVAL_SECONDS = 5
+GPS_NOISE_DEGREES = 4e-5  # ~4 m
+
+
+@dataclass
+class FleetDriver:
+    driver_id: int
+    username: str
+    zone: str
+    # FEC abierto del último día y sus entregas, en orden de prioridad
+    fec_number: int
+    delivery_ids: List[int]
+    stops: List[Tuple[float, float]]
+
+
+@dataclass
+class Fleet:
+    drivers: List[FleetDriver]
+    fec_numbers: List[int]
+    historical_points: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+class TrackGenerator:
+    """
+    Recorrido GPS realista entre paradas: velocidad urbana variable, un ping cada
+    PING_INTERVAL_SECONDS, ruido de GPS y paradas cortas en semáforos.
+    """
+
+    def __init__(self, rng: random.Random, stops: List[Tuple[float, float]], start: datetime):
+        self.rng = rng
+        self.stops = stops
+        self.position = stops[0]
+        self.target = 1 % len(stops)
+        self.timestamp = start
+
+    def _step(self) -> Tuple[float, float]:
+        latitude, longitude = self.position
+        target_lat, target_lon = self.stops[self.target]
+        remaining_km = geo.haversine_km(latitude, longitude, target_lat, target_lon)
+        # Semáforos y tráfico: a veces el vehículo no avanza
+        speed_kmh = 0.0 if self.rng.random() < 0.08 else self.rng.uniform(15, 55)
+        step_km = speed_kmh * PING_INTERVAL_SECONDS / 3600
+        if remaining_km <= step_km:
+            self.position = (target_lat, target_lon)
+            self.target = (self.target + 1) % len(self.stops)
+        elif remaining_km > 0:
+            ratio = step_km / remaining_km
+            self.position = (latitude + (target_lat - latitude) * ratio, longitude + (target_lon - longitude) * ratio)
+        self.timestamp += timedelta(seconds=PING_INTERVAL_SECONDS)
+        return (
+            self.position[0] + self.rng.gauss(0, GPS_NOISE_DEGREES),
+            self.position[1] + self.rng.gauss(0, GPS_NOISE_DEGREES),
+        )
+
+    def points(self, count: int) -> List[Tuple[float, float, datetime]]:
+        result = []
+        for _ in range(count):
+            latitude, longitude = self._step()
+            result.append((latitude, longitude, self.timestamp))
+        return result
+
+    def json_batch(self, count: int, delivery_id: int | None) -> list:
+        """Lote JSON para /deliveries/events/log/batch, como lo manda la app."""
+        return [
+            {
+                "latitude": round(latitude, 7),
+                "longitude": round(longitude, 7),
+                "timestamp": timestamp.isoformat() + "Z",
+                "eventType": "gps",
+                "deliveryId": delivery_id,
+            }
+            for latitude, longitude, timestamp in self.points(count)
+        ]
+
+
+def point_near(rng: random.Random, center: Tuple[float, float], radius_km: float) -> Tuple[float, float]:
+    angle = rng.uniform(0, 2 * math.pi)
+    distance = radius_km * math.sqrt(rng.random())
+    return (
+        center[0] + distance / 111.0 * math.sin(angle),
+        center[1] + distance / (111.0 * math.cos(math.radians(center[0]))) * math.cos(angle),
+    )
+
+
+def generate_fleet(
+    engine,
+    drivers: int = 20,
+    fecs_per_driver: int = 3,
+    deliveries_per_fec: int = 8,
+    clients_per_zone: int = 30,
+    seed: int = 7,
+    today: date | None = None,
+) -> Fleet:
+    """
+    Siembra la flota en la BD del motor indicado y devuelve lo necesario para la carga.
+    Todos los conductores usan la contraseña BENCH_PASSWORD.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    days = [today - timedelta(days=offset) for offset in range(fecs_per_driver - 1, -1, -1)]
+    fec_numbers = [int(day.strftime("%Y%m%d")) for day in days]
+    # bcrypt es lento a propósito: un solo hash para toda la flota
+    hashed_password = security.get_password_hash(BENCH_PASSWORD)
+    zone_names = list(TIJUANA_ZONES)
+
+    with Session(engine) as db:
+        salespersons = [models.Salesperson(name=f"Vendedor {zone}", phone=f"66470{index:05d}") for index, zone in enumerate(zone_names)]
+        db.add_all(salespersons)
+        db.flush()
+
+        clients_by_zone: Dict[str, List[models.Client]] = {}
+        for zone, salesperson in zip(zone_names, salespersons):
+            clients = []
+            for index in range(clients_per_zone):
+                latitude, longitude = point_near(rng, TIJUANA_ZONES[zone], 3.0)
+                clients.append(models.Client(
+                    name=f"Cliente {zone} {index + 1}",
+                    phone=f"+52664{rng.randrange(10**7):07d}",
+                    gps_location=f"{latitude:.4f},{longitude:.4f}",
+                    salesperson_id=salesperson.salesperson_id,
+                ))
+            clients_by_zone[zone] = clients
+            db.add_all(clients)
+
+        driver_models = []
+        for index in range(drivers):
+            driver_models.append(models.Driver(
+                username=f"conductor.{index + 1:04d}",
+                hashed_password=hashed_password,
+                num_unity=f"UN{index + 1:03d}",
+                vehicle_plate=f"TIJ-{index + 1:03d}",
+                phone_number=f"664{rng.randrange(10**7):07d}",
+            ))
+        db.add_all(driver_models)
+        db.flush()
+
+        fleet_drivers = []
+        history_rows = []
+        for index, driver in enumerate(driver_models):
+            zone = zone_names[index % len(zone_names)]
+            for day, fec_number in zip(days, fec_numbers):
+                is_today = day == today
+                fec = models.FEC(fec_number=fec_number, fec_date=day, driver_id=driver.driver_id, status="pending" if is_today else "completed")
+                db.add(fec)
+                db.flush()
+
+                clients = rng.sample(clients_by_zone[zone], min(deliveries_per_fec, len(clients_by_zone[zone])))
+                stops = [tuple(map(float, client.gps_location.split(","))) for client in clients]
+                start = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+                deliveries = []
+                for priority, (client, stop) in enumerate(zip(clients, stops), start=1):
+                    deliveries.append(models.Delivery(
+                        fec_id=fec.fec_id,
+                        driver_id=driver.driver_id,
+                        client_id=client.client_id,
+                        invoice_id=f"INV-{fec_number}-{driver.driver_id}-{priority:03d}",
+                        status="pending" if is_today else "completed",
+                        priority=priority,
+                        start_time=start + timedelta(hours=priority - 1),
+                        start_latitude=stop[0],
+                        start_longitude=stop[1],
+                    ))
+                db.add_all(deliveries)
+                db.flush()
+
+                if is_today:
+                    fleet_drivers.append(FleetDriver(
+                        driver_id=driver.driver_id,
+                        username=driver.username,
+                        zone=zone,
+                        fec_number=fec_number,
+                        delivery_ids=[delivery.delivery_id for delivery in deliveries],
+                        stops=stops,
+                    ))
+                    continue
+
+                # Recorrido histórico de cada entrega ya completada, de la parada anterior a su cliente
+                track = TrackGenerator(rng, [stops[0]] + stops, start)
+                for delivery in deliveries:
+                    points = track.points(rng.randint(40, 120))
+                    for position, (latitude, longitude, timestamp) in enumerate(points):
+                        event_type = "start_delivery" if position == 0 else "end_delivery" if position == len(points) - 1 else "gps"
+                        history_rows.append({
+                            "latitude": latitude, "longitude": longitude, "timestamp": timestamp,
+                            "event_type": event_type, "driver_id": driver.driver_id, "delivery_id": delivery.delivery_id,
+                        })
+                    delivery.delivery_time = points[-1][2]
+                    delivery.end_latitude, delivery.end_longitude = points[-1][0], points[-1][1]
+
+        if history_rows:
+            db.execute(insert(models.TrackingPoint.__table__), history_rows)
+        db.commit()
+
+    return Fleet(
+        drivers=fleet_drivers,
+        fec_numbers=fec_numbers,
+        historical_points=len(history_rows),
+        counts={
+            "drivers": drivers,
+            "clients": clients_per_zone * len(zone_names),
+            "fecs": drivers * fecs_per_driver,
+            "deliveries": drivers * fecs_per_driver * deliveries_per_fec,
+            "tracking_points": len(history_rows),
+        },
+    )
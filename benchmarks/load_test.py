@@ -0,0 +1,294 @@
+# benchmarks/load_test.py
+"""
+Prueba de carga reproducible de la app completa sobre una BD local (SQLite por defecto).
+
+Siembra una flota sintética (benchmarks.fleet) y lanza una mezcla de peticiones con la
+concurrencia indicada contra:
+    auth      POST /auth/token
+    fec       GET  /fec/{fec_number}
+    batch     POST /deliveries/events/log/batch
+    incident  POST /deliveries/{delivery_id}/incident
+
+Reporta throughput, latencias p50/p95/p99 y consultas SQL por petición de cada endpoint.
+Con --save guarda el resultado como JSON (por defecto en benchmarks/baselines/<commit>.json)
+y con --compare lo compara contra otro resultado; --max-regression hace que termine con
+código 1 si el p95 empeora más de ese porcentaje o si sube el número de consultas por petición
+(más allá de QUERY_TOLERANCE).
+
+Uso:
+    python -m benchmarks.load_test [--drivers 20] [--fecs 3] [--deliveries 8]
+        [--requests 1000] [--concurrency 20] [--mix auth=5,fec=40,batch=45,incident=10]
+        [--batch-size 20] [--seed 7] [--db ruta.db]
+        [--save [ruta.json]] [--compare base.json] [--max-regression 20]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# La BD se elige antes de importar la app: database.engine se crea al importarla
+_db_parser = argparse.ArgumentParser(add_help=False)
+_db_parser.add_argument("--db")
+_db_path = _db_parser.parse_known_args()[0].db or os.path.join(tempfile.mkdtemp(prefix="load_test_"), "fleet.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_path}")
+# SQLite serializa las escrituras: sin esto las peticiones concurrentes fallan con "database is locked"
+os.environ.setdefault("SQLITE_BEGIN_IMMEDIATE", "true")
+# Las consultas por petición salen del header Server-Timing que agrega app.metrics
+os.environ["METRICS_ENABLED"] = "true"
+os.environ["METRICS_SERVER_TIMING"] = "true"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+import benchmarks.common  # noqa: E402,F401  (variables de entorno de los benchmarks)
+from benchmarks.fleet import BENCH_PASSWORD, Fleet, TrackGenerator, generate_fleet  # noqa: E402
+
+from app import database, models, security  # noqa: E402
+from app.main import app  # noqa: E402
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+ENDPOINTS = ("auth", "fec", "batch", "incident")
+DEFAULT_MIX = "auth=5,fec=40,batch=45,incident=10"
+# La caché de FECs hace variar un poco las consultas por petición entre corridas
+QUERY_TOLERANCE = 0.1
+
+# Formato de metrics.server_timing: db;dur=1.2;desc="N queries", app;dur=3.4
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def request_queries(response: httpx.Response) -> int:
+    """Consultas SQL de la petición según el header Server-Timing de app.metrics."""
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+    if match is None:
+        raise RuntimeError("La respuesta no trae Server-Timing: ¿METRICS_ENABLED está desactivado?")
+    return int(match.group(1))
+
+
+def _sqlite_pragmas(dbapi_connection, _):
+    # WAL deja leer mientras otro escribe y busy_timeout espera el bloqueo en vez de fallar al instante
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint desconocido en --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class LoadScenario:
+    """Arma cada petición de la mezcla con datos coherentes de la flota."""
+
+    def __init__(self, fleet: Fleet, batch_size: int, seed: int):
+        self.fleet = fleet
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.tokens = {}
+        self.tracks = {}
+        with Session(database.engine) as db:
+            for driver in fleet.drivers:
+                self.tokens[driver.driver_id] = security.create_access_token(
+                    security.driver_token_claims(db.get(models.Driver, driver.driver_id))
+                )
+                self.tracks[driver.driver_id] = TrackGenerator(
+                    random.Random(seed + driver.driver_id), driver.stops, datetime.now(timezone.utc).replace(tzinfo=None)
+                )
+
+    def build(self, endpoint: str) -> dict:
+        driver = self.rng.choice(self.fleet.drivers)
+        headers = {"Authorization": f"Bearer {self.tokens[driver.driver_id]}"}
+        if endpoint == "auth":
+            return {"method": "POST", "url": "/auth/token", "data": {"username": driver.username, "password": BENCH_PASSWORD}}
+        if endpoint == "fec":
+            return {"method": "GET", "url": f"/fec/{driver.fec_number}", "headers": headers}
+        if endpoint == "batch":
+            # Los pings van a la primera entrega, que nunca se cancela: así el FEC no se completa
+            payload = self.tracks[driver.driver_id].json_batch(self.batch_size, driver.delivery_ids[0])
+            return {"method": "POST", "url": "/deliveries/events/log/batch", "json": payload, "headers": headers}
+        delivery_id = self.rng.choice(driver.delivery_ids[1:] or driver.delivery_ids)
+        latitude, longitude = self.rng.choice(driver.stops)
+        incident = {"reason": "Cliente ausente", "notes": "Prueba de carga", "latitude": latitude, "longitude": longitude}
+        return {"method": "POST", "url": f"/deliveries/{delivery_id}/incident", "json": incident, "headers": headers}
+
+
+async def run_load(scenario: LoadScenario, mix: dict, total: int, concurrency: int, warmup: int) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = scenario.rng.choices(names, weights=weights, k=warmup + total)
+    samples = {name: {"latencies": [], "queries": [], "errors": 0, "statuses": {}} for name in names}
+    limiter = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+        async def one(endpoint: str, record: bool):
+            request = scenario.build(endpoint)
+            async with limiter:
+                start = time.perf_counter()
+                response = await client.request(**request)
+                elapsed = time.perf_counter() - start
+            if not record:
+                return
+            sample = samples[endpoint]
+            sample["latencies"].append(elapsed * 1000)
+            sample["queries"].append(request_queries(response))
+            sample["statuses"][str(response.status_code)] = sample["statuses"].get(str(response.status_code), 0) + 1
+            if response.status_code >= 400:
+                sample["errors"] += 1
+
+        await asyncio.gather(*(one(endpoint, record=False) for endpoint in plan[:warmup]))
+        start = time.perf_counter()
+        await asyncio.gather(*(one(endpoint, record=True) for endpoint in plan[warmup:]))
+        wall_seconds = time.perf_counter() - start
+
+    results = {}
+    for name, sample in samples.items():
+        latencies = sorted(sample["latencies"])
+        count = len(latencies)
+        results[name] = {
+            "requests": count,
+            "errors": sample["errors"],
+            "statuses": sample["statuses"],
+            "throughput_rps": round(count / wall_seconds, 2),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "queries_per_request": round(sum(sample["queries"]) / count, 2) if count else 0.0,
+        }
+    all_latencies = sorted(latency for sample in samples.values() for latency in sample["latencies"])
+    all_queries = [queries for sample in samples.values() for queries in sample["queries"]]
+    results["total"] = {
+        "requests": len(all_latencies),
+        "errors": sum(sample["errors"] for sample in samples.values()),
+        "throughput_rps": round(len(all_latencies) / wall_seconds, 2),
+        "p50_ms": round(percentile(all_latencies, 0.50), 2),
+        "p95_ms": round(percentile(all_latencies, 0.95), 2),
+        "p99_ms": round(percentile(all_latencies, 0.99), 2),
+        "queries_per_request": round(sum(all_queries) / len(all_queries), 2) if all_queries else 0.0,
+    }
+    return results
+
+
+def print_results(results: dict):
+    print(f"{'endpoint':>9} {'peticiones':>10} {'errores':>8} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'consultas/req':>14}")
+    for name, row in results.items():
+        print(
+            f"{name:>9} {row['requests']:>10} {row['errors']:>8} {row['throughput_rps']:>8.1f} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['queries_per_request']:>14.2f}"
+        )
+
+
+def compare(current: dict, baseline: dict, max_regression: float | None) -> int:
+    """Imprime la diferencia contra una línea base y devuelve cuántas regresiones encontró."""
+    print(f"\nComparación contra {baseline['commit']} ({baseline['created_at']}):")
+    print(f"{'endpoint':>9} {'p95 base':>9} {'p95 ahora':>10} {'cambio':>8} {'consultas base':>15} {'consultas ahora':>16}")
+    regressions = 0
+    for name, row in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        change = (row["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+        regressed = max_regression is not None and (
+            change > max_regression or row["queries_per_request"] > base["queries_per_request"] + QUERY_TOLERANCE
+        )
+        regressions += regressed
+        print(
+            f"{name:>9} {base['p95_ms']:>9.1f} {row['p95_ms']:>10.1f} {change:>+7.1f}% "
+            f"{base['queries_per_request']:>15.2f} {row['queries_per_request']:>16.2f}{'  REGRESIÓN' if regressed else ''}"
+        )
+    if current["config"] != baseline["config"]:
+        print("Aviso: la configuración de la prueba no coincide con la de la línea base.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--fecs", type=int, default=3, help="FECs por conductor (el último es el del día)")
+    parser.add_argument("--deliveries", type=int, default=8, help="Entregas por FEC")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", help="Archivo SQLite a usar (por defecto uno temporal)")
+    parser.add_argument("--save", nargs="?", const="", help="Guarda el resultado como JSON (por defecto benchmarks/baselines/<commit>.json)")
+    parser.add_argument("--compare", help="Resultado JSON contra el que comparar")
+    parser.add_argument("--max-regression", type=float, help="Porcentaje máximo de empeoramiento del p95")
+    args = parser.parse_args()
+
+    # SQLite serializa las escrituras: los bloqueos se ven como errores en el resumen, no en la consola
+    logging.getLogger("app").setLevel(logging.CRITICAL + 1)
+    if database.engine.dialect.name == "sqlite":
+        database.engine.dispose()
+        event.listen(database.engine, "connect", _sqlite_pragmas)
+    SQLModel.metadata.create_all(database.engine)
+    started = time.perf_counter()
+    fleet = generate_fleet(database.engine, drivers=args.drivers, fecs_per_driver=args.fecs, deliveries_per_fec=args.deliveries, seed=args.seed)
+    print(f"Flota sembrada en {time.perf_counter() - started:.1f} s: {fleet.counts} ({database.engine.url.render_as_string()})")
+
+    scenario = LoadScenario(fleet, batch_size=args.batch_size, seed=args.seed)
+    results = asyncio.run(run_load(scenario, args.mix, args.requests, args.concurrency, args.warmup))
+    print_results(results)
+
+    current = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "drivers": args.drivers, "fecs": args.fecs, "deliveries": args.deliveries, "requests": args.requests,
+            "concurrency": args.concurrency, "mix": args.mix, "batch_size": args.batch_size, "seed": args.seed,
+            "database": database.engine.dialect.name,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+
+    if args.save is not None:
+        path = Path(args.save) if args.save else BASELINES_DIR / f"{current['commit']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(current, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nResultado guardado en {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(current, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
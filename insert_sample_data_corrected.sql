@@ -78,15 +78,15 @@ INSERT INTO clients (name, phone, gps_location, salesperson_id) VALUES
 
 -- 4. INSERTAR FECs (con fec_number como INT)
 -- Solo información básica del FEC, sin datos de optimización que genera el sistema
-INSERT INTO fecs (fec_number, fec_date, status, driver_id, optimized_order_list_json, suggested_journey_polyline) VALUES
+INSERT INTO fecs (fec_number, fec_date, status, driver_id) VALUES
 -- FECs para hoy y días siguientes - Solo datos básicos
-(20250115, '2025-01-15', 'active', 1, NULL, NULL),
-(20250115, '2025-01-15', 'active', 2, NULL, NULL),
-(20250115, '2025-01-15', 'active', 3, NULL, NULL),
-(20250116, '2025-01-16', 'active', 4, NULL, NULL),
-(20250116, '2025-01-16', 'active', 5, NULL, NULL),
-(20250117, '2025-01-17', 'pending', 1, NULL, NULL),
-(20250117, '2025-01-17', 'pending', 2, NULL, NULL);
+(20250115, '2025-01-15', 'active', 1),
+(20250115, '2025-01-15', 'active', 2),
+(20250115, '2025-01-15', 'active', 3),
+(20250116, '2025-01-16', 'active', 4),
+(20250116, '2025-01-16', 'active', 5),
+(20250117, '2025-01-17', 'pending', 1),
+(20250117, '2025-01-17', 'pending', 2);
 
 -- 5. INSERTAR ENTREGAS (Deliveries)
 -- Solo datos básicos necesarios para crear la entrega
@@ -201,7 +201,7 @@ PRINT 'Todos los campos que se llenan automáticamente por el sistema están com
 PRINT '- delivery_time, accepted_next_at, actual_duration, estimated_duration';
 PRINT '- end_latitud, end_longitud, distance';
 PRINT '- tracking_points (tabla vacía)';
-PRINT '- optimized_order_list_json, suggested_journey_polyline en FECs';
+PRINT '- route_order, route_polyline en FECs';
 PRINT '';
 PRINT 'Estos campos se llenan cuando:';
 PRINT '- El conductor inicia una entrega (start_delivery)';
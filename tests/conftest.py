@@ -0,0 +1,107 @@
+# tests/conftest.py
+"""Fixtures compartidas: BD SQLite en memoria con el esquema de los modelos y datos mínimos."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sin DATABASE_URL la app apuntaría al SQL Server configurado en .env
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("NOTIFICATION_DISPATCHER_MODE", "external")
+os.environ.setdefault("LOG_PIPELINE_ENABLED", "false")
+
+import pytest  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from app import database, models, route_codec, services  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    # trio no es dependencia del proyecto: las pruebas async corren solo sobre asyncio
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def route_cache():
+    # La caché de rutas va por (fec_id, versión): cada BD de prueba repite esas claves
+    route_codec.route_cache.clear()
+    yield route_codec.route_cache
+    route_codec.route_cache.clear()
+
+
+@pytest.fixture
+def engine():
+    test_engine = database.create_db_engine("sqlite://")
+    SQLModel.metadata.create_all(test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """BD en archivo: cada sesión tiene su propia conexión, como dos procesos contra SQL Server."""
+    test_engine = database.create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def fec_cache():
+    """Caché de respuestas de FEC vacía; es global al módulo y la comparten todas las pruebas."""
+    services.fec_response_cache.clear()
+    yield services.fec_response_cache
+    services.fec_response_cache.clear()
+
+
+@pytest.fixture
+def seed_fec():
+    return _seed_fec
+
+
+def _seed_fec(engine, deliveries: int = 3, fec_number: int = 100, status: str = "in_progress") -> tuple:
+    """Conductor con un FEC y sus entregas, cada una con su cliente y vendedor. Devuelve (driver_id, fec_id)."""
+    with Session(engine) as session:
+        driver = models.Driver(username=f"test.{fec_number}", hashed_password="x", num_unity="UN001", vehicle_plate="TIJ-001", phone_number="6640000000")
+        salesperson = models.Salesperson(name="Vendedor Prueba", phone="6640000001")
+        session.add(driver)
+        session.add(salesperson)
+        session.flush()
+        fec = models.FEC(fec_number=fec_number, driver_id=driver.driver_id, status=status)
+        session.add(fec)
+        session.flush()
+        for index in range(deliveries):
+            client = models.Client(name=f"Cliente {index}", phone="6640000002", gps_location="32.5149,-117.0382", salesperson_id=salesperson.salesperson_id)
+            session.add(client)
+            session.flush()
+            session.add(models.Delivery(
+                fec_id=fec.fec_id, driver_id=driver.driver_id, client_id=client.client_id,
+                invoice_id=f"FAC-{fec_number}-{index}", priority=index + 1,
+                start_latitude=32.5149, start_longitude=-117.0382,
+            ))
+        session.commit()
+        return driver.driver_id, fec.fec_id
+
+
+@pytest.fixture
+def client(engine):
+    """TestClient sobre la BD de prueba. Sin 'with': no arranca los hooks de startup (dispatcher, buffer, logs)."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    def get_test_db():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[database.get_db] = get_test_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,59 @@
+# tests/test_archival.py
+"""Archivado de recorridos: los eventos de inicio/fin siguen deduplicando después de la purga."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app import archival, models, schemas, services, track_filter, write_buffer
+
+
+@pytest.fixture(autouse=True)
+def direct_ingestion(monkeypatch):
+    monkeypatch.setattr(write_buffer, "TRACKING_BUFFER_ENABLED", False)
+    monkeypatch.setattr(track_filter, "TRACK_FILTER_ENABLED", False)
+
+
+def _event(delivery_id: int, event_type: str, when: datetime, event_id: str) -> schemas.TrackingPoint:
+    return schemas.TrackingPoint(
+        latitude=32.5149, longitude=-117.0382, timestamp=when,
+        eventType=event_type, deliveryId=delivery_id, eventId=event_id,
+    )
+
+
+def _count(engine, statement) -> int:
+    with Session(engine) as db:
+        return db.exec(statement).one()
+
+
+def test_archival_keeps_lifecycle_rows_for_dedup(engine, seed_fec):
+    driver_id, fec_id = seed_fec(engine, deliveries=1)
+    with Session(engine) as db:
+        delivery_id = db.exec(select(models.Delivery.delivery_id).where(models.Delivery.fec_id == fec_id)).one()
+    start = datetime.utcnow() - timedelta(days=60)
+    end_event = _event(delivery_id, "end_delivery", start + timedelta(minutes=10), "end-1")
+    events = (
+        [_event(delivery_id, "start_delivery", start, "start-1")]
+        + [_event(delivery_id, "location_update", start + timedelta(minutes=m), f"ping-{m}") for m in range(1, 10)]
+        + [end_event]
+    )
+    with Session(engine) as db:
+        services.log_tracking_events_for_driver(db, events, driver_id)
+    outbox = select(func.count(models.NotificationOutbox.notification_id))
+    notifications_before = _count(engine, outbox)
+    assert notifications_before > 0
+
+    summary = archival.run_archival(lambda: Session(engine), older_than_days=30)
+
+    assert summary["archived_deliveries"] == 1
+    assert summary["deleted_points"] == 9
+    remaining = _count(engine, select(func.count(models.TrackingPoint.point_id)).where(models.TrackingPoint.delivery_id == delivery_id))
+    assert remaining == 2
+    # Una segunda corrida no ve purgas pendientes por las filas de inicio/fin conservadas
+    assert archival.run_archival(lambda: Session(engine), older_than_days=30)["resumed_purges"] == 0
+
+    # El teléfono reenvía el fin de entrega: se ignora y no se manda otra notificación
+    with Session(engine) as db:
+        services.log_tracking_events_for_driver(db, [end_event], driver_id)
+    assert _count(engine, outbox) == notifications_before
@@ -0,0 +1,33 @@
+# tests/test_async_reads.py
+"""Lectura de FEC con el motor async (aiosqlite): mismo cuerpo que la versión síncrona."""
+
+import pytest
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import database, services, services_async
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.mark.anyio
+async def test_async_fec_read_matches_sync(tmp_path, seed_fec, fec_cache):
+    path = tmp_path / "async.db"
+    sync_engine = database.create_db_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(sync_engine)
+    driver_id, fec_id = seed_fec(sync_engine, deliveries=5, status="pending")
+    async_engine = database.create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            async_response = await services_async.get_fec_details_response(db, fec_number=100, driver_id=driver_id)
+        # Sin la respuesta que dejó la lectura async, la síncrona se arma desde la BD
+        fec_cache.clear()
+        with Session(sync_engine) as db:
+            sync_response = services.get_fec_details_response(db, fec_number=100, driver_id=driver_id)
+    finally:
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+    # La lectura async pasó el FEC de 'pending' a 'in_progress' (versión 2)
+    assert async_response.etag == sync_response.etag == f'"fec-{fec_id}-v2"'
+    assert async_response.body == sync_response.body
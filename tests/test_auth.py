@@ -0,0 +1,102 @@
+# tests/test_auth.py
+"""Login con bcrypt fuera del threadpool y rotación de refresh tokens."""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, security
+
+PASSWORD = "clave-de-prueba"
+
+
+@pytest.fixture
+def driver_id(engine):
+    with Session(engine) as db:
+        driver = models.Driver(username="auth.test", hashed_password=security.get_password_hash(PASSWORD), num_unity="UN002")
+        db.add(driver)
+        db.commit()
+        return driver.driver_id
+
+
+@pytest.fixture(autouse=True)
+def password_pool():
+    yield
+    security.shutdown_password_pool()
+
+
+def _login(client, password: str = PASSWORD):
+    return client.post("/auth/token", data={"username": "auth.test", "password": password})
+
+
+def _refresh(client, refresh_token: str):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_login_returns_tracked_refresh_token(client, engine, driver_id):
+    response = _login(client)
+
+    assert response.status_code == 200
+    claims = security.decode_refresh_token(response.json()["refresh_token"])
+    with Session(engine) as db:
+        stored = db.get(models.RefreshToken, claims.jti)
+    assert stored.driver_id == driver_id
+    assert stored.revoked_at is None
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_access_token_carries_driver_data_only_in_trusted_mode(client, driver_id, monkeypatch, trusted):
+    monkeypatch.setattr(security, "AUTH_TRUST_TOKEN_CLAIMS", trusted)
+    token = _login(client).json()["access_token"]
+
+    payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+    assert payload["sub"] == str(driver_id)
+    assert ("username" in payload) is trusted
+    assert ("phone_number" in payload) is trusted
+    assert client.get("/fec/1", headers={"Authorization": f"Bearer {token}"}).status_code == 404
+
+
+def test_login_rejects_wrong_password(client, driver_id):
+    assert _login(client, "otra").status_code == 401
+
+
+def test_refresh_rotates_and_rejects_reuse(client, engine, driver_id):
+    first = _login(client).json()["refresh_token"]
+
+    rotated = _refresh(client, first)
+    assert rotated.status_code == 200
+    second = rotated.json()["refresh_token"]
+    assert security.decode_refresh_token(second).family_id == security.decode_refresh_token(first).family_id
+
+    # Reusar el token ya rotado revoca toda la familia, incluido el token nuevo
+    assert _refresh(client, first).status_code == 401
+    assert _refresh(client, second).status_code == 401
+    with Session(engine) as db:
+        tokens = db.exec(select(models.RefreshToken)).all()
+    assert len(tokens) == 2
+    assert all(token.revoked_at is not None for token in tokens)
+
+
+def test_refresh_token_without_jti_is_rejected(client, driver_id):
+    legacy = security.jwt.encode({"sub": str(driver_id), "type": "refresh"}, security.SECRET_KEY, algorithm=security.ALGORITHM)
+    assert _refresh(client, legacy).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_verification_timeout_raises_busy(monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_VERIFY_TIMEOUT_SECONDS", 0.0)
+    with pytest.raises(security.PasswordVerifierBusy):
+        await security.verify_password_offloaded(PASSWORD, security.get_password_hash(PASSWORD))
+
+
+@pytest.mark.anyio
+async def test_broken_pool_is_replaced():
+    pool = security._get_password_pool()
+    # Un proceso que muere deja el pool roto: ya no acepta trabajo
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+    assert await security.verify_password_offloaded(PASSWORD, security.get_password_hash(PASSWORD)) is True
+    assert security._get_password_pool() is not pool
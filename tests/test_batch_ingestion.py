@@ -0,0 +1,69 @@
+# tests/test_batch_ingestion.py
+"""Ingesta masiva (JSON y binaria): orden del lote y puntos con coordenadas inválidas."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, schemas, services, track_codec, track_filter
+
+START = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def no_filter(monkeypatch):
+    monkeypatch.setattr(track_filter, "TRACK_FILTER_ENABLED", False)
+
+
+def _point(delivery_id: int, event_type: str, minutes: int, latitude: float = 32.5149) -> schemas.TrackingPoint:
+    event_id = f"{event_type}-{minutes}" if event_type != "location_update" else None
+    return schemas.TrackingPoint(
+        latitude=latitude + minutes / 1000, longitude=-117.0382, timestamp=START + timedelta(minutes=minutes),
+        eventType=event_type, deliveryId=delivery_id, eventId=event_id,
+    )
+
+
+def _ingest(db, points, driver_id, binary: bool) -> dict:
+    if binary:
+        return services.ingest_tracking_batch_arrays(db, track_codec.decode(track_codec.encode(points)), driver_id, chunk_size=2)
+    return services.ingest_tracking_points_batch(db, points, driver_id, chunk_size=2)
+
+
+def _first_delivery_id(engine, fec_id: int) -> int:
+    with Session(engine) as db:
+        return db.exec(select(models.Delivery.delivery_id).where(models.Delivery.fec_id == fec_id)).first()
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_batch_is_stored_in_body_order(engine, seed_fec, binary):
+    driver_id, fec_id = seed_fec(engine)
+    delivery_id = _first_delivery_id(engine, fec_id)
+    types = ["location_update", "start_delivery", "location_update", "location_update", "location_update", "end_delivery", "location_update"]
+    points = [_point(delivery_id, event_type, minutes) for minutes, event_type in enumerate(types)]
+
+    with Session(engine) as db:
+        summary = _ingest(db, points, driver_id, binary)
+
+    assert summary["accepted"] == len(points)
+    # Los eventos de inicio/fin cierran el bloque en curso: [ping] [ping, ping] [ping] [ping]
+    assert [chunk["accepted"] for chunk in summary["chunks"]] == [1, 2, 1, 1]
+    with Session(engine) as db:
+        stored = db.exec(select(models.TrackingPoint).order_by(models.TrackingPoint.point_id)).all()
+        delivery = db.get(models.Delivery, delivery_id)
+    assert [point.event_type for point in stored] == types
+    assert delivery.status == "completed"
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_points_with_invalid_coordinates_are_rejected(engine, seed_fec, binary):
+    driver_id, fec_id = seed_fec(engine)
+    delivery_id = _first_delivery_id(engine, fec_id)
+    points = [_point(delivery_id, "location_update", 0), _point(delivery_id, "location_update", 1, latitude=95.0)]
+
+    with Session(engine) as db:
+        summary = _ingest(db, points, driver_id, binary)
+
+    assert (summary["accepted"], summary["rejected"]) == (1, 1)
+    with Session(engine) as db:
+        assert len(db.exec(select(models.TrackingPoint)).all()) == 1
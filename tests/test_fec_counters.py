@@ -0,0 +1,42 @@
+# tests/test_fec_counters.py
+"""Contadores de entregas abiertas/finalizadas del FEC."""
+
+from sqlmodel import Session, select
+
+from app import models, repositories, services
+
+
+def _counters(engine, fec_id: int) -> tuple:
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        return fec.open_deliveries, fec.finalized_deliveries
+
+
+def test_fec_read_initializes_counters(engine, seed_fec):
+    driver_id, fec_id = seed_fec(engine, deliveries=4)
+
+    with Session(engine) as db:
+        services.get_fec_details_response(db, fec_number=100, driver_id=driver_id)
+
+    assert _counters(engine, fec_id) == (4, 0)
+
+
+def test_read_correction_does_not_overwrite_concurrent_status_change(file_engine, seed_fec):
+    """La lectura decide con datos viejos, pero el valor que escribe lo calcula la BD en el commit."""
+    _, fec_id = seed_fec(file_engine, deliveries=3)
+
+    with Session(file_engine, expire_on_commit=False) as reader:
+        fec = repositories.get_fec_details_by_id(reader, fec_id)
+        reader.commit()
+
+        # Otra petición termina una entrega mientras tanto
+        with Session(file_engine) as writer:
+            delivery = writer.exec(select(models.Delivery).where(models.Delivery.fec_id == fec_id)).first()
+            repositories.set_delivery_status(writer, delivery, "completed")
+            writer.add(delivery)
+            writer.commit()
+
+        assert services._apply_fec_read_transitions(reader, fec, fec.fec_number)
+        reader.commit()
+
+    assert _counters(file_engine, fec_id) == (2, 1)
@@ -0,0 +1,61 @@
+# tests/test_fec_queries.py
+"""La lectura de un FEC hace un número fijo de consultas, sin importar cuántas entregas tenga."""
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app import repositories, serializers, services
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        # Los BEGIN los emite database.py para SQLite; no son consultas de la lectura
+        if not statement.lstrip().upper().startswith("BEGIN"):
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def _fec_read_queries(engine, seed_fec, deliveries: int, fec_number: int, status: str) -> int:
+    driver_id, fec_id = seed_fec(engine, deliveries=deliveries, fec_number=fec_number, status=status)
+    services.fec_response_cache.invalidate((fec_id, 1))
+    with Session(engine) as db, QueryCounter(engine) as counter:
+        response = services.get_fec_details_response(db, fec_number=fec_number, driver_id=driver_id)
+    assert response.body.count(b'"delivery_id"') == deliveries
+    return counter.count
+
+
+def _details_queries(engine, seed_fec, deliveries: int, fec_number: int) -> int:
+    _, fec_id = seed_fec(engine, deliveries=deliveries, fec_number=fec_number)
+    with Session(engine) as db, QueryCounter(engine) as counter:
+        fec = repositories.get_fec_details_by_id(db, fec_id)
+        # Serializar recorre entrega -> cliente -> vendedor: nada debe cargarse en diferido
+        serializers.fec_to_dict(fec)
+    return counter.count
+
+
+def test_fec_details_load_in_two_queries(engine, seed_fec):
+    assert _details_queries(engine, seed_fec, 3, fec_number=1) == 2
+    assert _details_queries(engine, seed_fec, 150, fec_number=2) == 2
+
+
+@pytest.mark.parametrize("status", ["in_progress", "pending"])
+def test_fec_read_query_count_does_not_grow_with_deliveries(engine, seed_fec, status):
+    # 'pending' además pasa el FEC a 'in_progress' y lo vuelve a cargar
+    small = _fec_read_queries(engine, seed_fec, 3, fec_number=10, status=status)
+    large = _fec_read_queries(engine, seed_fec, 150, fec_number=11, status=status)
+    assert small == large
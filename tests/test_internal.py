@@ -0,0 +1,23 @@
+# tests/test_internal.py
+"""/metrics y /health/* solo responden con el token interno configurado."""
+
+import pytest
+
+from app import security
+
+INTERNAL_PATHS = ["/metrics", "/health/db-pool", "/health/tracking-buffer", "/health/track-filter", "/health/logging"]
+
+
+@pytest.mark.parametrize("path", INTERNAL_PATHS)
+def test_internal_endpoints_are_hidden_without_token_configured(client, monkeypatch, path):
+    monkeypatch.setattr(security, "INTERNAL_API_TOKEN", None)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", INTERNAL_PATHS)
+def test_internal_endpoints_require_the_token(client, monkeypatch, path):
+    monkeypatch.setattr(security, "INTERNAL_API_TOKEN", "token-interno")
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer otro"}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer token-interno"}).status_code == 200
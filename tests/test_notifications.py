@@ -0,0 +1,223 @@
+# tests/test_notifications.py
+"""Dispatcher del outbox de notificaciones con un proveedor local en lugar de Twilio."""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app import database, models, notifications
+
+
+class StubProvider:
+    """Proveedor local: registra los payloads y responde lo que se le indique."""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.payloads = []
+
+    def __call__(self, payload: dict) -> bool:
+        self.payloads.append(payload)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def provider():
+    original = notifications.PROVIDERS["sms"]
+    stub = StubProvider()
+    notifications.register_provider("sms", stub)
+    yield stub
+    notifications.register_provider("sms", original)
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def _add_notifications(engine, count: int = 1, attempts: int = 0) -> list:
+    with Session(engine) as db:
+        rows = [
+            models.NotificationOutbox(
+                channel="sms",
+                payload_json=json.dumps({"invoice_id": f"FAC-{index}"}),
+                attempts=attempts,
+                next_attempt_at=notifications._utcnow() - timedelta(seconds=1),
+            )
+            for index in range(count)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [row.notification_id for row in rows]
+
+
+def _load(engine, notification_id: int) -> models.NotificationOutbox:
+    with Session(engine) as db:
+        return db.get(models.NotificationOutbox, notification_id)
+
+
+class _Rows:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+def test_successful_send_marks_notification_sent(engine, provider, executor):
+    (notification_id,) = _add_notifications(engine)
+
+    processed = notifications.dispatch_pending(lambda: Session(engine), executor)
+
+    notification = _load(engine, notification_id)
+    assert processed == 1
+    assert provider.payloads == [{"invoice_id": "FAC-0"}]
+    assert notification.status == "sent"
+    assert notification.attempts == 1
+    assert notification.sent_at is not None
+    assert notification.last_error is None
+
+
+def test_no_transaction_is_open_while_sending(engine, provider, executor):
+    _add_notifications(engine, count=2)
+    sessions = []
+    open_while_sending = []
+
+    def session_factory():
+        sessions.append(Session(engine))
+        return sessions[-1]
+
+    def provider_checking_sessions(payload):
+        open_while_sending.append(any(session.in_transaction() for session in sessions))
+        return True
+
+    notifications.register_provider("sms", provider_checking_sessions)
+    assert notifications.dispatch_pending(session_factory, executor) == 2
+    assert open_while_sending == [False, False]
+
+
+def test_failed_send_is_rescheduled_with_backoff(engine, provider, executor):
+    provider.result = False
+    (notification_id,) = _add_notifications(engine)
+    before = notifications._utcnow()
+
+    notifications.dispatch_pending(lambda: Session(engine), executor)
+
+    notification = _load(engine, notification_id)
+    assert notification.status == "pending"
+    assert notification.attempts == 1
+    assert notification.last_error == "El proveedor rechazó el mensaje."
+    # Primer reintento: BACKOFF_BASE_SECONDS con ±20% de jitter
+    delay = (notification.next_attempt_at - before).total_seconds()
+    assert notifications.BACKOFF_BASE_SECONDS * 0.8 <= delay <= notifications.BACKOFF_BASE_SECONDS * 1.2 + 1
+    # Todavía no vence: otra pasada no la vuelve a enviar
+    assert notifications.dispatch_pending(lambda: Session(engine), executor) == 0
+    assert len(provider.payloads) == 1
+
+
+def test_backoff_grows_and_is_capped():
+    delays = [notifications._backoff_delay(attempt) / 1.2 for attempt in range(1, 20)]
+    assert delays[1] > delays[0]
+    assert max(delays) <= notifications.BACKOFF_MAX_SECONDS
+
+
+def test_notification_goes_dead_after_max_attempts(engine, provider, executor):
+    provider.result = RuntimeError("timeout de Twilio")
+    (notification_id,) = _add_notifications(engine, attempts=notifications.MAX_ATTEMPTS - 1)
+
+    notifications.dispatch_pending(lambda: Session(engine), executor)
+
+    notification = _load(engine, notification_id)
+    assert notification.status == "dead"
+    assert notification.attempts == notifications.MAX_ATTEMPTS
+    assert "timeout de Twilio" in notification.last_error
+    assert notifications.dispatch_pending(lambda: Session(engine), executor) == 0
+
+
+def test_stale_candidate_is_not_claimed_twice(file_engine):
+    """El dispatcher A lee los candidatos, el B los reserva antes que A haga su UPDATE."""
+    notification_ids = _add_notifications(file_engine, count=3)
+
+    with Session(file_engine) as first, Session(file_engine) as second:
+        original_exec = first.exec
+        claimed_by_second = []
+
+        def exec_after_second_claims(statement, *args, **kwargs):
+            result = original_exec(statement, *args, **kwargs)
+            candidates = result.all()
+            # SQLite bloquea la escritura de B mientras A tenga abierta su lectura
+            first.commit()
+            claimed_by_second.extend(n.notification_id for n in notifications._claim_due_notifications(second, limit=10))
+            second.commit()
+            first.exec = original_exec
+            return _Rows(candidates)
+
+        first.exec = exec_after_second_claims
+        claimed_by_first = notifications._claim_due_notifications(first, limit=10)
+
+    assert sorted(claimed_by_second) == notification_ids
+    assert claimed_by_first == []
+
+
+def test_concurrent_dispatchers_claim_each_row_once(file_engine, monkeypatch):
+    # Con BEGIN IMMEDIATE los escritores de SQLite esperan su turno en vez de fallar con "database is locked"
+    monkeypatch.setattr(database, "SQLITE_BEGIN_IMMEDIATE", True)
+    notification_ids = _add_notifications(file_engine, count=40)
+
+    claims = []
+    claims_lock = threading.Lock()
+    start = threading.Barrier(4)
+
+    def dispatcher():
+        start.wait()
+        with Session(file_engine) as db:
+            while True:
+                batch = notifications._claim_due_notifications(db, limit=3)
+                if not batch:
+                    return
+                with claims_lock:
+                    claims.extend(n.notification_id for n in batch)
+
+    threads = [threading.Thread(target=dispatcher) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claims) == notification_ids
+
+
+def test_completion_enqueues_one_row_per_channel(engine, seed_fec, monkeypatch):
+    monkeypatch.setattr(notifications, "COMPLETION_CHANNELS", ["sms", "whatsapp"])
+    _, fec_id = seed_fec(engine, deliveries=1)
+    with Session(engine) as db:
+        delivery = db.exec(select(models.Delivery).where(models.Delivery.fec_id == fec_id)).one()
+        notifications.enqueue_completion_notifications(db, delivery)
+        db.commit()
+        rows = db.exec(select(models.NotificationOutbox)).all()
+    assert sorted(row.channel for row in rows) == ["sms", "whatsapp"]
+    assert all(row.status == "pending" for row in rows)
+
+
+def test_dispatcher_can_restart_after_stop(file_engine, provider):
+    # BD en archivo: el hilo del dispatcher no comparte la conexión de la prueba
+    dispatcher = notifications.NotificationDispatcher(lambda: Session(file_engine), workers=1, poll_interval=0.01)
+    dispatcher.start()
+    dispatcher.stop()
+    (notification_id,) = _add_notifications(file_engine)
+
+    dispatcher.start()
+    try:
+        for _ in range(200):
+            if _load(file_engine, notification_id).status == "sent":
+                break
+            threading.Event().wait(0.01)
+    finally:
+        dispatcher.stop()
+    assert _load(file_engine, notification_id).status == "sent"
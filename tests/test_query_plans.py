@@ -0,0 +1,43 @@
+# tests/test_query_plans.py
+"""
+Ninguna consulta caliente recorre una tabla completa: mismas consultas y misma revisión de
+EXPLAIN QUERY PLAN que benchmarks/check_query_plans.py, con una flota más chica.
+"""
+
+import pytest
+from sqlmodel import Session
+
+from benchmarks.check_query_plans import capture_selects, hot_queries, seed_fleet, table_scans
+from benchmarks.common import make_sqlite_engine
+
+from app import models, repositories
+
+# Suficiente volumen para que el planificador (con ANALYZE) elija como en producción, en ~1 s
+FLEET = dict(drivers=10, days=20, deliveries_per_day=12, points_per_delivery=20)
+
+
+@pytest.fixture(scope="module")
+def fleet(tmp_path_factory):
+    engine = make_sqlite_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'fleet.db'}")
+    fecs, _, _ = seed_fleet(engine, **FLEET)
+    fec_id = fecs // 2
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        delivery_ids = [d.delivery_id for d in repositories.get_all_deliveries_for_fec(db, fec_id)]
+        queries = hot_queries(fec_id, fec.fec_number, fec.driver_id, delivery_ids)
+    yield engine, queries
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", list(hot_queries(0, 0, 0, [0])))
+def test_hot_query_uses_indexes(fleet, name):
+    engine, queries = fleet
+    statements = capture_selects(engine, queries[name])
+    assert statements, f"{name} no emitió ningún SELECT"
+
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            scans.extend(table_scans(plan))
+    assert not scans, f"{name} recorre tablas completas: {scans}"
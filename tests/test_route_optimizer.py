@@ -0,0 +1,106 @@
+# tests/test_route_optimizer.py
+"""Optimizador de rutas: niveles de prioridad, salida del conductor y presupuesto de tiempo."""
+
+import random
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, repositories, route_codec, route_optimizer, schemas, services
+
+ORIGIN = (32.5149, -117.0382)
+
+
+def _stops(count: int, levels: int = 0, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        route_optimizer.Stop(
+            index + 1, ORIGIN[0] + rng.uniform(-0.05, 0.05), ORIGIN[1] + rng.uniform(-0.05, 0.05),
+            rng.randint(1, levels) if levels else None,
+        )
+        for index in range(count)
+    ]
+
+
+def _path_km(stops, order, origin=None) -> float:
+    by_key = {stop.key: stop for stop in stops}
+    points = ([origin] if origin else []) + [(by_key[key].latitude, by_key[key].longitude) for key in order]
+    matrix = route_optimizer.distance_matrix_km([p[0] for p in points], [p[1] for p in points])
+    return route_optimizer.path_length_km(matrix.tolist(), list(range(len(points))))
+
+
+def test_priority_tiers_stay_contiguous():
+    stops = _stops(60, levels=3)
+    result = route_optimizer.optimize_route(stops, origin=ORIGIN, time_budget_ms=1000, priority_band=1)
+
+    priorities = {stop.key: stop.priority for stop in stops}
+    visited = [priorities[key] for key in result.order]
+    assert sorted(result.order) == [stop.key for stop in stops]
+    assert visited == sorted(visited)
+    assert result.passes > 1
+
+
+def test_route_starts_at_the_driver_position():
+    stops = _stops(40)
+    result = route_optimizer.optimize_route(stops, origin=ORIGIN, time_budget_ms=1000)
+
+    # distance_km cuenta el tramo desde el conductor hasta la primera parada
+    assert result.distance_km == pytest.approx(_path_km(stops, result.order, origin=ORIGIN))
+    assert result.distance_km > _path_km(stops, result.order)
+
+
+def test_without_origin_starts_at_the_highest_priority():
+    stops = _stops(30, levels=4)
+    result = route_optimizer.optimize_route(stops, time_budget_ms=1000, priority_band=1)
+
+    first = next(stop for stop in stops if stop.key == result.order[0])
+    assert first.priority == min(stop.priority for stop in stops)
+
+
+@pytest.mark.parametrize("levels", [0, 3])
+def test_local_search_never_makes_the_route_longer(levels):
+    stops = _stops(80, levels=levels, seed=levels + 7)
+    result = route_optimizer.optimize_route(stops, origin=ORIGIN, time_budget_ms=1000, priority_band=1)
+
+    assert result.distance_km <= result.initial_distance_km + 1e-9
+    assert result.distance_km == pytest.approx(_path_km(stops, result.order, origin=ORIGIN))
+
+
+def test_time_budget_is_honoured():
+    stops = _stops(400, seed=3)
+    result = route_optimizer.optimize_route(stops, origin=ORIGIN, time_budget_ms=5)
+
+    assert result.timed_out
+    # Holgura para la matriz de distancias y el vecino más cercano, que no se interrumpen
+    assert result.elapsed_ms < 500
+    assert sorted(result.order) == [stop.key for stop in stops]
+
+
+def test_optimize_fec_route_keeps_finalized_first_and_unlocated_last(engine, seed_fec):
+    driver_id, fec_id = seed_fec(engine, deliveries=6)
+    with Session(engine) as db:
+        deliveries = db.exec(select(models.Delivery).where(models.Delivery.fec_id == fec_id).order_by(models.Delivery.delivery_id)).all()
+        finished, unlocated = deliveries[0], deliveries[1]
+        finished_id, unlocated_id, open_ids = finished.delivery_id, unlocated.delivery_id, [d.delivery_id for d in deliveries[2:]]
+        finished.status, finished.delivery_time = "completed", datetime(2026, 3, 2, 9, 30)
+        unlocated.client.gps_location = "sin-ubicacion"
+        unlocated.start_latitude = unlocated.start_longitude = 999.0
+        for index, delivery in enumerate(deliveries[2:]):
+            delivery.client.gps_location = f"{ORIGIN[0] + 0.01 * (4 - index)},{ORIGIN[1]}"
+        fec = db.get(models.FEC, fec_id)
+        repositories.update_fec_route(db, fec, route_codec.order_to_json([d.delivery_id for d in deliveries]), "_p~iF~ps|U")
+        db.commit()
+
+    with Session(engine) as db:
+        fec, result = services.optimize_fec_route(
+            db, fec_id, driver_id, schemas.RouteOptimizationRequest(latitude=ORIGIN[0], longitude=ORIGIN[1], priority_band=0)
+        )
+        route = route_codec.decode_route(fec)
+
+    assert route.order_ids[0] == finished_id
+    assert route.order_ids[-1] == unlocated_id
+    # Sin niveles de prioridad, las abiertas van de la más cercana al conductor a la más lejana
+    assert list(route.order_ids[1:-1]) == open_ids[::-1]
+    assert list(result.order) == open_ids[::-1]
+    assert route.polyline is None
@@ -0,0 +1,92 @@
+# tests/test_serializers.py
+"""
+app/serializers.py debe producir exactamente los mismos bytes que el camino de los schemas
+(utils.render_fec_json). También protege la versión de orjson: orjson.Fragment requiere >= 3.9.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, repositories, route_codec, serializers, utils
+
+
+def _render_both(engine, fec_id: int) -> tuple:
+    with Session(engine) as db:
+        fec = repositories.get_fec_details_by_id(db, fec_id)
+        return utils.render_fec_json(utils.fec_model_to_schema(fec)), serializers.dumps(serializers.fec_to_dict(fec))
+
+
+@pytest.fixture
+def fec_id(engine, seed_fec):
+    """FEC con entregas finalizadas, canceladas, campos nulos, flotantes pequeños y un cliente sin vendedor."""
+    _, fec_id = seed_fec(engine, deliveries=4)
+    with Session(engine) as db:
+        deliveries = db.exec(select(models.Delivery).where(models.Delivery.fec_id == fec_id).order_by(models.Delivery.delivery_id)).all()
+        completed, cancelled, tiny, orphan = deliveries
+        completed.status = "completed"
+        completed.start_time = datetime(2026, 1, 15, 8, 0, 0, 123456)
+        completed.delivery_time = datetime(2026, 1, 15, 8, 25)
+        completed.end_latitude, completed.end_longitude, completed.distance = 32.52, -117.03, 3.25
+        completed.actual_duration, completed.estimated_duration, completed.estimated_distance = "25 min", "20 min", "3.1 km"
+        cancelled.status = "cancelled"
+        cancelled.cancellation_reason, cancelled.cancellation_notes = "Cliente ausente", "Portón cerrado, sin respuesta"
+        tiny.start_latitude, tiny.start_longitude, tiny.distance = 0.00001, -0.000042, 1e-7
+        tiny.priority = None
+        orphan.client.salesperson_id = None
+        orphan.client.gps_location = None
+        db.add_all(deliveries)
+        db.commit()
+    return fec_id
+
+
+def test_fec_without_route_matches_schema_path(engine, fec_id):
+    legacy, fast = _render_both(engine, fec_id)
+    assert b'"suggestedJourneyPolyline":null' in fast
+    assert fast == legacy
+
+
+def test_fec_with_route_matches_schema_path(engine, fec_id):
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        order = sorted((d.delivery_id for d in fec.deliveries), reverse=True)
+        repositories.update_fec_route(db, fec, route_codec.order_to_json(order), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        db.commit()
+
+    legacy, fast = _render_both(engine, fec_id)
+    assert b'"optimizedOrderId_list":[' in fast
+    assert fast == legacy
+
+
+def test_non_integer_route_order_matches_schema_path(engine, fec_id):
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        repositories.update_fec_route(db, fec, '["a", "b"]', None)
+        db.commit()
+
+    legacy, fast = _render_both(engine, fec_id)
+    assert fast == legacy
+
+
+def test_delivery_matches_schema_path(engine, fec_id):
+    with Session(engine) as db:
+        for delivery in repositories.get_fec_details_by_id(db, fec_id).deliveries:
+            assert serializers.dumps(serializers.delivery_to_dict(delivery)) == utils.render_json(utils.delivery_model_to_schema(delivery))
+
+
+def test_route_is_decoded_once_per_fec_version(engine, fec_id, route_cache):
+    with Session(engine) as db:
+        fec = db.get(models.FEC, fec_id)
+        repositories.update_fec_route(db, fec, route_codec.order_to_json([1, 2]), "_p~iF~ps|U")
+        db.commit()
+        first = route_codec.decode_route(fec)
+        assert route_codec.decode_route(fec) is first
+        assert route_cache.stats()["entries"] == 1
+
+        repositories.update_fec_route(db, fec, route_codec.order_to_json([2, 1]), None)
+        # Antes del flush la versión es una expresión SQL: se decodifica sin pasar por la caché
+        assert route_codec.decode_route(fec).order_ids == (2, 1)
+        db.commit()
+        assert route_codec.decode_route(fec) == route_codec.RouteData(order_ids=(2, 1), order_json="[2,1]")
+    assert route_cache.stats()["entries"] == 2
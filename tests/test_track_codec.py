@@ -0,0 +1,74 @@
+# tests/test_track_codec.py
+"""Formato binario de /deliveries/events/log/batch: ida y vuelta y payloads inválidos."""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app import schemas, security, track_codec
+
+
+def _points(count: int = 3, event_id: str | None = None):
+    return [
+        schemas.TrackingPoint(
+            latitude=32.5 + index / 1000, longitude=-117.0, eventType="location_update",
+            timestamp=datetime(2026, 3, 2, 9, index, tzinfo=timezone.utc), eventId=event_id,
+        )
+        for index in range(count)
+    ]
+
+
+def _batch(timestamp_ms, extras=None) -> track_codec.TrackBatch:
+    count = len(timestamp_ms)
+    return track_codec.TrackBatch(
+        latitude=np.full(count, 32.5), longitude=np.full(count, -117.0),
+        timestamp_ms=np.array(timestamp_ms, dtype=np.int64),
+        event_type=np.zeros(count, dtype=np.uint8), delivery_id=np.zeros(count, dtype=np.int64),
+        event_types=["location_update"], extras=extras or {},
+    )
+
+
+def test_round_trip_rows():
+    batch = track_codec.decode(track_codec.encode(_points(event_id="evt-1")))
+    rows = batch.rows(np.arange(len(batch)), driver_id=5)
+    assert [row["timestamp"].minute for row in rows] == [0, 1, 2]
+    assert rows[0]["client_event_id"] == "evt-1"
+
+
+def test_event_id_longer_than_64_is_rejected():
+    payload = track_codec.encode_batch(_batch([0], extras={0: {"eventId": "x" * 65}}))
+    with pytest.raises(track_codec.TrackCodecError):
+        track_codec.decode(payload)
+
+
+@pytest.mark.parametrize("timestamp_ms", [
+    [2**62],                  # base fuera del rango de datetime
+    [1_000, -5_000],          # una diferencia lleva el punto antes de 1970
+    [-1],                     # base negativa
+])
+def test_out_of_range_timestamps_are_rejected(timestamp_ms):
+    payload = track_codec.encode_batch(_batch(timestamp_ms))
+    with pytest.raises(track_codec.TrackCodecError):
+        track_codec.decode(payload)
+
+
+@pytest.mark.parametrize("delivery_id", [2**31, -1])
+def test_delivery_id_outside_int32_is_rejected_on_encode(delivery_id):
+    points = _points(1)
+    points[0].deliveryId = delivery_id
+    with pytest.raises(track_codec.TrackCodecError):
+        track_codec.encode(points)
+
+
+def test_invalid_binary_batch_returns_400(client, engine, seed_fec):
+    driver_id, _ = seed_fec(engine)
+    token = security.create_access_token({"sub": str(driver_id)})
+    payload = track_codec.encode_batch(_batch([0], extras={0: {"eventId": "x" * 65}}))
+
+    response = client.post(
+        "/deliveries/events/log/batch", content=payload,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": track_codec.MEDIA_TYPE},
+    )
+
+    assert response.status_code == 400
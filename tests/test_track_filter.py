@@ -0,0 +1,113 @@
+# tests/test_track_filter.py
+"""El estado del filtro de tracking solo avanza cuando el lote quedó guardado."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app import models, schemas, services, track_filter, write_buffer
+
+START = datetime(2026, 3, 2, 9, 0)
+
+
+@pytest.fixture
+def active_filter(monkeypatch):
+    monkeypatch.setattr(track_filter, "TRACK_FILTER_ENABLED", True)
+    monkeypatch.setattr(track_filter, "track_filter", track_filter.TrackFilter())
+    return track_filter.track_filter
+
+
+def _pings(count: int, offset_minutes: int = 0):
+    # Puntos a ~110 m y un minuto de distancia: el filtro los guarda todos la primera vez
+    return [
+        schemas.TrackingPoint(
+            latitude=32.5 + (offset_minutes + index) / 1000, longitude=-117.0,
+            timestamp=START + timedelta(minutes=offset_minutes + index), eventType="location_update",
+        )
+        for index in range(count)
+    ]
+
+
+def _stored_points(engine) -> int:
+    with Session(engine) as db:
+        return db.exec(select(func.count(models.TrackingPoint.point_id))).one()
+
+
+def test_filtering_does_not_advance_state_until_commit(active_filter):
+    rows = [{"latitude": p.latitude, "longitude": p.longitude, "timestamp": p.timestamp, "delivery_id": None, "event_type": p.eventType} for p in _pings(3)]
+
+    kept, update = active_filter.filter_rows(7, rows)
+    assert len(kept) == 3
+    assert active_filter.driver_stats(7) is None
+
+    # Sin commit, el mismo lote se vuelve a evaluar contra el estado anterior
+    kept_again, _ = active_filter.filter_rows(7, rows)
+    assert len(kept_again) == 3
+
+    active_filter.commit(update)
+    assert active_filter.driver_stats(7)["kept"] == 3
+    assert active_filter.filter_rows(7, rows[-1:])[0] == []
+
+
+def test_retry_after_failed_commit_is_not_dropped(engine, seed_fec, active_filter):
+    driver_id, _ = seed_fec(engine)
+    points = _pings(5)
+
+    with Session(engine) as db:
+        original_commit = db.commit
+
+        def failing_commit():
+            db.commit = original_commit
+            raise RuntimeError("conexión perdida")
+
+        db.commit = failing_commit
+        with pytest.raises(RuntimeError):
+            services.ingest_tracking_points_batch(db, points, driver_id)
+    assert _stored_points(engine) == 0
+    assert active_filter.driver_stats(driver_id) is None
+
+    with Session(engine) as db:
+        summary = services.ingest_tracking_points_batch(db, points, driver_id)
+    assert summary["accepted"] == 5
+    assert _stored_points(engine) == 5
+
+    # Ya guardado: reenviar el último punto ahora sí se descarta como duplicado
+    with Session(engine) as db:
+        summary = services.ingest_tracking_points_batch(db, points[-1:], driver_id)
+    assert summary["accepted"] == 0
+    assert active_filter.driver_stats(driver_id)["duplicate"] == 1
+
+
+def test_buffered_pings_do_not_advance_state_when_lifecycle_commit_fails(engine, seed_fec, active_filter, monkeypatch):
+    driver_id, fec_id = seed_fec(engine)
+    buffer = write_buffer.TrackingWriteBuffer(lambda: Session(engine))
+    monkeypatch.setattr(write_buffer, "TRACKING_BUFFER_ENABLED", True)
+    monkeypatch.setattr(write_buffer, "tracking_buffer", buffer)
+    with Session(engine) as db:
+        delivery_id = db.exec(select(models.Delivery.delivery_id).where(models.Delivery.fec_id == fec_id)).first()
+    start = schemas.TrackingPoint(
+        latitude=32.6, longitude=-117.0, timestamp=START + timedelta(minutes=10),
+        eventType="start_delivery", deliveryId=delivery_id, eventId="start-1",
+    )
+
+    with Session(engine) as db:
+        def failing_commit():
+            raise RuntimeError("conexión perdida")
+
+        db.commit = failing_commit
+        with pytest.raises(RuntimeError):
+            services.log_tracking_events_for_driver(db, _pings(3) + [start], driver_id)
+
+    assert _stored_points(engine) == 3
+    assert active_filter.driver_stats(driver_id) is None
+
+
+def test_stats_only_expose_totals(active_filter):
+    rows = [{"latitude": p.latitude, "longitude": p.longitude, "timestamp": p.timestamp, "delivery_id": None, "event_type": p.eventType} for p in _pings(3)]
+    active_filter.commit(active_filter.filter_rows(7, rows)[1])
+
+    stats = active_filter.stats()
+    assert stats["tracked_drivers"] == 1
+    assert stats["kept"] == 3
+    assert "drivers" not in stats
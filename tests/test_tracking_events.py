@@ -0,0 +1,58 @@
+# tests/test_tracking_events.py
+"""Efecto de los eventos de tracking sobre las entregas y la versión (ETag) del FEC."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, schemas, services, track_filter, write_buffer
+
+START = datetime(2026, 3, 2, 9, 0)
+
+
+@pytest.fixture(autouse=True)
+def direct_ingestion(monkeypatch):
+    """Sin buffer de escritura ni filtro: cada evento llega directo a la BD."""
+    monkeypatch.setattr(write_buffer, "TRACKING_BUFFER_ENABLED", False)
+    monkeypatch.setattr(track_filter, "TRACK_FILTER_ENABLED", False)
+
+
+def _point(delivery_id: int, event_type: str, minutes: int, event_id: str | None = None) -> schemas.TrackingPoint:
+    return schemas.TrackingPoint(
+        latitude=32.5149 + minutes / 1000, longitude=-117.0382,
+        timestamp=START + timedelta(minutes=minutes),
+        eventType=event_type, deliveryId=delivery_id, eventId=event_id,
+    )
+
+
+def _fec_version(engine, fec_id: int) -> int:
+    with Session(engine) as db:
+        return db.get(models.FEC, fec_id).version
+
+
+def _first_delivery_id(engine, fec_id: int) -> int:
+    with Session(engine) as db:
+        return db.exec(select(models.Delivery.delivery_id).where(models.Delivery.fec_id == fec_id)).first()
+
+
+def test_plain_pings_do_not_bump_fec_version(engine, seed_fec):
+    driver_id, fec_id = seed_fec(engine)
+    delivery_id = _first_delivery_id(engine, fec_id)
+
+    with Session(engine) as db:
+        services.log_tracking_events_for_driver(db, [_point(delivery_id, "location_update", m) for m in range(3)], driver_id)
+
+    assert _fec_version(engine, fec_id) == 1
+
+
+def test_lifecycle_events_bump_fec_version(engine, seed_fec):
+    driver_id, fec_id = seed_fec(engine)
+    delivery_id = _first_delivery_id(engine, fec_id)
+
+    with Session(engine) as db:
+        services.log_tracking_events_for_driver(db, [_point(delivery_id, "start_delivery", 0, "start-1")], driver_id)
+
+    assert _fec_version(engine, fec_id) == 2
+    with Session(engine) as db:
+        assert db.get(models.Delivery, delivery_id).status == "in_progress"
@@ -0,0 +1,50 @@
+# tests/test_write_buffer.py
+"""Un evento de inicio/fin no se procesa si los pings previos no llegaron a la BD."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app import models, security, track_filter, write_buffer
+
+START = datetime(2026, 3, 2, 9, 0)
+
+
+@pytest.fixture
+def buffer(engine, monkeypatch):
+    tracking_buffer = write_buffer.TrackingWriteBuffer(lambda: Session(engine))
+    monkeypatch.setattr(write_buffer, "TRACKING_BUFFER_ENABLED", True)
+    monkeypatch.setattr(write_buffer, "tracking_buffer", tracking_buffer)
+    monkeypatch.setattr(track_filter, "TRACK_FILTER_ENABLED", False)
+    return tracking_buffer
+
+
+def _event(delivery_id: int, event_type: str, minutes: int) -> dict:
+    return {
+        "latitude": 32.5149 + minutes / 1000, "longitude": -117.0382,
+        "timestamp": (START + timedelta(minutes=minutes)).isoformat(),
+        "eventType": event_type, "deliveryId": delivery_id, "eventId": f"{event_type}-{minutes}",
+    }
+
+
+def test_failed_flush_rejects_lifecycle_events(client, engine, seed_fec, buffer, monkeypatch):
+    driver_id, fec_id = seed_fec(engine, deliveries=1)
+    with Session(engine) as db:
+        delivery_id = db.exec(select(models.Delivery.delivery_id).where(models.Delivery.fec_id == fec_id)).one()
+
+    def failing_write(db, rows):
+        raise RuntimeError("conexión perdida")
+
+    monkeypatch.setattr(write_buffer, "write_tracking_rows", failing_write)
+    token = security.create_access_token({"sub": str(driver_id)})
+    body = [_event(delivery_id, "location_update", minute) for minute in range(3)] + [_event(delivery_id, "end_delivery", 3)]
+
+    response = client.post("/deliveries/events/log", json=body, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 503
+    with Session(engine) as db:
+        assert db.get(models.Delivery, delivery_id).status != "completed"
+        assert db.get(models.FEC, fec_id).status == "in_progress"
+    # Los pings siguen en reintento dentro del buffer, no se perdieron
+    assert buffer.stats()["pending_rows"] == 3